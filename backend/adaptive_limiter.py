@@ -0,0 +1,197 @@
+"""
+AIMD adaptive concurrency limit for outbound table operations
+
+Every storage call in a worker takes a permit from one shared limiter. The
+limit grows by about one permit per window of successful calls (additive
+increase) and halves when the service throttles (429/503) or when latency
+climbs well above its healthy baseline (multiplicative decrease). The
+baseline starts as the fastest of the first few calls, so a slow cold call
+(connection setup, table creation) does not set the bar. At most one
+decrease happens per window, judged by whether the failing call started
+after the previous decrease, so a single burst of 429s does not collapse the
+limit to the floor. Calls beyond the limit wait in a bounded queue for a
+short time; the rest are shed with ConcurrencyLimitExceeded instead of adding
+retries to an overloaded account.
+"""
+import logging
+import threading
+import time
+
+from azure.core.exceptions import HttpResponseError
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_STATUS_CODES = (429, 503)
+PAGED_OPERATIONS = ("query_entities", "list_entities")
+LIMITED_OPERATIONS = (
+    "get_entity", "create_entity", "update_entity", "upsert_entity", "delete_entity",
+    "submit_transaction", "create_table",
+) + PAGED_OPERATIONS
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """
+    Raised when a storage call is shed because the queue is full or the wait timed out
+    """
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Shared permit pool whose size adapts to throttling and latency
+    """
+
+    def __init__(self, initial_limit=16, min_limit=1, max_limit=128, backoff=0.5,
+                 latency_tolerance=2.0, max_queue=64, queue_timeout=2.0, warmup_samples=5, clock=time.monotonic):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.warmup_samples = warmup_samples
+        self.clock = clock
+        self._condition = threading.Condition()
+        self._last_decrease = float("-inf")
+        self.baseline_latency = None
+        self.warmup_seen = 0
+        self.in_flight = 0
+        self.queued = 0
+        self.completed = 0
+        self.throttled = 0
+        self.slow = 0
+        self.shed = 0
+        self.decreases = 0
+        self.queue_wait = 0.0
+
+    def acquire(self):
+        """
+        Take a permit, waiting in the queue if needed; return the call's start time
+        """
+        with self._condition:
+            if self.in_flight >= int(self.limit):
+                if self.queued >= self.max_queue:
+                    self.shed += 1
+                    raise ConcurrencyLimitExceeded("Storage concurrency queue is full")
+                self.queued += 1
+                waited_from = self.clock()
+                deadline = waited_from + self.queue_timeout
+                try:
+                    while self.in_flight >= int(self.limit):
+                        remaining = deadline - self.clock()
+                        if remaining <= 0:
+                            self.shed += 1
+                            raise ConcurrencyLimitExceeded("Timed out waiting for a storage permit")
+                        self._condition.wait(remaining)
+                finally:
+                    self.queued -= 1
+                    self.queue_wait += self.clock() - waited_from
+            self.in_flight += 1
+            return self.clock()
+
+    def release(self, started, throttled=False):
+        """
+        Return a permit and adapt the limit from the call's outcome
+        """
+        now = self.clock()
+        latency = now - started
+        with self._condition:
+            self.in_flight -= 1
+            self.completed += 1
+            slow = False
+            if throttled:
+                self.throttled += 1
+            elif self.warmup_seen < self.warmup_samples or self.baseline_latency is None:
+                # No latency verdicts until the warm-up window has set the baseline
+                self.warmup_seen += 1
+                if self.baseline_latency is None or latency < self.baseline_latency:
+                    self.baseline_latency = latency
+            else:
+                slow = latency > self.latency_tolerance * self.baseline_latency
+                if slow:
+                    self.slow += 1
+                else:
+                    # Track the healthy latency slowly so the baseline does not chase a spike
+                    self.baseline_latency += 0.05 * (latency - self.baseline_latency)
+
+            if (throttled or slow) and started >= self._last_decrease:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+                self.decreases += 1
+                logger.info(f"Storage concurrency limit reduced to {int(self.limit)}")
+            elif not throttled and not slow:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Run fn under a permit, treating 429 and 503 responses as throttling
+        """
+        started = self.acquire()
+        throttled = False
+        try:
+            return fn(*args, **kwargs)
+        except HttpResponseError as e:
+            throttled = e.status_code in THROTTLE_STATUS_CODES
+            raise
+        finally:
+            self.release(started, throttled)
+
+    def stats(self):
+        """
+        Return limiter counters for diagnostics
+        """
+        with self._condition:
+            return {
+                'limit': int(self.limit),
+                'inFlight': self.in_flight,
+                'queued': self.queued,
+                'completed': self.completed,
+                'throttled': self.throttled,
+                'slow': self.slow,
+                'shed': self.shed,
+                'decreases': self.decreases,
+                'baselineLatencyMs': round(self.baseline_latency * 1000, 1) if self.baseline_latency else None,
+                'queueWaitSeconds': round(self.queue_wait, 3),
+            }
+
+
+class LimitedTableClient:
+    """
+    Table client proxy that runs every storage call under the limiter
+    """
+
+    def __init__(self, table_client, limiter):
+        self._inner = table_client
+        self.limiter = limiter
+
+    def __getattr__(self, name):
+        attribute = getattr(self._inner, name)
+        if name not in LIMITED_OPERATIONS:
+            return attribute
+        if name in PAGED_OPERATIONS:
+            return lambda *args, **kwargs: LimitedPages(attribute(*args, **kwargs), self.limiter)
+        return lambda *args, **kwargs: self.limiter.call(attribute, *args, **kwargs)
+
+
+class LimitedPages:
+    """
+    Paged query result that takes a permit for each page request
+    """
+
+    def __init__(self, pages, limiter):
+        self._pages = pages
+        self.limiter = limiter
+
+    def by_page(self, *args, **kwargs):
+        pages = self._pages.by_page(*args, **kwargs)
+        while True:
+            try:
+                page = self.limiter.call(next, pages)
+            except StopIteration:
+                return
+            yield page
+
+    def __iter__(self):
+        for page in self.by_page():
+            yield from page
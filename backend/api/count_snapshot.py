@@ -0,0 +1,141 @@
+"""
+Crash-safe local snapshot of the last committed visitor count
+
+The snapshot is a small memory-mapped file under the temp dir holding two
+fixed-layout slots. Each write goes to the slot after the newest one and
+carries a sequence number and CRC, so a torn write leaves the previous slot
+intact and loading always finds the newest complete record.
+
+Every worker process on the host shares the file. Writers take an exclusive
+flock on it and number each write one past the newest sequence in the file,
+not their own last one, so the count written last always wins on load.
+
+Lives in api/ so it ships with the deployed app; backend/function_app.py
+imports it from there.
+"""
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"VCSN"
+# Layout 1 stored a 16-byte hash of the version; its slots are ignored on load
+SNAPSHOT_LAYOUT = 2
+# magic, layout, version length, sequence, count, updated_at, version, crc32
+SLOT_FORMAT = struct.Struct("<4sHHQQd84sI")
+SLOT_SIZE = 128
+SNAPSHOT_SIZE = 2 * SLOT_SIZE
+MAX_VERSION_SIZE = 84
+
+
+def default_snapshot_path():
+    """
+    Return the snapshot location used when none is configured
+    """
+    return os.path.join(tempfile.gettempdir(), "visitor-counter.snapshot")
+
+
+class CountSnapshot:
+    """
+    Memory-mapped record of the last committed count and its version
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_snapshot_path()
+        self._lock = threading.Lock()
+        self._fd = None
+        self._map = None
+        self.sequence = 0
+        self.count = None
+        self.version = None
+        self.updated_at = None
+        try:
+            self._open()
+            self.load()
+        except OSError as e:
+            logger.warning(f"Count snapshot unavailable at {self.path}: {str(e)}")
+
+    def _open(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < SNAPSHOT_SIZE:
+                os.ftruncate(fd, SNAPSHOT_SIZE)
+            self._map = mmap.mmap(fd, SNAPSHOT_SIZE)
+        except OSError:
+            os.close(fd)
+            raise
+        # Kept open for the cross-process flock taken around writes
+        self._fd = fd
+
+    def _read_slot(self, index):
+        raw = self._map[index * SLOT_SIZE:index * SLOT_SIZE + SLOT_FORMAT.size]
+        magic, layout, version_size, sequence, count, updated_at, version, crc = SLOT_FORMAT.unpack(raw)
+        if magic != SNAPSHOT_MAGIC or layout != SNAPSHOT_LAYOUT:
+            return None
+        if zlib.crc32(raw[:-4]) != crc:
+            return None
+        version = version[:version_size].decode("utf-8") if version_size else None
+        return sequence, count, updated_at, version
+
+    def _newest_slot(self):
+        slots = [slot for slot in (self._read_slot(0), self._read_slot(1)) if slot]
+        return max(slots, key=lambda slot: slot[0]) if slots else None
+
+    def load(self):
+        """
+        Load the newest valid slot; return the count or None if there is none
+        """
+        if self._map is None:
+            return None
+        with self._lock:
+            newest = self._newest_slot()
+            if newest is None:
+                return None
+            self.sequence, self.count, self.updated_at, self.version = newest
+            logger.info(f"Loaded count snapshot: {self.count} (sequence {self.sequence})")
+            return self.count
+
+    def store(self, count, version=None):
+        """
+        Record a committed count, skipping the write when nothing changed
+        """
+        if self._map is None:
+            return
+        with self._lock:
+            if count == self.count and (version is None or version == self.version):
+                return
+            encoded = str(version).encode("utf-8") if version else b""
+            if len(encoded) > MAX_VERSION_SIZE:
+                # Too long to round-trip; a hash would never match the version it stands for
+                encoded = b""
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                newest = self._newest_slot()
+                sequence = max(self.sequence, newest[0] if newest else 0) + 1
+                updated_at = time.time()
+                raw = SLOT_FORMAT.pack(
+                    SNAPSHOT_MAGIC, SNAPSHOT_LAYOUT, len(encoded), sequence, count, updated_at, encoded, 0
+                )
+                raw = raw[:-4] + struct.pack("<I", zlib.crc32(raw[:-4]))
+                offset = (sequence % 2) * SLOT_SIZE
+                self._map[offset:offset + SLOT_FORMAT.size] = raw
+                self._map.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+            self.sequence = sequence
+            self.count = count
+            self.version = version
+            self.updated_at = updated_at
@@ -2,19 +2,43 @@ import azure.functions as func
 import json
 import logging
 import os
+import tempfile
+import threading
 from datetime import datetime, timezone
 from azure.data.tables import TableServiceClient, TableEntity
 from azure.core.exceptions import ResourceNotFoundError
+from count_snapshot import CountSnapshot
+
+try:
+    # Shared with backend/function_app.py; present when backend/ is on the path (local load tests)
+    from fault_injection import wrap_table_client
+except ImportError:
+    def wrap_table_client(table_client):
+        return table_client
+
+try:
+    from request_profiler import profiler_from_environment
+    profile_route = profiler_from_environment().profile_route
+except ImportError:
+    def profile_route(handler):
+        return handler
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Last count read or written, kept on local disk so it survives worker restarts and
+# served instead of 0 when storage is unavailable
+count_snapshot = CountSnapshot(os.environ.get(
+    'COUNT_SNAPSHOT_PATH', os.path.join(tempfile.gettempdir(), "visitor-counter-api.snapshot")
+))
+
 # Initialize the Azure Function App - Extension Bundle Fix Oct 23, 2025
 app = func.FunctionApp()
 
 # Simple test endpoint to verify deployment
 @app.route(route="test", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
+@profile_route
 def test_endpoint(req: func.HttpRequest) -> func.HttpResponse:
     """Simple test endpoint to verify deployment is working"""
     return func.HttpResponse(
@@ -28,7 +52,22 @@ def test_endpoint(req: func.HttpRequest) -> func.HttpResponse:
         headers={"Access-Control-Allow-Origin": "*"}
     )
 
+# Table client shared by all invocations in this worker; created once on cold start
+_table_client = None
+_table_client_lock = threading.Lock()
+
 def get_table_client():
+    """Return the worker's table client, creating it and the table only once"""
+    global _table_client
+    if _table_client is not None:
+        return _table_client
+    with _table_client_lock:
+        # Concurrent cold-start requests wait here instead of racing create_table
+        if _table_client is None:
+            _table_client = _create_table_client()
+    return _table_client
+
+def _create_table_client():
     """Initialize and return table client for Azure Storage Tables"""
     try:
         # Use AzureWebJobsStorage which contains the storage account connection
@@ -51,19 +90,21 @@ def get_table_client():
             logger.info(f"📊 Table {table_name} already exists: {str(e)}")
         
         logger.info("✅ Table client initialized successfully")
-        return table_client
+        # Injects latency and faults only when TABLE_FAULT_INJECTION is set
+        return wrap_table_client(table_client)
         
     except Exception as e:
         logger.error(f"❌ Failed to initialize table client: {str(e)}")
         raise
 
-def get_visitor_count():
-    """Get current visitor count from Azure Storage Table"""
+def get_visitor_count(fallback=True):
+    """Get current visitor count from Azure Storage Table, or the last known count if it fails"""
     try:
         client = get_table_client()
         entity = client.get_entity(partition_key="visitor", row_key="counter")
         count = entity.get('Count', 0)
         logger.info(f"📊 Retrieved visitor count: {count}")
+        count_snapshot.store(count)
         return count
     except ResourceNotFoundError:
         logger.info("📊 No existing counter found, initializing to 0")
@@ -82,15 +123,17 @@ def get_visitor_count():
         return 0
     except Exception as e:
         logger.error(f"❌ Error getting visitor count: {str(e)}")
-        return 0
+        if not fallback:
+            raise
+        return count_snapshot.count or 0
 
 def increment_visitor_count():
     """Increment visitor count in Azure Storage Table"""
     try:
         client = get_table_client()
         
-        # Get current count
-        current_count = get_visitor_count()
+        # Get current count; a stale fallback must never be written back
+        current_count = get_visitor_count(fallback=False)
         new_count = current_count + 1
         
         # Create or update entity
@@ -104,13 +147,15 @@ def increment_visitor_count():
         client.upsert_entity(entity, mode="replace")
         
         logger.info(f"📈 Visitor count incremented to: {new_count}")
+        count_snapshot.store(new_count)
         return new_count
         
     except Exception as e:
         logger.error(f"❌ Error incrementing visitor count: {str(e)}")
-        return 0
+        return count_snapshot.count or 0
 
 @app.route(route="visitor-counter", methods=["GET", "POST", "OPTIONS"], auth_level=func.AuthLevel.ANONYMOUS)
+@profile_route
 def visitor_counter(req: func.HttpRequest) -> func.HttpResponse:
     """
     Azure Function HTTP trigger for visitor counter with Azure Storage Tables
@@ -187,6 +232,7 @@ def visitor_counter(req: func.HttpRequest) -> func.HttpResponse:
         )
 
 @app.route(route="health", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
+@profile_route
 def health_check(req: func.HttpRequest) -> func.HttpResponse:
     """
     Health check endpoint - simplified for deployment testing
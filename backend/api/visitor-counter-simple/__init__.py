@@ -1,14 +1,20 @@
 import azure.functions as func
 import json
 import logging
+import os
+import tempfile
 from datetime import datetime, timezone
+from count_snapshot import CountSnapshot
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Simple in-memory counter for testing (not persistent but works)
-counter_state = {"count": 0}
+# Simple counter for testing, persisted to a local snapshot so it survives worker restarts
+count_snapshot = CountSnapshot(os.environ.get(
+    'COUNT_SNAPSHOT_PATH', os.path.join(tempfile.gettempdir(), "visitor-counter-simple.snapshot")
+))
+counter_state = {"count": count_snapshot.count or 0}
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     """Simple visitor counter without database dependency"""
@@ -19,6 +25,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             # Increment counter
             counter_state["count"] += 1
             new_count = counter_state["count"]
+            count_snapshot.store(new_count)
             
             logger.info(f"📊 Counter incremented to: {new_count}")
             
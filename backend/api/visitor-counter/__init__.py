@@ -2,14 +2,22 @@ import azure.functions as func
 import json
 import logging
 import os
+import tempfile
 from datetime import datetime, timezone
 from azure.data.tables import TableServiceClient, TableEntity
 from azure.core.exceptions import ResourceNotFoundError
+from count_snapshot import CountSnapshot
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Last count read or written, kept on local disk so it survives worker restarts and
+# served instead of 0 when storage fails
+count_snapshot = CountSnapshot(os.environ.get(
+    'COUNT_SNAPSHOT_PATH', os.path.join(tempfile.gettempdir(), "visitor-counter-v1.snapshot")
+))
+
 def get_table_client():
     """Initialize and return table client for Azure Storage Tables"""
     try:
@@ -39,12 +47,14 @@ def get_visitor_count():
     try:
         client = get_table_client()
         entity = client.get_entity(partition_key="visitor", row_key="counter")
-        return entity.get('Count', 0)
+        count = entity.get('Count', 0)
+        count_snapshot.store(count)
+        return count
     except ResourceNotFoundError:
         return 0
     except Exception as e:
         logger.error(f"Error getting count: {str(e)}")
-        return 0
+        return count_snapshot.count or 0
 
 def increment_visitor_count():
     """Increment visitor count"""
@@ -58,6 +68,7 @@ def increment_visitor_count():
             entity['Count'] = new_count
             entity['LastUpdated'] = datetime.now(timezone.utc)
             client.update_entity(entity)
+            count_snapshot.store(new_count)
             return new_count
         except ResourceNotFoundError:
             entity = TableEntity()
@@ -66,10 +77,11 @@ def increment_visitor_count():
             entity['Count'] = 1
             entity['LastUpdated'] = datetime.now(timezone.utc)
             client.create_entity(entity)
+            count_snapshot.store(1)
             return 1
     except Exception as e:
         logger.error(f"Error incrementing count: {str(e)}")
-        return 0
+        return count_snapshot.count or 0
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     """Visitor counter endpoint"""
@@ -0,0 +1,199 @@
+"""
+Probabilistic approximate visitor counting (base-b Morris counter)
+
+Instead of the count, storage holds a small register c. Each visit bumps it
+with probability b^-c, and the estimate (b^c - 1) / (b - 1) is an unbiased
+estimator of the number of visits with relative standard error about
+sqrt((b - 1) / 2). The base is chosen from the configured relative error,
+b = 1 + 2 * error^2, so 5% error means b = 1.005. Only visits that win the
+draw write to storage, so writes fall to roughly 1 / (1 + n(b - 1)) per visit
+as the count n grows.
+
+The register lives in its own row next to the exact counter, together with
+the base it was built with. Writes are conditional on the ETag; after a lost
+race the same draws are re-tested against the fresh register. Each visit
+gets exactly one uniform draw, so losing a race never gives it a second
+chance to bump the register. The cached register is refreshed
+every few seconds so draws in a busy multi-instance deployment are made
+against a recent value.
+"""
+import logging
+import math
+import random
+import threading
+import time
+
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError
+from azure.data.tables import UpdateMode
+
+from counter_record import COUNTER_PARTITION_KEY
+
+logger = logging.getLogger(__name__)
+
+APPROXIMATE_ROW_KEY = "approximate"
+
+
+class MorrisCounter:
+    """
+    Base-b probabilistic counting arithmetic
+    """
+
+    def __init__(self, relative_error=0.05, rng=None, base=None):
+        self.base = base or 1 + 2 * relative_error ** 2
+        self.relative_error = math.sqrt((self.base - 1) / 2)
+        self.rng = rng or random.Random()
+
+    def estimate(self, register):
+        """
+        Return the unbiased estimate of the count for a register value
+        """
+        return (self.base ** register - 1) / (self.base - 1)
+
+    def draw(self, amount=1):
+        """
+        Return one uniform draw per visit
+        """
+        return [self.rng.random() for _ in range(amount)]
+
+    def advance(self, register, amount=1, draws=None):
+        """
+        Apply amount visits (or one visit per given draw) to a register and return the new register
+        """
+        for draw in self.draw(amount) if draws is None else draws:
+            if draw < self.base ** -register:
+                register += 1
+        return register
+
+    def register_for(self, count):
+        """
+        Return a register whose expected estimate equals an exact count
+        """
+        exact = math.log(count * (self.base - 1) + 1, self.base)
+        low = math.floor(exact)
+        low_estimate, high_estimate = self.estimate(low), self.estimate(low + 1)
+        # Round up with the probability that keeps the estimate unbiased
+        if self.rng.random() < (count - low_estimate) / (high_estimate - low_estimate):
+            return low + 1
+        return low
+
+
+class ApproximateCounter:
+    """
+    Morris counter register stored in the counter table
+    """
+
+    def __init__(self, table_client, relative_error=0.05, rng=None, refresh_interval=5.0, max_attempts=5):
+        self.table_client = table_client
+        self.morris = MorrisCounter(relative_error, rng)
+        self.refresh_interval = refresh_interval
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._register = None
+        self._etag = None
+        self._read_at = 0.0
+        self.visits = 0
+        self.writes = 0
+        self.conflicts = 0
+
+    def _row(self, register):
+        return {
+            'PartitionKey': COUNTER_PARTITION_KEY,
+            'RowKey': APPROXIMATE_ROW_KEY,
+            'Register': register,
+            'Base': self.morris.base,
+        }
+
+    def read(self):
+        """
+        Refresh the register from storage and return the estimate; raises ResourceNotFoundError if unseeded
+        """
+        entity = self.table_client.get_entity(
+            partition_key=COUNTER_PARTITION_KEY, row_key=APPROXIMATE_ROW_KEY, select=['Register', 'Base']
+        )
+        with self._lock:
+            if entity.get('Base') and entity['Base'] != self.morris.base:
+                # Keep interpreting the register with the base it was built with
+                self.morris = MorrisCounter(base=entity['Base'], rng=self.morris.rng)
+            self._register = entity.get('Register', 0)
+            self._etag = (getattr(entity, 'metadata', None) or {}).get('etag')
+            self._read_at = time.monotonic()
+            return self.estimate()
+
+    def seed(self, count):
+        """
+        Create the register from an exact count; return the estimate
+        """
+        register = self.morris.register_for(count) if count else 0
+        try:
+            metadata = self.table_client.create_entity(entity=self._row(register))
+        except ResourceExistsError:
+            return self.read()
+        with self._lock:
+            self._register = register
+            self._etag = (metadata or {}).get('etag')
+            self._read_at = time.monotonic()
+            return self.estimate()
+
+    def estimate(self):
+        """
+        Return the current estimate rounded to a whole count
+        """
+        return round(self.morris.estimate(self._register or 0))
+
+    def add(self, amount=1):
+        """
+        Record visits, writing only when a draw bumps the register; return the estimate
+        """
+        self.visits += amount
+        draws = self.morris.draw(amount)
+        for attempt in range(self.max_attempts):
+            if self._register is None or time.monotonic() - self._read_at > self.refresh_interval:
+                self.read()
+            with self._lock:
+                current, etag = self._register, self._etag
+                target = self.morris.advance(current, draws=draws)
+            if target == current:
+                return self.estimate()
+            try:
+                metadata = self.table_client.update_entity(
+                    entity=self._row(target),
+                    mode=UpdateMode.MERGE,
+                    etag=etag,
+                    match_condition=MatchConditions.IfNotModified
+                )
+            except ResourceModifiedError:
+                self.conflicts += 1
+                self._register = None
+                continue
+            with self._lock:
+                self._register = target
+                self._etag = (metadata or {}).get('etag')
+                self.writes += 1
+            return self.estimate()
+        raise ResourceModifiedError(f"Approximate counter update lost {self.max_attempts} races")
+
+    @property
+    def version(self):
+        """
+        Change token for live updates: the register only moves when the estimate does
+        """
+        return f"approx-{self._register}"
+
+    def describe(self):
+        """
+        Return the fields that mark a response as approximate
+        """
+        return {'mode': "approximate", 'relativeError': round(self.morris.relative_error, 4)}
+
+    def stats(self):
+        """
+        Return write savings for diagnostics
+        """
+        return {
+            **self.describe(),
+            'register': self._register,
+            'visits': self.visits,
+            'writes': self.writes,
+            'conflicts': self.conflicts,
+        }
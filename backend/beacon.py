@@ -0,0 +1,93 @@
+"""
+Deferred increments for beacon-style fire-and-forget visitor counter posts
+
+Beacon requests are answered before the increment is applied. Pending
+increments are fungible, so the queue is a bounded counter rather than a
+list of requests: a background thread drains everything pending and applies
+it as one increment. Increments beyond the bound are dropped and counted.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DeferredIncrementQueue:
+    """
+    Bounded queue of pending increments applied by a background thread
+    """
+
+    def __init__(self, apply_increment, max_pending=1000, flush_interval=0.5):
+        self.apply_increment = apply_increment
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+        self.accepted = 0
+        self.dropped = 0
+        self.applied = 0
+        self.failed = 0
+        self.batches = 0
+
+    def submit(self, amount=1):
+        """
+        Queue an increment; return False if it was dropped because the queue is full
+        """
+        with self._lock:
+            if self._pending + amount > self.max_pending:
+                self.dropped += amount
+                return False
+            self._pending += amount
+            self.accepted += amount
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="beacon-increments", daemon=True
+                )
+                self._worker.start()
+        self._wakeup.set()
+        return True
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            # Let concurrent beacons accumulate into one batch
+            time.sleep(self.flush_interval)
+            self._wakeup.clear()
+            self.drain()
+
+    def drain(self):
+        """
+        Apply all pending increments as a single storage update
+        """
+        with self._lock:
+            amount, self._pending = self._pending, 0
+        if not amount:
+            return 0
+        try:
+            self.apply_increment(amount)
+            with self._lock:
+                self.applied += amount
+                self.batches += 1
+            return amount
+        except Exception as e:
+            with self._lock:
+                self.failed += amount
+            logger.error(f"Error applying {amount} deferred increments: {str(e)}")
+            return 0
+
+    def stats(self):
+        """
+        Return queue counters for drop accounting
+        """
+        with self._lock:
+            return {
+                'pending': self._pending,
+                'accepted': self.accepted,
+                'applied': self.applied,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'batches': self.batches,
+            }
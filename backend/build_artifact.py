@@ -0,0 +1,327 @@
+"""
+Build a slim, bytecode-precompiled deployment zip for a function app
+
+    python build_artifact.py                                  # function_app.py -> dist/function_app.zip
+    python build_artifact.py --entry api/function_app.py --output dist/api.zip
+    python build_artifact.py --python-version 3.11 --install  # vendor dependencies for the target Python
+
+Starting from the entry module, local imports are followed through the
+source tree (including imports inside functions and try blocks), so only
+modules the app can actually load are shipped; tests, caches, alternative
+entry points and tools stay behind. requirements.txt is rewritten to the
+distributions that provide a module the app imports; azure-functions is
+always kept because the host needs it.
+
+Sources are compiled with the target interpreter using unchecked-hash pycs.
+Run-from-package mounts the zip read-only, so without them every cold start
+compiles the app again. With --install, the kept requirements are installed
+into .python_packages (the layout the Functions host adds to sys.path) as
+wheels for the target Python, their tests and caches stripped and the rest
+compiled too.
+
+The report printed at the end gives the artifact size and the time a fresh
+target interpreter takes to import the entry module from the built tree.
+"""
+import argparse
+import ast
+import importlib.metadata
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+ALWAYS_REQUIRED = {'azure-functions'}
+
+# Modules provided by the distributions in our requirements files, used when
+# a distribution is not installed in the build environment
+KNOWN_PROVIDES = {
+    'azure-functions': ['azure.functions'],
+    'azure-data-tables': ['azure.data.tables'],
+    'azure-identity': ['azure.identity'],
+    'azure-core': ['azure.core'],
+    'requests': ['requests'],
+    'python-dateutil': ['dateutil'],
+}
+
+STRIPPED_DIRS = {'__pycache__', 'tests', 'docs', 'examples'}
+STRIPPED_SUFFIXES = ('.pyc', '.pyo', '.pyi', '.c', '.h', '.pxd', '.pyx')
+SITE_PACKAGES = os.path.join('.python_packages', 'lib', 'site-packages')
+
+
+def canonical_name(name):
+    """
+    Return a PEP 503 normalized distribution name
+    """
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def _module_path(name, search_path):
+    parts = name.split('.')
+    for root in search_path:
+        base = os.path.join(root, *parts)
+        if os.path.isfile(base + '.py'):
+            return base + '.py'
+        if os.path.isfile(os.path.join(base, '__init__.py')):
+            return os.path.join(base, '__init__.py')
+    return None
+
+
+def _imported_names(path, module_name):
+    with open(path, 'rb') as f:
+        tree = ast.parse(f.read(), filename=path)
+    package = module_name if path.endswith('__init__.py') else module_name.rpartition('.')[0]
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base = package.rsplit('.', node.level - 1)[0] if node.level > 1 else package
+                module = '.'.join(filter(None, [base, node.module]))
+            else:
+                module = node.module
+            names.add(module)
+            # "from package import submodule" imports the submodule
+            names.update(f"{module}.{alias.name}" for alias in node.names if alias.name != '*')
+    return names
+
+
+def resolve_imports(entry, search_path):
+    """
+    Follow imports from the entry module; return (local module files, external dotted names)
+    """
+    entry_name = os.path.splitext(os.path.basename(entry))[0]
+    local = {entry_name: entry}
+    external = set()
+    pending = [(entry_name, entry)]
+    while pending:
+        module_name, path = pending.pop()
+        for name in _imported_names(path, module_name):
+            parts = name.split('.')
+            # Importing a.b.c loads a and a.b too
+            for depth in range(1, len(parts) + 1):
+                prefix = '.'.join(parts[:depth])
+                if prefix in local:
+                    continue
+                found = _module_path(prefix, search_path)
+                if found is not None:
+                    local[prefix] = found
+                    pending.append((prefix, found))
+                    continue
+                if depth == 1 and prefix in sys.stdlib_module_names:
+                    break
+                if depth > 1 and '.'.join(parts[:depth - 1]) in local:
+                    # A name imported from a local module, not a module
+                    break
+                if depth == len(parts):
+                    external.add(name)
+    return local, external
+
+
+def _provided_modules(requirement):
+    try:
+        files = importlib.metadata.distribution(requirement).files or []
+    except importlib.metadata.PackageNotFoundError:
+        return KNOWN_PROVIDES.get(requirement)
+    modules = set()
+    for file in files:
+        parts = file.parts
+        if parts and parts[-1] == '__init__.py' and not parts[0].endswith(('.dist-info', '.data')):
+            modules.add('.'.join(parts[:-1]))
+        elif len(parts) == 1 and parts[0].endswith('.py'):
+            modules.add(parts[0][:-3])
+    return sorted(modules)
+
+
+def prune_requirements(lines, external):
+    """
+    Split requirement lines into (kept, dropped) by whether they provide an imported module
+    """
+    kept, dropped = [], []
+    for line in lines:
+        spec = line.split('#', 1)[0].strip()
+        if not spec:
+            continue
+        name = canonical_name(re.match(r'[A-Za-z0-9._-]+', spec).group(0))
+        provides = _provided_modules(name)
+        used = name in ALWAYS_REQUIRED or provides is None or any(
+            imported == module or imported.startswith(module + '.') or module.startswith(imported + '.')
+            for imported in external for module in provides
+        )
+        (kept if used else dropped).append(spec)
+    return kept, dropped
+
+
+def target_interpreter(version):
+    """
+    Return an interpreter for the target Python version
+    """
+    if version is None or version == f"{sys.version_info[0]}.{sys.version_info[1]}":
+        return sys.executable
+    found = shutil.which(f"python{version}")
+    if found is None:
+        raise SystemExit(f"Bytecode is version specific: python{version} is needed to build for Python {version}")
+    return found
+
+
+def strip_tree(root):
+    """
+    Remove tests, docs, caches and non-runtime files from an installed package tree
+    """
+    removed = 0
+    for directory, subdirs, files in os.walk(root, topdown=True):
+        for name in [d for d in subdirs if d in STRIPPED_DIRS]:
+            path = os.path.join(directory, name)
+            removed += sum(len(f) for _, _, f in os.walk(path))
+            shutil.rmtree(path)
+            subdirs.remove(name)
+        for name in files:
+            if name.endswith(STRIPPED_SUFFIXES):
+                os.remove(os.path.join(directory, name))
+                removed += 1
+    return removed
+
+
+def install_requirements(python, requirements, staging, version):
+    """
+    Install the kept requirements as wheels for the target Python into the package directory
+    """
+    target = os.path.join(staging, SITE_PACKAGES)
+    command = [python, '-m', 'pip', 'install', '--quiet', '--no-compile', '--target', target,
+               '--only-binary=:all:', '--platform', 'manylinux2014_x86_64', '-r', requirements]
+    if version:
+        command += ['--python-version', version]
+    subprocess.run(command, check=True)
+    return strip_tree(target)
+
+
+def compile_tree(python, staging):
+    """
+    Compile every source in the tree to unchecked-hash pycs with the target interpreter
+    """
+    subprocess.run(
+        [python, '-m', 'compileall', '-q', '-j', '0', '--invalidation-mode', 'unchecked-hash', staging],
+        check=True
+    )
+
+
+def measure_import(python, staging, module):
+    """
+    Import the module in a fresh interpreter from the built tree; return wall seconds and importtime
+    """
+    env = {key: value for key, value in os.environ.items() if not key.startswith('PYTHON')}
+    env['PYTHONPATH'] = os.pathsep.join([staging, os.path.join(staging, SITE_PACKAGES)])
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    started = time.perf_counter()
+    result = subprocess.run(
+        [python, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=staging, env=env, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        return {'importSeconds': None, 'importError': result.stderr.strip().splitlines()[-1:]}
+    cumulative = None
+    for line in result.stderr.splitlines():
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            cumulative = int(fields[1])
+    return {
+        'importSeconds': round(elapsed, 3),
+        'moduleImportMs': None if cumulative is None else round(cumulative / 1000, 1),
+    }
+
+
+def build(entry, output, python_version=None, search_path=None, install=False, check_import=True):
+    """
+    Build the artifact and return the report
+    """
+    source = os.path.dirname(os.path.abspath(entry))
+    search_path = [source] + list(search_path or [])
+    local, external = resolve_imports(os.path.abspath(entry), search_path)
+    python = target_interpreter(python_version)
+
+    requirements_path = os.path.join(source, 'requirements.txt')
+    lines = []
+    if os.path.isfile(requirements_path):
+        with open(requirements_path) as f:
+            lines = f.read().splitlines()
+    kept, dropped = prune_requirements(lines, external)
+
+    staging = tempfile.mkdtemp(prefix="function-artifact-")
+    try:
+        for module_name, path in local.items():
+            relative = os.path.relpath(path, next(root for root in search_path if path.startswith(root + os.sep)))
+            destination = os.path.join(staging, relative)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.copy2(path, destination)
+        with open(os.path.join(staging, 'requirements.txt'), 'w') as f:
+            f.write('\n'.join(kept) + '\n')
+        if os.path.isfile(os.path.join(source, 'host.json')):
+            shutil.copy2(os.path.join(source, 'host.json'), staging)
+
+        stripped = install_requirements(python, os.path.join(staging, 'requirements.txt'), staging,
+                                        python_version) if install else 0
+        compile_tree(python, staging)
+
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        files = 0
+        uncompressed = 0
+        with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9) as archive:
+            for directory, _, names in os.walk(staging):
+                for name in sorted(names):
+                    path = os.path.join(directory, name)
+                    archive.write(path, os.path.relpath(path, staging))
+                    files += 1
+                    uncompressed += os.path.getsize(path)
+
+        report = {
+            'entry': os.path.relpath(entry),
+            'output': os.path.relpath(output),
+            'pythonVersion': python_version or f"{sys.version_info[0]}.{sys.version_info[1]}",
+            'modules': sorted(local),
+            'requirements': kept,
+            'droppedRequirements': dropped,
+            'vendored': install,
+            'strippedFiles': stripped,
+            'files': files,
+            'uncompressedBytes': uncompressed,
+            'artifactBytes': os.path.getsize(output),
+        }
+        if check_import:
+            entry_module = os.path.splitext(os.path.basename(entry))[0]
+            report.update(measure_import(python, staging, entry_module))
+        return report
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def main(argv=None):
+    """
+    Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="Build a slim, precompiled function app deployment zip")
+    parser.add_argument("--entry", default="function_app.py", help="entry module (default: function_app.py)")
+    parser.add_argument("--output", help="zip to write (default: dist/<entry>.zip next to the entry)")
+    parser.add_argument("--python-version", help="target Python, e.g. 3.11 (default: this interpreter)")
+    parser.add_argument("--path", action="append", default=[],
+                        help="extra directory to resolve local imports from (repeatable)")
+    parser.add_argument("--install", action="store_true",
+                        help="vendor the kept requirements into .python_packages as target wheels")
+    parser.add_argument("--no-import-check", action="store_true", help="skip the import time measurement")
+    args = parser.parse_args(argv)
+
+    entry_stem = os.path.splitext(os.path.basename(args.entry))[0]
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(args.entry)), 'dist', f"{entry_stem}.zip")
+    report = build(args.entry, output, python_version=args.python_version, search_path=args.path,
+                   install=args.install, check_import=not args.no_import_check)
+    print(json.dumps(report))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Online migration from the legacy visitor/counter layout to visitor-counter/count
+
+Older deployments (backend/api and the v1 functions) count at visitor/counter
+in the AzureWebJobsStorage account, this app counts at visitor-counter/count.
+A marker row next to the primary counter records how much of the legacy count
+has already been folded in, so the true total is always
+
+    primary Count + (legacy Count - LegacyApplied)
+
+Modes:
+    off      primary layout only, no legacy access
+    dual     reads merge both layouts in parallel; increments go to the legacy
+             row first and then to the primary counter and marker in one
+             transaction, so a failure between the two is still counted by the
+             legacy delta and folded in by the next backfill
+    cutover  reads and writes use the primary layout only; backfill keeps
+             folding in increments from legacy deployments that are still draining
+
+Backfill folds the whole outstanding legacy delta into the primary counter in
+one conditional transaction, which makes it safe to run from every instance.
+"""
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+from azure.data.tables import TableTransactionError, UpdateMode
+
+from counter_record import COUNT_PROJECTION, COUNTER_PARTITION_KEY, COUNTER_ROW_KEY, CounterRecord
+
+logger = logging.getLogger(__name__)
+
+LEGACY_PARTITION_KEY = "visitor"
+LEGACY_ROW_KEY = "counter"
+MARKER_ROW_KEY = "migration-legacy"
+MIGRATION_MODES = ("off", "dual", "cutover")
+
+# Optimistic writes that lost a race are retried against fresh state
+CONFLICTS = (ResourceModifiedError, ResourceExistsError, TableTransactionError)
+
+
+class MigrationState:
+    """
+    Primary counter, migration marker and legacy counter read together
+    """
+    __slots__ = ("primary", "applied", "marker_etag", "legacy_count", "legacy_etag")
+
+    def __init__(self, primary, applied, marker_etag, legacy_count, legacy_etag):
+        self.primary = primary
+        self.applied = applied
+        self.marker_etag = marker_etag
+        self.legacy_count = legacy_count
+        self.legacy_etag = legacy_etag
+
+    @property
+    def pending(self):
+        """
+        Legacy increments not yet folded into the primary counter
+        """
+        return max(0, self.legacy_count - self.applied)
+
+    @property
+    def total(self):
+        """
+        Merged visitor count across both layouts
+        """
+        return (self.primary.count if self.primary else 0) + self.pending
+
+    @property
+    def version(self):
+        """
+        Change token covering both layouts
+        """
+        primary = self.primary.version if self.primary else ''
+        return f"{primary}|{self.legacy_etag or ''}"
+
+
+class CounterMigration:
+    """
+    Dual-read, dual-write and backfill between the legacy and primary layouts
+    """
+
+    def __init__(self, primary, legacy, mode="dual", max_attempts=5):
+        if mode not in MIGRATION_MODES:
+            raise ValueError(f"Unknown counter migration mode: {mode}")
+        self.primary = primary
+        self.legacy = legacy
+        self.mode = mode
+        self.max_attempts = max_attempts
+        self._executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="counter-migration")
+        self.merged_reads = 0
+        self.dual_writes = 0
+        self.backfills = 0
+        self.backfilled = 0
+        self.conflicts = 0
+
+    @property
+    def dual(self):
+        """
+        True while reads and writes span both layouts
+        """
+        return self.mode == "dual"
+
+    @staticmethod
+    def _get(client, partition_key, row_key, select):
+        try:
+            return client.get_entity(partition_key=partition_key, row_key=row_key, select=list(select))
+        except ResourceNotFoundError:
+            return None
+
+    def read_state(self):
+        """
+        Read both layouts and the marker in parallel
+        """
+        reads = [
+            (self.primary, COUNTER_PARTITION_KEY, COUNTER_ROW_KEY, COUNT_PROJECTION),
+            (self.primary, COUNTER_PARTITION_KEY, MARKER_ROW_KEY, ('LegacyApplied',)),
+            (self.legacy, LEGACY_PARTITION_KEY, LEGACY_ROW_KEY, ('Count',)),
+        ]
+        # Carry the caller's context (e.g. the route charged for the reads) into the pool
+        futures = [self._executor.submit(contextvars.copy_context().run, self._get, *read) for read in reads]
+        primary, marker, legacy = [future.result() for future in futures]
+        return MigrationState(
+            CounterRecord.from_entity(primary) if primary is not None else None,
+            marker.get('LegacyApplied', 0) if marker is not None else 0,
+            _etag(marker),
+            legacy.get('Count', 0) if legacy is not None else 0,
+            _etag(legacy),
+        )
+
+    def read_merged(self):
+        """
+        Return the merged state for a count read
+        """
+        state = self.read_state()
+        self.merged_reads += 1
+        return state
+
+    def commit(self, amount=1):
+        """
+        Apply an increment to both layouts and return the merged count
+        """
+        # Once the legacy write lands the increment is durable in the merged total
+        self._increment_legacy(amount)
+        self.dual_writes += 1
+        try:
+            return self._retry(lambda state: self._apply_primary(state, amount, state.applied + amount))
+        except Exception as e:
+            # Still counted through the legacy delta; the next backfill folds it in
+            logger.warning(f"Primary counter update deferred to backfill: {str(e)}")
+            return self.read_state().total
+
+    def backfill(self):
+        """
+        Fold the outstanding legacy delta into the primary counter; return the amount moved
+        """
+        def fold(state):
+            delta = state.pending
+            if delta:
+                self._apply_primary(state, delta, state.legacy_count)
+            return delta
+
+        moved = self._retry(fold)
+        if moved:
+            self.backfills += 1
+            self.backfilled += moved
+            logger.info(f"Backfilled {moved} legacy visits into the primary counter")
+        return moved
+
+    def _retry(self, apply):
+        for attempt in range(self.max_attempts):
+            try:
+                return apply(self.read_state())
+            except CONFLICTS:
+                self.conflicts += 1
+                if attempt == self.max_attempts - 1:
+                    raise
+
+    def _increment_legacy(self, amount):
+        for attempt in range(self.max_attempts):
+            entity = self._get(self.legacy, LEGACY_PARTITION_KEY, LEGACY_ROW_KEY, ('Count',))
+            row = {'PartitionKey': LEGACY_PARTITION_KEY, 'RowKey': LEGACY_ROW_KEY}
+            try:
+                if entity is None:
+                    self.legacy.create_entity(entity=dict(row, Count=amount))
+                else:
+                    self.legacy.update_entity(
+                        entity=dict(row, Count=entity.get('Count', 0) + amount),
+                        mode=UpdateMode.MERGE,
+                        etag=_etag(entity),
+                        match_condition=MatchConditions.IfNotModified
+                    )
+                return
+            except CONFLICTS:
+                self.conflicts += 1
+                if attempt == self.max_attempts - 1:
+                    raise
+
+    def _apply_primary(self, state, amount, applied):
+        """
+        Add amount to the primary counter and set the marker in one transaction
+        """
+        counter = state.primary or CounterRecord()
+        counter.count += amount
+        marker = {'PartitionKey': COUNTER_PARTITION_KEY, 'RowKey': MARKER_ROW_KEY, 'LegacyApplied': applied}
+        operations = [
+            _conditional(counter.count_entity(), state.primary.etag if state.primary else None),
+            _conditional(marker, state.marker_etag),
+        ]
+        self.primary.submit_transaction(operations)
+        return counter.count + max(0, state.legacy_count - applied)
+
+    def stats(self):
+        """
+        Return migration counters for diagnostics
+        """
+        return {
+            'mode': self.mode,
+            'mergedReads': self.merged_reads,
+            'dualWrites': self.dual_writes,
+            'backfills': self.backfills,
+            'backfilled': self.backfilled,
+            'conflicts': self.conflicts,
+        }
+
+
+def _etag(entity):
+    metadata = getattr(entity, 'metadata', None) or {}
+    return metadata.get('etag')
+
+
+def _conditional(entity, etag):
+    """
+    Return a transaction operation that fails if the row changed since it was read
+    """
+    if etag is None:
+        return ("create", entity)
+    return ("update", entity, {
+        "mode": UpdateMode.MERGE, "etag": etag, "match_condition": MatchConditions.IfNotModified
+    })
@@ -0,0 +1,80 @@
+"""
+Compact typed record for the visitor counter entity
+
+Reads project only the properties a path needs, and writes send only the
+properties that changed. Change detection uses the entity's ETag and the
+service-maintained Timestamp instead of a Version and LastUpdated property
+rewritten on every increment.
+"""
+
+COUNTER_PARTITION_KEY = "visitor-counter"
+COUNTER_ROW_KEY = "count"
+
+# Properties fetched by each read path; the ETag always comes back in metadata,
+# but the service only returns Timestamp (surfaced as lastUpdated) when selected
+COUNT_PROJECTION = ("Count",)
+STATS_PROJECTION = ("Count", "CreatedAt", "Timestamp")
+
+
+class CounterRecord:
+    """
+    Count, ETag and timestamps of the visitor counter entity
+    """
+    __slots__ = ("count", "etag", "last_updated", "created_at")
+
+    def __init__(self, count=0, etag=None, last_updated=None, created_at=None):
+        self.count = count
+        self.etag = etag
+        self.last_updated = last_updated
+        self.created_at = created_at
+
+    @classmethod
+    def from_entity(cls, entity):
+        """
+        Build a record from a table entity and its response metadata
+        """
+        metadata = getattr(entity, 'metadata', None) or {}
+        return cls(
+            count=entity.get('Count', 0),
+            etag=metadata.get('etag'),
+            # Entities written before the compact model still carry LastUpdated
+            last_updated=metadata.get('timestamp') or entity.get('LastUpdated'),
+            created_at=entity.get('CreatedAt'),
+        )
+
+    @property
+    def version(self):
+        """
+        Opaque token that changes on every write
+        """
+        return self.etag or ''
+
+    def count_entity(self):
+        """
+        Return the minimal entity for a merge that only changes Count
+        """
+        return {
+            'PartitionKey': COUNTER_PARTITION_KEY,
+            'RowKey': COUNTER_ROW_KEY,
+            'Count': self.count,
+        }
+
+    def new_entity(self):
+        """
+        Return the entity for creating the counter
+        """
+        entity = self.count_entity()
+        if self.created_at is not None:
+            entity['CreatedAt'] = self.created_at
+        return entity
+
+    def to_stats(self):
+        """
+        Return the public statistics shape served by visitor-stats
+        """
+        return {
+            'count': self.count,
+            'lastUpdated': self.last_updated.isoformat() if self.last_updated else None,
+            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'version': self.version,
+        }
@@ -0,0 +1,214 @@
+"""
+Append-only visit event log with time-partitioned keys and batched appends
+
+Events are written to their own table, one partition per UTC hour
+("events-YYYYMMDDHH"). Appends are buffered in the worker and flushed as
+batch transactions grouped by partition. Compaction folds an hour's events
+into per-page rollup rows kept in the same partition, deleting the events in
+the same transaction so a crash never double-counts or loses a visit.
+"""
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from azure.core.exceptions import ResourceNotFoundError
+
+logger = logging.getLogger(__name__)
+
+# Azure Table batch transactions are limited to 100 operations on one partition
+MAX_BATCH_OPERATIONS = 100
+
+EVENT_PARTITION_PREFIX = "events-"
+# Rollup rows sort after event rows, whose keys start with a timestamp
+ROLLUP_ROW_PREFIX = "~rollup-"
+
+
+def hash_value(value):
+    """
+    Return a short, non-reversible hash of a page or referrer
+    """
+    if not value:
+        return ""
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:16]
+
+
+def event_partition_key(moment):
+    """
+    Return the hourly partition key for a UTC datetime
+    """
+    return f"{EVENT_PARTITION_PREFIX}{moment.strftime('%Y%m%d%H')}"
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class VisitEventLog:
+    """
+    Buffers visit events in the worker and appends them in batch transactions
+    """
+
+    def __init__(self, table_client, batch_size=50, flush_interval=10.0, max_buffer=5000):
+        self.table_client = table_client
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flusher = None
+        self.dropped = 0
+        self.written = 0
+
+    def record(self, page, referrer=None, moment=None):
+        """
+        Queue one visit event for the next batched append
+        """
+        moment = moment or datetime.now(timezone.utc)
+        entity = {
+            'PartitionKey': event_partition_key(moment),
+            'RowKey': f"{int(moment.timestamp() * 1_000_000):020d}-{uuid.uuid4().hex[:8]}",
+            'VisitedAt': moment,
+            'Page': (page or "")[:256],
+            'ReferrerHash': hash_value(referrer),
+        }
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                return
+            self._buffer.append(entity)
+            full = len(self._buffer) >= self.batch_size
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_loop, name="visit-event-flusher", daemon=True
+                )
+                self._flusher.start()
+        if full:
+            self._wakeup.set()
+
+    def _flush_loop(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing visit events: {str(e)}")
+
+    def flush(self):
+        """
+        Append all buffered events, one transaction per partition chunk
+        """
+        with self._lock:
+            pending, self._buffer = self._buffer, []
+        if not pending:
+            return 0
+
+        by_partition = defaultdict(list)
+        for entity in pending:
+            by_partition[entity['PartitionKey']].append(entity)
+
+        written = 0
+        for partition, entities in by_partition.items():
+            for chunk in _chunks(entities, MAX_BATCH_OPERATIONS):
+                try:
+                    self.table_client.submit_transaction([("create", e) for e in chunk])
+                    written += len(chunk)
+                except Exception as e:
+                    self.dropped += len(chunk)
+                    logger.error(f"Error appending {len(chunk)} visit events to {partition}: {str(e)}")
+
+        self.written += written
+        logger.info(f"Appended {written} visit events")
+        return written
+
+
+def compact_events(table_client, older_than_hours=24, now=None):
+    """
+    Fold events in partitions older than the cutoff into per-page rollups
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = event_partition_key(now - timedelta(hours=older_than_hours))
+    events = table_client.query_entities(
+        "PartitionKey ge @low and PartitionKey lt @high and RowKey lt @rollup",
+        parameters={'low': EVENT_PARTITION_PREFIX, 'high': cutoff, 'rollup': ROLLUP_ROW_PREFIX},
+        select=['PartitionKey', 'RowKey', 'Page'],
+    )
+
+    started = time.perf_counter()
+    compacted = 0
+    partition, batch, pages, rollups = None, [], set(), {}
+    for event in events:
+        page = event.get('Page', '')
+        if event['PartitionKey'] != partition:
+            compacted += _compact_batch(table_client, partition, batch, rollups)
+            partition, batch, pages, rollups = event['PartitionKey'], [], set(), {}
+        elif len(batch) + 1 + len(pages | {page}) > MAX_BATCH_OPERATIONS:
+            compacted += _compact_batch(table_client, partition, batch, rollups)
+            batch, pages = [], set()
+        batch.append(event)
+        pages.add(page)
+    compacted += _compact_batch(table_client, partition, batch, rollups)
+
+    logger.info(f"Compacted {compacted} visit events in {time.perf_counter() - started:.2f}s")
+    return compacted
+
+
+def _compact_batch(table_client, partition, batch, rollups):
+    """
+    Atomically add a batch of events to the partition's rollups and delete them
+    """
+    if not batch:
+        return 0
+
+    counts = defaultdict(int)
+    for event in batch:
+        counts[event.get('Page', '')] += 1
+
+    operations = []
+    totals = {}
+    for page, count in counts.items():
+        row_key = f"{ROLLUP_ROW_PREFIX}{hash_value(page) or 'none'}"
+        if row_key not in rollups:
+            try:
+                existing = table_client.get_entity(partition_key=partition, row_key=row_key, select=['Count'])
+                rollups[row_key] = existing.get('Count', 0)
+            except ResourceNotFoundError:
+                rollups[row_key] = 0
+        totals[row_key] = rollups[row_key] + count
+        operations.append(("upsert", {
+            'PartitionKey': partition,
+            'RowKey': row_key,
+            'Page': page,
+            'Count': totals[row_key],
+        }))
+    operations.extend(("delete", {'PartitionKey': partition, 'RowKey': e['RowKey']}) for e in batch)
+
+    try:
+        table_client.submit_transaction(operations)
+    except Exception as e:
+        logger.error(f"Error compacting {len(batch)} visit events in {partition}: {str(e)}")
+        return 0
+    rollups.update(totals)
+    return len(batch)
+
+
+def get_rollups(table_client, since_hours=24 * 7, now=None):
+    """
+    Return visit totals per page from the compacted rollup rows
+    """
+    now = now or datetime.now(timezone.utc)
+    low = event_partition_key(now - timedelta(hours=since_hours))
+    totals = defaultdict(int)
+    for entity in table_client.query_entities(
+        "PartitionKey ge @low and PartitionKey lt @high and RowKey ge @rollup",
+        parameters={'low': low, 'high': f"{EVENT_PARTITION_PREFIX}~", 'rollup': ROLLUP_ROW_PREFIX},
+        select=['Page', 'Count'],
+    ):
+        totals[entity.get('Page', '')] += entity.get('Count', 0)
+    return dict(totals)
@@ -0,0 +1,190 @@
+"""
+Latency and fault injection around a table client for load and retry testing
+
+Enabled with TABLE_FAULT_INJECTION, either inline JSON or @path/to/file.json:
+
+    {
+        "seed": 1234,
+        "operations": {
+            "*":          {"latency": {"distribution": "lognormal", "median_ms": 12, "sigma": 0.6}},
+            "read":       {"throttle_rate": 0.02, "unavailable_rate": 0.005},
+            "update_entity": {"precondition_rate": 0.05},
+            "submit_transaction": {"timeout_rate": 0.001, "timeout_seconds": 5}
+        }
+    }
+
+Each operation is configured by its TableClient method name, its type ("read"
+or "write") and "*", in that order of precedence. Latency distributions are
+fixed, uniform, normal, lognormal and exponential, optionally capped with
+max_ms. Faults raise the errors the SDK raises once its own retries give up:
+429 and 503 as HttpResponseError, 412 as ResourceModifiedError (or
+TableTransactionError for batches) and timeouts as ServiceResponseTimeoutError
+after waiting timeout_seconds. All draws come from one seeded generator, so a
+run is reproducible for a given seed and call order.
+"""
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+
+from azure.core.exceptions import HttpResponseError, ResourceModifiedError, ServiceResponseTimeoutError
+from azure.data.tables import TableTransactionError
+
+logger = logging.getLogger(__name__)
+
+READ_OPERATIONS = ("get_entity", "query_entities", "list_entities")
+WRITE_OPERATIONS = ("create_entity", "update_entity", "upsert_entity", "delete_entity", "submit_transaction")
+FAULT_KINDS = ("timeout", "throttle", "unavailable", "precondition")
+
+
+def latency_sampler(spec, rng):
+    """
+    Return a function drawing one latency in seconds from a distribution spec
+    """
+    if not spec:
+        return lambda: 0.0
+    distribution = spec.get("distribution", "fixed")
+    if distribution == "fixed":
+        draw = lambda: spec.get("ms", 0)
+    elif distribution == "uniform":
+        draw = lambda: rng.uniform(spec.get("min_ms", 0), spec["max_ms"])
+    elif distribution == "normal":
+        draw = lambda: rng.gauss(spec["mean_ms"], spec.get("stddev_ms", 0))
+    elif distribution == "lognormal":
+        mu = math.log(spec["median_ms"])
+        draw = lambda: rng.lognormvariate(mu, spec.get("sigma", 0.5))
+    elif distribution == "exponential":
+        draw = lambda: rng.expovariate(1.0 / spec["mean_ms"])
+    else:
+        raise ValueError(f"Unknown latency distribution: {distribution}")
+    cap = spec.get("max_ms")
+    return lambda: max(0.0, min(draw(), cap) if cap is not None else draw()) / 1000.0
+
+
+class FaultProfile:
+    """
+    Latency sampler and fault rates for one operation
+    """
+    __slots__ = ("latency", "rates", "timeout_seconds")
+
+    def __init__(self, spec, rng):
+        self.latency = latency_sampler(spec.get("latency"), rng)
+        self.rates = [(kind, float(spec.get(f"{kind}_rate", 0))) for kind in FAULT_KINDS]
+        self.timeout_seconds = float(spec.get("timeout_seconds", 5))
+
+    def pick_fault(self, draw, operation):
+        """
+        Map one uniform draw to a fault kind or None
+        """
+        threshold = 0.0
+        for kind, rate in self.rates:
+            if kind == "precondition" and operation not in WRITE_OPERATIONS:
+                continue
+            threshold += rate
+            if draw < threshold:
+                return kind
+        return None
+
+
+def _http_error(error_type, status_code, error_code, message):
+    error = error_type(message=message)
+    error.status_code = status_code
+    error.error_code = error_code
+    return error
+
+
+class FaultInjectingTableClient:
+    """
+    Table client proxy that delays calls and raises configured faults
+    """
+
+    def __init__(self, table_client, operations=None, seed=None, sleep=time.sleep):
+        self._inner = table_client
+        self._specs = operations or {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._sleep = sleep
+        self._profiles = {}
+        self.calls = {}
+        self.faults = {kind: 0 for kind in FAULT_KINDS}
+        self.injected_delay = 0.0
+
+    def _profile(self, operation):
+        profile = self._profiles.get(operation)
+        if profile is None:
+            group = "read" if operation in READ_OPERATIONS else "write"
+            spec = {}
+            for key in ("*", group, operation):
+                spec.update(self._specs.get(key, {}))
+            profile = self._profiles[operation] = FaultProfile(spec, self._rng)
+        return profile
+
+    def _inject(self, operation):
+        with self._lock:
+            profile = self._profile(operation)
+            delay = profile.latency()
+            fault = profile.pick_fault(self._rng.random(), operation)
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+            self.injected_delay += delay
+            if fault is not None:
+                self.faults[fault] += 1
+        if delay:
+            self._sleep(delay)
+        if fault == "timeout":
+            self._sleep(profile.timeout_seconds)
+            raise ServiceResponseTimeoutError(f"Injected timeout in {operation}")
+        if fault == "throttle":
+            raise _http_error(HttpResponseError, 429, "TooManyRequests", f"Injected 429 in {operation}")
+        if fault == "unavailable":
+            raise _http_error(HttpResponseError, 503, "ServiceUnavailable", f"Injected 503 in {operation}")
+        if fault == "precondition":
+            error_type = TableTransactionError if operation == "submit_transaction" else ResourceModifiedError
+            raise _http_error(error_type, 412, "UpdateConditionNotSatisfied", f"Injected 412 in {operation}")
+
+    def __getattr__(self, name):
+        attribute = getattr(self._inner, name)
+        if name not in READ_OPERATIONS and name not in WRITE_OPERATIONS:
+            return attribute
+
+        def call(*args, **kwargs):
+            self._inject(name)
+            return attribute(*args, **kwargs)
+        return call
+
+    def stats(self):
+        """
+        Return injected call, fault and delay counters
+        """
+        with self._lock:
+            return {
+                'calls': dict(self.calls),
+                'faults': dict(self.faults),
+                'injectedDelaySeconds': round(self.injected_delay, 3),
+            }
+
+
+def load_fault_config(value=None):
+    """
+    Parse TABLE_FAULT_INJECTION (inline JSON or @file), or return None when unset
+    """
+    value = value if value is not None else os.environ.get('TABLE_FAULT_INJECTION')
+    if not value:
+        return None
+    if value.startswith("@"):
+        with open(value[1:], encoding="utf-8") as f:
+            return json.load(f)
+    return json.loads(value)
+
+
+def wrap_table_client(table_client, config=None):
+    """
+    Wrap a table client with fault injection when configured, else return it unchanged
+    """
+    config = config if config is not None else load_fault_config()
+    if not config:
+        return table_client
+    logger.warning("Table fault injection is enabled; storage calls will be delayed and fail on purpose")
+    return FaultInjectingTableClient(table_client, config.get("operations"), seed=config.get("seed"))
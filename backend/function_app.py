@@ -3,10 +3,37 @@ import json
 import logging
 import os
 from datetime import datetime, timezone
-from azure.data.tables import TableServiceClient, TableEntity
-from azure.core.exceptions import ResourceNotFoundError, ServiceRequestError
+from azure.data.tables import TableServiceClient, UpdateMode
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    ResourceExistsError, ResourceModifiedError, ResourceNotFoundError, ServiceRequestError
+)
 from azure.core.credentials import AzureKeyCredential
-import uuid
+import threading
+
+from single_flight import SingleFlight
+from event_log import VisitEventLog, compact_events
+from rate_limiter import TokenBucketLimiter, client_key
+from visit_filter import RotatingVisitFilter
+from beacon import DeferredIncrementQueue
+from api.count_snapshot import CountSnapshot
+from increment_journal import IncrementJournal
+from host_accumulator import HostAccumulator
+from live_updates import LiveCountWatcher
+from idempotency import IdempotencyConflict, IdempotencyStore, StoredResponse
+from counter_record import (
+    COUNT_PROJECTION, COUNTER_PARTITION_KEY, COUNTER_ROW_KEY, STATS_PROJECTION, CounterRecord
+)
+from counter_migration import CounterMigration
+from fault_injection import FaultInjectingTableClient, wrap_table_client
+from adaptive_limiter import AdaptiveConcurrencyLimiter, LimitedTableClient
+from request_units import RequestUnitMeter
+from hedged_reads import HedgedReader
+from read_routing import ReadRouter, geo_replication_probe
+from approximate_counter import ApproximateCounter
+from gcounter import GCounter
+from request_profiler import profiler_from_environment
+from traffic_trace import trace_recorder_from_environment
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,6 +42,79 @@ logger = logging.getLogger(__name__)
 # Initialize the Azure Function App
 app = func.FunctionApp()
 
+# Last committed count persisted locally, loaded at startup so restarts do not serve 0
+count_snapshot = CountSnapshot(os.environ.get('COUNT_SNAPSHOT_PATH'))
+
+# Request charges of every table call, per route and operation, with an optional RU/s budget
+ru_meter = RequestUnitMeter(
+    window_seconds=int(os.environ.get('RU_WINDOW_SECONDS', '10')),
+    ceiling=float(os.environ['RU_BUDGET_PER_SECOND']) if os.environ.get('RU_BUDGET_PER_SECOND') else None,
+    threshold=float(os.environ.get('RU_BUDGET_THRESHOLD', '0.8'))
+)
+
+# Opt-in sampling profiler around the route handlers (PROFILER_ENABLED)
+request_profiler = profiler_from_environment()
+
+# Opt-in compact trace of counter traffic for replay benchmarks (TRAFFIC_TRACE_PATH)
+traffic_trace = trace_recorder_from_environment()
+
+# One adaptive concurrency limit shared by every table call in this worker
+storage_limiter = None
+if os.environ.get('TABLE_CONCURRENCY_LIMIT_ENABLED', 'true').lower() == 'true':
+    storage_limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=int(os.environ.get('TABLE_CONCURRENCY_INITIAL', '16')),
+        min_limit=int(os.environ.get('TABLE_CONCURRENCY_MIN', '1')),
+        max_limit=int(os.environ.get('TABLE_CONCURRENCY_MAX', '64')),
+        latency_tolerance=float(os.environ.get('TABLE_CONCURRENCY_LATENCY_TOLERANCE', '2.0')),
+        max_queue=int(os.environ.get('TABLE_CONCURRENCY_QUEUE', '64')),
+        queue_timeout=float(os.environ.get('TABLE_CONCURRENCY_QUEUE_TIMEOUT_SECONDS', '2')),
+        warmup_samples=int(os.environ.get('TABLE_CONCURRENCY_WARMUP_SAMPLES', '5'))
+    )
+
+def instrument_table_client(table_client):
+    """
+    Apply configured fault injection and the worker's concurrency limit to a table client
+    """
+    table_client = wrap_table_client(table_client)
+    if storage_limiter is not None:
+        table_client = LimitedTableClient(table_client, storage_limiter)
+    return table_client
+
+def table_client_layer(table_client, layer_type):
+    """
+    Walk the wrappers instrument_table_client applied and return the layer of layer_type, or None
+    """
+    while isinstance(table_client, (LimitedTableClient, FaultInjectingTableClient)):
+        if isinstance(table_client, layer_type):
+            return table_client
+        table_client = table_client._inner
+    return None
+
+def create_table_service_client():
+    """
+    Create a Table service client from the COSMOS_DB_* settings
+    """
+    account_name = os.environ.get('COSMOS_DB_ACCOUNT_NAME', 'cosmos-resume-1760986821')
+    account_key = os.environ.get('COSMOS_DB_KEY')
+    connection_string = os.environ.get('COSMOS_DB_CONNECTION_STRING')
+    
+    if not connection_string and not account_key:
+        raise ValueError("CosmosDB connection string or account key not found in environment variables")
+    
+    # Create Table Service Client using connection string (preferred for CosmosDB)
+    if connection_string:
+        return TableServiceClient.from_connection_string(
+            conn_str=connection_string, raw_response_hook=ru_meter.response_hook
+        )
+    
+    # Fallback to endpoint + key
+    account_url = f"https://{account_name}.table.cosmos.azure.com/"
+    return TableServiceClient(
+        endpoint=account_url,
+        credential=AzureKeyCredential(account_key),
+        raw_response_hook=ru_meter.response_hook
+    )
+
 class TableStorageManager:
     """
     Manages Azure Table Storage operations for visitor counter
@@ -29,26 +129,115 @@ class TableStorageManager:
             self.table_name = os.environ.get('COSMOS_DB_TABLE', 'VisitorCounter')
             self.connection_string = os.environ.get('COSMOS_DB_CONNECTION_STRING')
             
-            if not self.connection_string and not self.account_key:
-                raise ValueError("CosmosDB connection string or account key not found in environment variables")
+            self.table_service_client = create_table_service_client()
+            
+            # Get table client, wrapped with the concurrency limit and any injected faults
+            self.table_client = instrument_table_client(self.table_service_client.get_table_client(
+                table_name=self.table_name
+            ))
+            
+            # Collapse concurrent identical reads and cold-start initialization
+            self.single_flight = SingleFlight()
             
-            # Create Table Service Client using connection string (preferred for CosmosDB)
-            if self.connection_string:
-                self.table_service_client = TableServiceClient.from_connection_string(
-                    conn_str=self.connection_string
+            # Conditional counter writes that lose a race re-read and retry this many times
+            self.max_update_attempts = int(os.environ.get('COUNTER_UPDATE_MAX_ATTEMPTS', '5'))
+            
+            # Optionally serve GET count and stats from a secondary endpoint; writes stay here
+            self.read_router = None
+            read_connection = os.environ.get('TABLE_READ_CONNECTION_STRING')
+            if read_connection:
+                read_service = TableServiceClient.from_connection_string(
+                    conn_str=read_connection, raw_response_hook=ru_meter.response_hook
                 )
-            else:
-                # Fallback to endpoint + key
-                account_url = f"https://{self.account_name}.table.cosmos.azure.com/"
-                self.table_service_client = TableServiceClient(
-                    endpoint=account_url,
-                    credential=AzureKeyCredential(self.account_key)
+                self.read_router = ReadRouter(
+                    self.table_client,
+                    instrument_table_client(read_service.get_table_client(table_name=self.table_name)),
+                    max_staleness=float(os.environ.get('TABLE_READ_MAX_STALENESS_SECONDS', '30')),
+                    cooldown=float(os.environ.get('TABLE_READ_FALLBACK_SECONDS', '30')),
+                    sync_probe=geo_replication_probe(read_service)
                 )
             
-            # Get table client
-            self.table_client = self.table_service_client.get_table_client(
-                table_name=self.table_name
+            # Optional probabilistic counting: most visits skip the storage write
+            self.approximate = None
+            if os.environ.get('COUNTER_MODE', 'exact').lower() == 'approximate':
+                self.approximate = ApproximateCounter(
+                    self.table_client,
+                    relative_error=float(os.environ.get('APPROXIMATE_RELATIVE_ERROR', '0.05'))
+                )
+            
+            # Optional active-active mode: each region counts in its own grow-only row
+            self.gcounter = None
+            if os.environ.get('COUNTER_MODE', 'exact').lower() == 'crdt':
+                peer_client = None
+                peer_connection = os.environ.get('GCOUNTER_PEER_CONNECTION_STRING')
+                if peer_connection:
+                    peer_service = TableServiceClient.from_connection_string(
+                        conn_str=peer_connection, raw_response_hook=ru_meter.response_hook
+                    )
+                    peer_client = instrument_table_client(peer_service.get_table_client(
+                        table_name=os.environ.get('GCOUNTER_PEER_TABLE_NAME', self.table_name)
+                    ))
+                self.gcounter = GCounter(
+                    self.table_client,
+                    os.environ.get('GCOUNTER_REPLICA_ID') or os.environ.get('REGION_NAME', 'local'),
+                    peer_client=peer_client
+                )
+            
+            # Optionally re-issue counter reads that run past the recent p95
+            self.hedger = None
+            if os.environ.get('HEDGED_READS_ENABLED', 'false').lower() == 'true':
+                self.hedger = HedgedReader(
+                    percentile=float(os.environ.get('HEDGE_PERCENTILE', '0.95')),
+                    min_delay=float(os.environ.get('HEDGE_MIN_DELAY_MS', '5')) / 1000,
+                    max_delay=float(os.environ.get('HEDGE_MAX_DELAY_MS', '1000')) / 1000,
+                    max_hedge_ratio=float(os.environ.get('HEDGE_MAX_RATIO', '0.1'))
+                )
+            self._table_ready = False
+            
+            # Last count this worker read or committed, served for suppressed repeat visits
+            # and whenever storage is unavailable
+            self.last_count = count_snapshot.count
+            
+            # Increments that failed to reach storage are journaled locally and replayed;
+            # the journal replays into the exact row, so CRDT mode goes without it
+            self.journal = None
+            journal_enabled = os.environ.get('INCREMENT_JOURNAL_ENABLED', 'true').lower() == 'true'
+            if journal_enabled and self.gcounter is None:
+                self.journal = IncrementJournal(
+                    os.environ.get('INCREMENT_JOURNAL_PATH'),
+                    replay_interval=float(os.environ.get('INCREMENT_JOURNAL_REPLAY_SECONDS', '5'))
+                )
+                if self.journal.has_pending():
+                    self.journal.start(self.replay_journal)
+                self.replay_orphaned_journals()
+            
+            # Worker processes on one host share an accumulator and one elected flusher
+            self.accumulator = None
+            worker_processes = max(
+                int(os.environ.get(name) or 1)
+                for name in ('FUNCTIONS_WORKER_PROCESS_COUNT', 'WEB_CONCURRENCY', 'SERVER_WORKERS')
             )
+            default_accumulator = 'true' if worker_processes > 1 else 'false'
+            if os.environ.get('HOST_ACCUMULATOR_ENABLED', default_accumulator).lower() == 'true':
+                self.accumulator = HostAccumulator(
+                    commit=self.commit_increment,
+                    name=os.environ.get('HOST_ACCUMULATOR_NAME', f"vc-{self.table_name}"),
+                    flush_interval=float(os.environ.get('HOST_ACCUMULATOR_FLUSH_SECONDS', '1'))
+                )
+            
+            # Optional online migration from the legacy visitor/counter layout
+            self.migration = None
+            migration_mode = os.environ.get('COUNTER_MIGRATION_MODE', 'off').lower()
+            if migration_mode != 'off':
+                legacy_connection = (os.environ.get('LEGACY_STORAGE_CONNECTION_STRING')
+                                     or os.environ.get('AzureWebJobsStorage'))
+                if legacy_connection:
+                    legacy_client = instrument_table_client(TableServiceClient.from_connection_string(
+                        conn_str=legacy_connection, raw_response_hook=ru_meter.response_hook
+                    ).get_table_client(table_name=os.environ.get('LEGACY_TABLE_NAME', 'VisitorCounter')))
+                    self.migration = CounterMigration(self.table_client, legacy_client, mode=migration_mode)
+                else:
+                    logger.warning("COUNTER_MIGRATION_MODE is set but no legacy storage connection is configured")
             
             logger.info("Table Storage client initialized successfully")
             
@@ -56,18 +245,124 @@ class TableStorageManager:
             logger.error(f"Failed to initialize Table Storage client: {str(e)}")
             raise
 
+    def _fetch_counter(self, select=COUNT_PROJECTION, table_client=None):
+        """
+        Fetch only the projected counter properties plus the ETag
+        """
+        entity = (table_client or self.table_client).get_entity(
+            partition_key=COUNTER_PARTITION_KEY,
+            row_key=COUNTER_ROW_KEY,
+            select=list(select)
+        )
+        return CounterRecord.from_entity(entity)
+
+    def _fetch_routed_counter(self, select=COUNT_PROJECTION):
+        """
+        Fetch the counter from the secondary endpoint when it is usable, else the primary
+        """
+        return self.read_router.read(lambda table_client: self._fetch_counter(select, table_client))
+
+    def _read_counter(self, select=COUNT_PROJECTION, routed=False):
+        """
+        Read the counter record, sharing one storage call across concurrent readers
+        """
+        fetch = self._fetch_counter
+        if routed and self.read_router is not None:
+            fetch = self._fetch_routed_counter
+        key = ("get_entity", COUNTER_PARTITION_KEY, COUNTER_ROW_KEY, tuple(select), fetch.__name__)
+        if self.hedger is not None:
+            # Slow reads get a second attempt; the first to finish is shared with every waiter
+            return self.single_flight.do(key, self.hedger.run, fetch, select)
+        return self.single_flight.do(key, fetch, select)
+
+    def ensure_table(self):
+        """
+        Create the counter table once per worker, collapsing concurrent attempts
+        """
+        if self._table_ready:
+            return
+        self.single_flight.do(("create_table", self.table_name), self._create_table)
+
+    def _create_table(self):
+        """
+        Create the counter table if it does not exist yet
+        """
+        if self._table_ready:
+            return
+        try:
+            self.table_client.create_table()
+            logger.info(f"Table {self.table_name} created")
+        except ResourceExistsError:
+            logger.info(f"Table {self.table_name} already exists")
+        self._table_ready = True
+
+    def _remember_count(self, count, version=None, written=False):
+        """
+        Keep the latest committed count in memory and in the local snapshot
+        """
+        self.last_count = count
+        if written and self.read_router is not None:
+            # Lets the router detect a secondary that is behind this worker's own writes
+            self.read_router.note_write(count)
+        if written and version is not None:
+            live_count_watcher.publish(count, version)
+        try:
+            count_snapshot.store(count, version)
+        except Exception as e:
+            logger.warning(f"Failed to update count snapshot: {str(e)}")
+
+    def _approximate_count(self, amount=0):
+        """
+        Add visits to the approximate counter (or just read it), seeding it from the exact count
+        """
+        try:
+            return self.approximate.add(amount) if amount else self.approximate.read()
+        except ResourceNotFoundError:
+            try:
+                exact = self._fetch_counter().count
+            except ResourceNotFoundError:
+                exact = 0
+            self.approximate.seed(exact)
+            return self.approximate.add(amount) if amount else self.approximate.estimate()
+
+    def _crdt_count(self, amount=0):
+        """
+        Add visits to this replica's row (or just read), seeding the baseline from the exact count once
+        """
+        if not self.gcounter.seeded:
+            try:
+                exact = self._fetch_counter().count
+            except ResourceNotFoundError:
+                exact = 0
+            self.gcounter.seed(exact)
+        return self.gcounter.increment(amount) if amount else self.gcounter.value()
+
     def get_visitor_count(self):
         """
         Retrieve current visitor count from Table Storage
         """
         try:
+            if self.gcounter is not None:
+                count = self._crdt_count()
+                self._remember_count(count, f"crdt-{count}")
+                return count
+            
+            if self.approximate is not None:
+                count = self._approximate_count()
+                self._remember_count(count, self.approximate.version)
+                return count
+            
+            if self.migration is not None and self.migration.dual:
+                # Merge both layouts until cutover
+                state = self.migration.read_merged()
+                self._remember_count(state.total, state.version)
+                return state.total
+            
             # Query for the visitor counter entity
-            entity = self.table_client.get_entity(
-                partition_key="visitor-counter",
-                row_key="count"
-            )
+            record = self._read_counter(routed=True)
             
-            count = entity.get('Count', 0)
+            count = record.count
+            self._remember_count(count, record.version)
             logger.info(f"Retrieved visitor count: {count}")
             return count
             
@@ -76,94 +371,246 @@ class TableStorageManager:
             return self.initialize_counter()
         except Exception as e:
             logger.error(f"Error retrieving visitor count: {str(e)}")
-            # Return 0 instead of raising error for better UX
-            return 0
+            # Serve the last known count (or 0) instead of raising error for better UX
+            return self.last_count or 0
 
-    def increment_visitor_count(self):
+    def increment_visitor_count(self, amount=1):
         """
         Increment and return the visitor count
         """
-        try:
-            # Try to get existing counter
+        if self.accumulator is not None:
+            # The host's flusher process commits the summed delta on an interval
+            self.accumulator.add(amount)
+            return (self.last_count or 0) + self.accumulator.pending()
+        return self.commit_increment(amount)
+
+    def commit_increment(self, amount=1):
+        """
+        Write an increment to Table Storage and return the new count
+        """
+        if self.approximate is not None:
             try:
-                entity = self.table_client.get_entity(
-                    partition_key="visitor-counter",
-                    row_key="count"
-                )
-                current_count = entity.get('Count', 0)
-                etag = entity.metadata['etag']
-            except ResourceNotFoundError:
-                # Counter doesn't exist, start with 0
-                current_count = 0
-                etag = None
-            
-            # Increment the count
-            new_count = current_count + 1
-            
-            # Create or update the counter entity
-            counter_entity = TableEntity()
-            counter_entity['PartitionKey'] = "visitor-counter"
-            counter_entity['RowKey'] = "count"
-            counter_entity['Count'] = new_count
-            counter_entity['LastUpdated'] = datetime.now(timezone.utc)
-            counter_entity['Version'] = str(uuid.uuid4())
+                new_count = self._approximate_count(amount)
+                self._remember_count(new_count, self.approximate.version, written=True)
+                return new_count
+            except Exception as e:
+                # Approximate visits are not journaled; losing a few only widens the error slightly
+                logger.error(f"Error updating approximate visitor count: {str(e)}")
+                return (self.last_count or 0) + amount
+        
+        if self.journal is not None and self.journal.has_pending():
+            # Storage is still catching up on an outage; keep increments ordered behind the journal
+            return self._journal_increment(amount)
+        
+        try:
+            if self.gcounter is not None:
+                new_count = self._crdt_count(amount)
+                self._remember_count(new_count, f"crdt-{new_count}", written=True)
+                logger.info(f"Visitor count incremented to: {new_count} (replica {self.gcounter.replica_id})")
+                return new_count
+            if self.migration is not None and self.migration.dual:
+                new_count = self.migration.commit(amount)
+                self._remember_count(new_count, written=True)
+                logger.info(f"Visitor count incremented to: {new_count} (dual write)")
+                return new_count
             
-            if etag:
-                # Update existing entity
-                self.table_client.update_entity(
-                    entity=counter_entity,
-                    mode="replace"
-                )
-            else:
-                # Create new entity
-                self.table_client.create_entity(entity=counter_entity)
+            for attempt in range(self.max_update_attempts):
+                # Try to get existing counter
+                try:
+                    record = self._fetch_counter()
+                    exists = True
+                except ResourceNotFoundError:
+                    # Counter doesn't exist, start with 0
+                    record = CounterRecord(created_at=datetime.now(timezone.utc))
+                    exists = False
+                
+                # Increment the count
+                record.count += amount
+                
+                try:
+                    if exists:
+                        # Merge only the changed Count property, and only over the count just read
+                        metadata = self.table_client.update_entity(
+                            entity=record.count_entity(),
+                            mode=UpdateMode.MERGE,
+                            etag=record.etag,
+                            match_condition=MatchConditions.IfNotModified
+                        )
+                    else:
+                        # Create new entity
+                        metadata = self.table_client.create_entity(entity=record.new_entity())
+                    break
+                except (ResourceModifiedError, ResourceExistsError):
+                    # Another writer committed between our read and write; re-read and retry
+                    if attempt == self.max_update_attempts - 1:
+                        raise
+                    logger.info(f"Visitor count changed during increment, retrying (attempt {attempt + 1})")
             
+            new_count = record.count
+            self._remember_count(new_count, (metadata or {}).get('etag'), written=True)
             logger.info(f"Visitor count incremented to: {new_count}")
             return new_count
             
         except Exception as e:
             logger.error(f"Error incrementing visitor count: {str(e)}")
-            # Return current count + 1 as fallback
+            if self.journal is not None:
+                return self._journal_increment(amount)
+            # Return current count + amount as fallback
             current = self.get_visitor_count()
-            return current + 1
+            return current + amount
+
+    def _journal_increment(self, amount):
+        """
+        Record an increment in the local journal and return the expected count
+        """
+        self.journal.append(amount)
+        self.journal.start(self.replay_journal)
+        return (self.last_count or 0) + self.journal.pending_amount
+
+    def replay_orphaned_journals(self):
+        """
+        Replay the journals of workers that died without replaying them, then release their slots
+        """
+        for orphan in self.journal.adopt_orphans():
+            try:
+                while orphan.has_pending() and self.replay_journal(journal=orphan):
+                    pass
+            except Exception as e:
+                # Records stay on disk and the next worker to start picks the slot up again
+                logger.warning(f"Replay of orphaned journal {orphan.path} deferred: {str(e)}")
+            finally:
+                orphan.close()
+
+    def replay_journal(self, max_records=10000, journal=None):
+        """
+        Apply pending journal records to Table Storage in one idempotent batch
+        """
+        journal = journal or self.journal
+        entries = journal.pending_entries(limit=max_records)
+        if not entries:
+            return 0
+        
+        # The marker row records how far this journal has been applied
+        marker_key = f"journal-{journal.journal_id}"
+        try:
+            marker = self.table_client.get_entity(
+                partition_key=COUNTER_PARTITION_KEY, row_key=marker_key, select=['AppliedThrough']
+            )
+            applied_through = marker.get('AppliedThrough', 0)
+        except ResourceNotFoundError:
+            applied_through = 0
+        
+        entries = [(sequence, amount) for sequence, amount in entries if sequence > applied_through]
+        if not entries:
+            journal.mark_applied(applied_through)
+            return 0
+        
+        amount = sum(a for _, a in entries)
+        through = entries[-1][0]
+        try:
+            record = self._fetch_counter()
+        except ResourceNotFoundError:
+            record = CounterRecord(created_at=datetime.now(timezone.utc))
+        record.count += amount
+        new_count = record.count
+        
+        marker_entity = {
+            'PartitionKey': COUNTER_PARTITION_KEY,
+            'RowKey': marker_key,
+            'AppliedThrough': through,
+        }
+        
+        # Counter and marker commit together, so a retried replay is a no-op
+        if record.etag:
+            counter_operation = ("update", record.count_entity(), {
+                "mode": UpdateMode.MERGE, "etag": record.etag, "match_condition": MatchConditions.IfNotModified
+            })
+        else:
+            counter_operation = ("create", record.new_entity())
+        self.table_client.submit_transaction([counter_operation, ("upsert", marker_entity)])
+        
+        journal.mark_applied(through)
+        self._remember_count(new_count, written=True)
+        logger.info(f"Replayed {amount} journaled increments, visitor count now {new_count}")
+        return amount
 
     def initialize_counter(self):
         """
         Initialize the visitor counter with count 1
         """
+        return self.single_flight.do(("initialize_counter",), self._initialize_counter)
+
+    def _initialize_counter(self):
+        """
+        Create the counter entity, tolerating a concurrent creator
+        """
         try:
-            counter_entity = TableEntity()
-            counter_entity['PartitionKey'] = "visitor-counter"
-            counter_entity['RowKey'] = "count"
-            counter_entity['Count'] = 1
-            counter_entity['LastUpdated'] = datetime.now(timezone.utc)
-            counter_entity['Version'] = str(uuid.uuid4())
-            counter_entity['CreatedAt'] = datetime.now(timezone.utc)
+            self.ensure_table()
             
-            self.table_client.create_entity(entity=counter_entity)
+            record = CounterRecord(count=1, created_at=datetime.now(timezone.utc))
+            metadata = self.table_client.create_entity(entity=record.new_entity())
+            self._remember_count(1, (metadata or {}).get('etag'), written=True)
             logger.info("Visitor counter initialized with count: 1")
             return 1
             
+        except ResourceExistsError:
+            # Another worker initialized the counter first
+            try:
+                return self._read_counter().count
+            except Exception as e:
+                logger.error(f"Error reading initialized visitor counter: {str(e)}")
+                return 1
         except Exception as e:
             logger.error(f"Error initializing visitor counter: {str(e)}")
             return 1
 
+    def get_counter_version(self):
+        """
+        Return the current count and entity version for change detection
+        """
+        try:
+            if self.approximate is not None:
+                return self._approximate_count(), self.approximate.version
+            if self.gcounter is not None:
+                count = self._crdt_count()
+                return count, f"crdt-{count}"
+            if self.migration is not None and self.migration.dual:
+                state = self.migration.read_merged()
+                return state.total, state.version
+            record = self._read_counter()
+            return record.count, record.version
+        except ResourceNotFoundError:
+            return 0, ''
+
     def get_visitor_stats(self):
         """
         Get comprehensive visitor statistics
         """
         try:
-            entity = self.table_client.get_entity(
-                partition_key="visitor-counter",
-                row_key="count"
-            )
-            
-            return {
-                'count': entity.get('Count', 0),
-                'lastUpdated': entity.get('LastUpdated', '').isoformat() if entity.get('LastUpdated') else None,
-                'createdAt': entity.get('CreatedAt', '').isoformat() if entity.get('CreatedAt') else None,
-                'version': entity.get('Version', ''),
-            }
+            if self.approximate is not None:
+                # The exact row only carries the creation time once the register takes over
+                return {
+                    'count': self._approximate_count(),
+                    'lastUpdated': None,
+                    'createdAt': None,
+                    'version': self.approximate.version,
+                    **self.approximate.describe(),
+                }
+            if self.gcounter is not None:
+                count = self._crdt_count()
+                return {
+                    'count': count,
+                    'lastUpdated': None,
+                    'createdAt': None,
+                    'version': f"crdt-{count}",
+                    **self.gcounter.describe(),
+                }
+            stats = self._read_counter(STATS_PROJECTION, routed=True).to_stats()
+            if self.migration is not None and self.migration.dual:
+                state = self.migration.read_merged()
+                stats['count'] = state.total
+                stats['version'] = state.version
+            return stats
             
         except ResourceNotFoundError:
             return {
@@ -175,7 +622,7 @@ class TableStorageManager:
         except Exception as e:
             logger.error(f"Error getting visitor stats: {str(e)}")
             return {
-                'count': 0,
+                'count': self.last_count or 0,
                 'lastUpdated': None,
                 'createdAt': None,
                 'version': '',
@@ -184,6 +631,7 @@ class TableStorageManager:
 
 # Initialize Table Storage Manager
 table_manager = None
+_table_manager_lock = threading.Lock()
 
 def get_table_manager():
     """
@@ -191,16 +639,414 @@ def get_table_manager():
     """
     global table_manager
     if table_manager is None:
-        table_manager = TableStorageManager()
+        with _table_manager_lock:
+            if table_manager is None:
+                table_manager = TableStorageManager()
     return table_manager
 
+_warmup_started = False
+
+def warm_table_manager():
+    """
+    Create the table manager and prime its connection in the background
+    """
+    global _warmup_started
+    with _table_manager_lock:
+        if _warmup_started:
+            return
+        _warmup_started = True
+    
+    def warm():
+        try:
+            get_table_manager().get_visitor_count()
+        except Exception as e:
+            logger.error(f"Table manager warm-up failed: {str(e)}")
+    
+    threading.Thread(target=warm, name="table-manager-warmup", daemon=True).start()
+
+# Optional per-visit event log, enabled with VISIT_EVENT_LOG_ENABLED=true
+visit_event_log = None
+_visit_event_log_lock = threading.Lock()
+
+def get_visit_event_log():
+    """
+    Get or create the visit event log, or None when it is disabled
+    """
+    global visit_event_log
+    if os.environ.get('VISIT_EVENT_LOG_ENABLED', 'false').lower() != 'true':
+        return None
+    if visit_event_log is None:
+        with _visit_event_log_lock:
+            if visit_event_log is None:
+                manager = get_table_manager()
+                table_client = instrument_table_client(manager.table_service_client.create_table_if_not_exists(
+                    table_name=os.environ.get('VISIT_EVENT_TABLE', 'VisitEvents')
+                ))
+                visit_event_log = VisitEventLog(
+                    table_client,
+                    batch_size=int(os.environ.get('VISIT_EVENT_BATCH_SIZE', '50')),
+                    flush_interval=float(os.environ.get('VISIT_EVENT_FLUSH_SECONDS', '10')),
+                )
+    return visit_event_log
+
+def record_visit_event(req: func.HttpRequest):
+    """
+    Queue a visit event for the request without failing the increment
+    """
+    try:
+        event_log = get_visit_event_log()
+        if event_log is None:
+            return
+        try:
+            body = req.get_json()
+        except ValueError:
+            body = {}
+        if not isinstance(body, dict):
+            body = {}
+        page = body.get('page') or req.params.get('page') or req.headers.get('Referer', '')
+        referrer = body.get('referrer') or req.params.get('referrer')
+        event_log.record(page, referrer)
+    except Exception as e:
+        logger.error(f"Error recording visit event: {str(e)}")
+
+# Per-client rate limiting for POST increments, checked before any storage access
+increment_limiter = TokenBucketLimiter(
+    rate_per_second=float(os.environ.get('RATE_LIMIT_PER_MINUTE', '30')) / 60.0,
+    burst=int(os.environ.get('RATE_LIMIT_BURST', '10')),
+    max_clients=int(os.environ.get('RATE_LIMIT_MAX_CLIENTS', '10000'))
+)
+
+def rate_limit_response(req: func.HttpRequest):
+    """
+    Return a 429 response when the client has exhausted its increments, else None
+    """
+    if os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() != 'true':
+        return None
+    
+    allowed, retry_after = increment_limiter.acquire(client_key(req))
+    if allowed:
+        return None
+    
+    logger.warning(f"Rate limited visitor counter increment, retry after {retry_after}s")
+    return func.HttpResponse(
+        json.dumps({
+            "success": False,
+            "error": "Too many requests",
+            "retryAfter": retry_after,
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }),
+        status_code=429,
+        headers={
+            "Content-Type": "application/json",
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Expose-Headers": "Retry-After",
+            "Retry-After": str(retry_after),
+        }
+    )
+
+# Repeat-visit suppression so refreshes and in-site navigation do not cost a write.
+# Opt-in with VISIT_DEDUPE_ENABLED=true: it changes what the counter counts (visitors
+# per window rather than page loads), and clients behind one NAT address count once
+repeat_visit_filter = RotatingVisitFilter(
+    window_seconds=float(os.environ.get('VISIT_DEDUPE_WINDOW_SECONDS', '1800')),
+    capacity=int(os.environ.get('VISIT_DEDUPE_CAPACITY', '100000')),
+    error_rate=float(os.environ.get('VISIT_DEDUPE_ERROR_RATE', '0.001'))
+)
+
+def is_repeat_visit(req: func.HttpRequest):
+    """
+    Check whether this client already counted a visit within the dedupe window
+    """
+    if os.environ.get('VISIT_DEDUPE_ENABLED', 'false').lower() != 'true':
+        return False
+    key = client_key(req)
+    if key is None:
+        # Without an address every anonymous visitor would look like the same repeat visitor
+        return False
+    return repeat_visit_filter.seen_recently(key)
+
+# Beacon increments are acknowledged immediately and applied in batches after the response
+beacon_queue = DeferredIncrementQueue(
+    apply_increment=lambda amount: get_table_manager().increment_visitor_count(amount),
+    max_pending=int(os.environ.get('BEACON_MAX_PENDING', '1000')),
+    flush_interval=float(os.environ.get('BEACON_FLUSH_SECONDS', '0.5'))
+)
+
+def beacon_response(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Accept a navigator.sendBeacon increment and answer 204 before it is applied
+    """
+    if not is_repeat_visit(req):
+        if beacon_queue.submit():
+            record_visit_event(req)
+        else:
+            logger.warning("Beacon increment queue full, dropping increment")
+    
+    return func.HttpResponse(
+        status_code=204,
+        headers={
+            "Access-Control-Allow-Origin": "*",
+            "Cache-Control": "no-store",
+        }
+    )
+
+# Recent Idempotency-Key responses, optionally shared across instances through a table
+def create_idempotency_store():
+    """
+    Build the idempotency store from app settings
+    """
+    table_client = None
+    table_name = os.environ.get('IDEMPOTENCY_TABLE')
+    if table_name:
+        table_client = instrument_table_client(
+            get_table_manager().table_service_client.create_table_if_not_exists(table_name=table_name)
+        )
+    return IdempotencyStore(
+        ttl_seconds=float(os.environ.get('IDEMPOTENCY_TTL_SECONDS', '86400')),
+        max_keys=int(os.environ.get('IDEMPOTENCY_MAX_KEYS', '10000')),
+        lease_seconds=float(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', '30')),
+        table_client=table_client
+    )
+
+idempotency_store = None
+# Separate from _table_manager_lock: building the store calls get_table_manager()
+_idempotency_store_lock = threading.Lock()
+
+def get_idempotency_store():
+    """
+    Get or create the idempotency store
+    """
+    global idempotency_store
+    if idempotency_store is None:
+        with _idempotency_store_lock:
+            if idempotency_store is None:
+                idempotency_store = create_idempotency_store()
+    return idempotency_store
+
+# One upstream poller per worker wakes every long-poll and SSE client at once
+live_count_watcher = LiveCountWatcher(
+    read_current=lambda: get_table_manager().get_counter_version(),
+    poll_interval=float(os.environ.get('LIVE_COUNT_POLL_SECONDS', '2'))
+)
+
+def worker_diagnostics():
+    """
+    Collect in-worker counters from the request path helpers
+    """
+    diagnostics = {
+        "rateLimiter": increment_limiter.stats(),
+        "repeatVisits": repeat_visit_filter.stats(),
+        "beacon": beacon_queue.stats(),
+        "liveUpdates": live_count_watcher.stats(),
+    }
+    if idempotency_store is not None:
+        diagnostics["idempotency"] = idempotency_store.stats()
+    if table_manager is not None:
+        diagnostics["singleFlight"] = table_manager.single_flight.stats()
+        if table_manager.journal is not None:
+            diagnostics["journal"] = table_manager.journal.stats()
+        if table_manager.accumulator is not None:
+            diagnostics["hostAccumulator"] = table_manager.accumulator.stats()
+        if table_manager.migration is not None:
+            diagnostics["migration"] = table_manager.migration.stats()
+        if table_manager.hedger is not None:
+            diagnostics["hedgedReads"] = table_manager.hedger.stats()
+        if table_manager.read_router is not None:
+            diagnostics["readRouting"] = table_manager.read_router.stats()
+        if table_manager.approximate is not None:
+            diagnostics["approximateCounter"] = table_manager.approximate.stats()
+        if table_manager.gcounter is not None:
+            diagnostics["gCounter"] = table_manager.gcounter.stats()
+        fault_injector = table_client_layer(table_manager.table_client, FaultInjectingTableClient)
+        if fault_injector is not None:
+            diagnostics["faultInjection"] = fault_injector.stats()
+    if storage_limiter is not None:
+        diagnostics["storageLimiter"] = storage_limiter.stats()
+    diagnostics["requestUnits"] = ru_meter.stats()
+    if request_profiler.enabled:
+        diagnostics["profiler"] = request_profiler.stats()
+    if traffic_trace.enabled:
+        diagnostics["trafficTrace"] = traffic_trace.stats()
+    return diagnostics
+
+def visitor_counter_response(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Handle a visitor counter GET or POST after CORS preflight
+    """
+    if req.method == "POST":
+        limited = rate_limit_response(req)
+        if limited is not None:
+            return limited
+    
+        if req.params.get('mode') == "beacon":
+            return beacon_response(req)
+    
+    if req.method == "GET" and table_manager is None and count_snapshot.count is not None:
+        # Cold worker: answer from the local snapshot while storage warms up
+        warm_table_manager()
+        return func.HttpResponse(
+            json.dumps({
+                "success": True,
+                "count": count_snapshot.count,
+                "method": "GET",
+                "cached": True,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "message": "Last known visitor count served while storage warms up"
+            }),
+            status_code=200,
+            headers={
+                "Content-Type": "application/json",
+                "Access-Control-Allow-Origin": "*",
+                "Cache-Control": "no-cache, no-store, must-revalidate",
+                "Pragma": "no-cache",
+                "Expires": "0"
+            }
+        )
+    
+    # Get table manager
+    manager = get_table_manager()
+    
+    if req.method == "GET" and ru_meter.near_ceiling() and manager.last_count is not None:
+        # Close to the RU/s budget: serve the worker's last count instead of reading
+        ru_meter.cached_reads += 1
+        response_data = {
+            "success": True,
+            "count": manager.last_count,
+            "method": "GET",
+            "cached": True,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "message": "Last known visitor count served to stay within the request unit budget"
+        }
+    
+    elif req.method == "GET":
+        # Return current count without incrementing
+        count = manager.get_visitor_count()
+    
+        response_data = {
+            "success": True,
+            "count": count,
+            "method": "GET",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "message": "Current visitor count retrieved"
+        }
+    
+    elif req.method == "POST" and is_repeat_visit(req):
+        # Repeat visit within the window: serve the last known count without a write
+        count = manager.last_count
+        if count is None:
+            count = manager.get_visitor_count()
+    
+        response_data = {
+            "success": True,
+            "count": count,
+            "method": "POST",
+            "suppressed": True,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "message": "Repeat visit, visitor count not incremented"
+        }
+    
+    elif req.method == "POST" and ru_meter.near_ceiling() and beacon_queue.submit():
+        # Close to the RU/s budget: fold the increment into the next batched write
+        ru_meter.deferred_writes += 1
+        record_visit_event(req)
+    
+        response_data = {
+            "success": True,
+            "count": (manager.last_count or 0) + beacon_queue.stats()['pending'],
+            "method": "POST",
+            "deferred": True,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "message": "Visitor count increment deferred to stay within the request unit budget"
+        }
+    
+    elif req.method == "POST":
+        # Increment and return new count
+        count = manager.increment_visitor_count()
+        record_visit_event(req)
+    
+        response_data = {
+            "success": True,
+            "count": count,
+            "method": "POST",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "message": "Visitor count incremented"
+        }
+    
+    else:
+        return func.HttpResponse(
+            json.dumps({
+                "success": False,
+                "error": f"Method {req.method} not allowed",
+                "allowedMethods": ["GET", "POST", "OPTIONS"]
+            }),
+            status_code=405,
+            headers={
+                "Content-Type": "application/json",
+                "Access-Control-Allow-Origin": "*",
+            }
+        )
+    
+    if manager.approximate is not None:
+        # Make it obvious to clients that the count is an estimate
+        response_data.update(manager.approximate.describe())
+    
+    logger.info(f"Visitor counter response: {response_data}")
+    
+    return func.HttpResponse(
+        json.dumps(response_data),
+        status_code=200,
+        headers={
+            "Content-Type": "application/json",
+            "Access-Control-Allow-Origin": "*",
+            "Cache-Control": "no-cache, no-store, must-revalidate",
+            "Pragma": "no-cache",
+            "Expires": "0"
+        }
+    )
+
+def idempotent_response(req: func.HttpRequest, idempotency_key) -> func.HttpResponse:
+    """
+    Process a POST once per Idempotency-Key and replay the stored response for duplicates
+    """
+    def produce():
+        response = visitor_counter_response(req)
+        return StoredResponse(response.status_code, response.get_body(), dict(response.headers))
+    
+    try:
+        stored, replayed = get_idempotency_store().run(idempotency_key, produce)
+    except IdempotencyConflict:
+        return func.HttpResponse(
+            json.dumps({
+                "success": False,
+                "error": "A request with this Idempotency-Key is still being processed",
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }),
+            status_code=409,
+            headers={
+                "Content-Type": "application/json",
+                "Access-Control-Allow-Origin": "*",
+                "Retry-After": "1",
+            }
+        )
+    
+    headers = dict(stored.headers)
+    if replayed:
+        logger.info("Replaying stored response for duplicate Idempotency-Key")
+        headers["Idempotent-Replayed"] = "true"
+        headers["Access-Control-Expose-Headers"] = "Idempotent-Replayed"
+    return func.HttpResponse(stored.body, status_code=stored.status_code, headers=headers)
+
 @app.route(route="visitor-counter", methods=["GET", "POST", "OPTIONS"], auth_level=func.AuthLevel.ANONYMOUS)
+@ru_meter.track_route
+@request_profiler.profile_route
+@traffic_trace.record_route
 def visitor_counter(req: func.HttpRequest) -> func.HttpResponse:
     """
     Azure Function HTTP trigger for visitor counter
     
     GET: Returns current visitor count
     POST: Increments and returns visitor count
+    POST ?mode=beacon: Queues an increment and returns 204 immediately
     OPTIONS: CORS preflight support
     """
     
@@ -213,80 +1059,83 @@ def visitor_counter(req: func.HttpRequest) -> func.HttpResponse:
                 headers={
                     "Access-Control-Allow-Origin": "*",
                     "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
-                    "Access-Control-Allow-Headers": "Content-Type, Authorization",
+                    "Access-Control-Allow-Headers": "Content-Type, Authorization, Idempotency-Key",
                     "Access-Control-Max-Age": "86400",
                 }
             )
         
         logger.info(f"Visitor counter function triggered via {req.method}")
         
-        # Get table manager
-        manager = get_table_manager()
+        idempotency_key = req.headers.get('Idempotency-Key')
+        if req.method == "POST" and idempotency_key and req.params.get('mode') != "beacon":
+            return idempotent_response(req, idempotency_key)
         
-        if req.method == "GET":
-            # Return current count without incrementing
-            count = manager.get_visitor_count()
-            
-            response_data = {
-                "success": True,
-                "count": count,
-                "method": "GET",
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "message": "Current visitor count retrieved"
-            }
-            
-        elif req.method == "POST":
-            # Increment and return new count
-            count = manager.increment_visitor_count()
-            
-            response_data = {
-                "success": True,
-                "count": count,
-                "method": "POST",
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "message": "Visitor count incremented"
+        return visitor_counter_response(req)
+        
+    except Exception as e:
+        logger.error(f"Error in visitor counter function: {str(e)}")
+        
+        error_response = {
+            "success": False,
+            "error": "Internal server error",
+            "message": "Failed to process visitor counter request",
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }
+        
+        return func.HttpResponse(
+            json.dumps(error_response),
+            status_code=500,
+            headers={
+                "Content-Type": "application/json",
+                "Access-Control-Allow-Origin": "*",
             }
-            
-        else:
-            return func.HttpResponse(
-                json.dumps({
-                    "success": False,
-                    "error": f"Method {req.method} not allowed",
-                    "allowedMethods": ["GET", "POST", "OPTIONS"]
-                }),
-                status_code=405,
-                headers={
-                    "Content-Type": "application/json",
-                    "Access-Control-Allow-Origin": "*",
-                }
-            )
+        )
+
+@app.route(route="visitor-counter/updates", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
+@ru_meter.track_route
+@request_profiler.profile_route
+async def visitor_counter_updates(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Long-poll for a visitor count newer than the version the client already has
+    
+    GET ?since=<version>&timeout=<seconds>: waits until the version changes or the timeout passes.
+    Runs on the host's event loop, so a waiting client does not hold a worker thread.
+    """
+    try:
+        since = req.params.get('since') or None
+        try:
+            timeout = float(req.params.get('timeout', '25'))
+        except ValueError:
+            timeout = 25.0
+        timeout = max(0.0, min(timeout, float(os.environ.get('LIVE_COUNT_MAX_WAIT_SECONDS', '30'))))
         
-        logger.info(f"Visitor counter response: {response_data}")
+        count, version, changed = await live_count_watcher.wait_async(since, timeout)
         
         return func.HttpResponse(
-            json.dumps(response_data),
+            json.dumps({
+                "success": True,
+                "count": count,
+                "version": version,
+                "changed": changed,
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }),
             status_code=200,
             headers={
                 "Content-Type": "application/json",
                 "Access-Control-Allow-Origin": "*",
                 "Cache-Control": "no-cache, no-store, must-revalidate",
-                "Pragma": "no-cache",
-                "Expires": "0"
             }
         )
         
     except Exception as e:
-        logger.error(f"Error in visitor counter function: {str(e)}")
-        
-        error_response = {
-            "success": False,
-            "error": "Internal server error",
-            "message": "Failed to process visitor counter request",
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }
+        logger.error(f"Error in visitor counter updates function: {str(e)}")
         
         return func.HttpResponse(
-            json.dumps(error_response),
+            json.dumps({
+                "success": False,
+                "error": str(e),
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }),
             status_code=500,
             headers={
                 "Content-Type": "application/json",
@@ -295,6 +1144,9 @@ def visitor_counter(req: func.HttpRequest) -> func.HttpResponse:
         )
 
 @app.route(route="visitor-stats", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
+@ru_meter.track_route
+@request_profiler.profile_route
+@traffic_trace.record_route
 def visitor_stats(req: func.HttpRequest) -> func.HttpResponse:
     """
     Get detailed visitor statistics
@@ -308,6 +1160,7 @@ def visitor_stats(req: func.HttpRequest) -> func.HttpResponse:
         response_data = {
             "success": True,
             "stats": stats,
+            "worker": worker_diagnostics(),
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
         
@@ -337,6 +1190,8 @@ def visitor_stats(req: func.HttpRequest) -> func.HttpResponse:
         )
 
 @app.route(route="health", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
+@ru_meter.track_route
+@request_profiler.profile_route
 def health_check(req: func.HttpRequest) -> func.HttpResponse:
     """
     Health check endpoint
@@ -378,4 +1233,70 @@ def health_check(req: func.HttpRequest) -> func.HttpResponse:
                 "Content-Type": "application/json",
                 "Access-Control-Allow-Origin": "*",
             }
-        )# Deployment test Tue Oct 21 01:40:04 AM PKT 2025
+        )
+
+# Timers are only registered for the features that need them, so a default
+# deployment does not wake the host (and touch storage) on a schedule
+if os.environ.get('VISIT_EVENT_LOG_ENABLED', 'false').lower() == 'true':
+    @app.timer_trigger(schedule="0 */15 * * * *", arg_name="timer", run_on_startup=False, use_monitor=False)
+    def compact_visit_events(timer: func.TimerRequest) -> None:
+        """
+        Fold old visit events into rollup totals and delete them in bulk
+        """
+        try:
+            event_log = get_visit_event_log()
+            if event_log is None:
+                return
+        
+            # Make sure this worker's buffered events are not left behind
+            event_log.flush()
+            compacted = compact_events(
+                event_log.table_client,
+                older_than_hours=int(os.environ.get('VISIT_EVENT_RETENTION_HOURS', '24'))
+            )
+            logger.info(f"Visit event compaction finished: {compacted} events folded")
+        
+        except Exception as e:
+            logger.error(f"Error compacting visit events: {str(e)}")
+
+if os.environ.get('IDEMPOTENCY_TABLE'):
+    @app.timer_trigger(schedule="0 */15 * * * *", arg_name="timer", run_on_startup=False, use_monitor=False)
+    def purge_idempotency_keys(timer: func.TimerRequest) -> None:
+        """
+        Delete stored idempotency keys whose retention window has passed
+        """
+        try:
+            purged = get_idempotency_store().purge_expired()
+            logger.info(f"Purged {purged} expired idempotency keys")
+        except Exception as e:
+            logger.error(f"Error purging idempotency keys: {str(e)}")
+
+if os.environ.get('COUNTER_MIGRATION_MODE', 'off').lower() != 'off':
+    @app.timer_trigger(schedule="0 */5 * * * *", arg_name="timer", run_on_startup=True, use_monitor=False)
+    def backfill_legacy_counter(timer: func.TimerRequest) -> None:
+        """
+        Fold visits counted in the legacy layout into the primary counter
+        """
+        try:
+            migration = get_table_manager().migration
+            if migration is not None:
+                moved = migration.backfill()
+                logger.info(f"Legacy counter backfill finished: {moved} visits folded")
+        except Exception as e:
+            logger.error(f"Error backfilling legacy counter: {str(e)}")
+
+if os.environ.get('COUNTER_MODE', 'exact').lower() == 'crdt' and os.environ.get('GCOUNTER_PEER_CONNECTION_STRING'):
+    @app.timer_trigger(schedule="*/30 * * * * *", arg_name="timer", run_on_startup=False, use_monitor=False)
+    def sync_counter_replicas(timer: func.TimerRequest) -> None:
+        """
+        Anti-entropy: exchange per-replica G-Counter rows with the peer region
+        """
+        try:
+            gcounter = get_table_manager().gcounter
+            if gcounter is not None and gcounter.peer_client is not None:
+                pushed = gcounter.sync()
+                logger.info(f"G-Counter sync finished: {pushed} replica rows raised")
+        except Exception as e:
+            logger.error(f"Error syncing G-Counter replicas: {str(e)}")
+
+# Deployment test Tue Oct 21 01:40:04 AM PKT 2025
@@ -0,0 +1,207 @@
+"""
+Grow-only counter (G-Counter CRDT) for active-active regions
+
+Each replica (normally a region) owns one row holding the visits it has
+counted and only ever writes that row in its local table, so visits never
+cross the WAN on the request path and regions never contend for the same
+row. The count is the sum over replicas; two views of the counter merge by
+taking the per-replica maximum, which is commutative, associative and
+idempotent, so replicas converge no matter how often or in which order
+they exchange state.
+
+Anti-entropy runs in the background: both tables' replica rows are read,
+merged, and every row that is behind on either side is raised to the
+merged value. Raises are ETag-conditional so a concurrent increment is
+never overwritten; a row that lost the race is simply picked up on the
+next round. Visits counted before the switch live in a "baseline" row
+seeded from the exact counter.
+"""
+import logging
+import threading
+import time
+
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+from azure.data.tables import UpdateMode
+
+logger = logging.getLogger(__name__)
+
+GCOUNTER_PARTITION_KEY = "visitor-gcounter"
+BASELINE_REPLICA = "baseline"
+
+
+def replica_key(replica_id):
+    """
+    Return a RowKey-safe replica id
+    """
+    return ''.join('-' if ch in '/\\#?' or ord(ch) < 32 else ch for ch in replica_id) or "local"
+
+
+def merge(*states):
+    """
+    Merge replica states by taking the per-replica maximum
+    """
+    merged = {}
+    for state in states:
+        for replica, count in state.items():
+            merged[replica] = max(merged.get(replica, 0), count)
+    return merged
+
+
+class GCounter:
+    """
+    Per-replica grow-only counter rows with merge and anti-entropy sync
+    """
+
+    def __init__(self, table_client, replica_id, peer_client=None, max_attempts=5, clock=time.time):
+        self.table_client = table_client
+        self.replica_id = replica_key(replica_id)
+        self.peer_client = peer_client
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = {}
+        self.seeded = False
+        self.increments = 0
+        self.conflicts = 0
+        self.syncs = 0
+        self.rows_pushed = 0
+        self.last_sync = None
+
+    def _rows(self, table_client):
+        rows = {}
+        for entity in table_client.query_entities(
+            query_filter=f"PartitionKey eq '{GCOUNTER_PARTITION_KEY}'", select=['RowKey', 'Count']
+        ):
+            etag = (getattr(entity, 'metadata', None) or {}).get('etag')
+            rows[entity['RowKey']] = (entity.get('Count', 0), etag)
+        return rows
+
+    def _observe(self, state):
+        with self._lock:
+            self._state = merge(self._state, state)
+            return sum(self._state.values())
+
+    def value(self):
+        """
+        Read the local replica rows and return the merged count
+        """
+        rows = self._rows(self.table_client)
+        return self._observe({replica: count for replica, (count, _) in rows.items()})
+
+    def seed(self, count):
+        """
+        Create the baseline row holding visits counted before the switch, if missing
+        """
+        try:
+            self.table_client.create_entity(entity={
+                'PartitionKey': GCOUNTER_PARTITION_KEY,
+                'RowKey': BASELINE_REPLICA,
+                'Count': count,
+            })
+            logger.info(f"Seeded G-Counter baseline with {count} visits")
+        except ResourceExistsError:
+            pass
+        self.seeded = True
+
+    def increment(self, amount=1):
+        """
+        Add visits to this replica's own row and return the merged count
+        """
+        for attempt in range(self.max_attempts):
+            try:
+                entity = self.table_client.get_entity(
+                    partition_key=GCOUNTER_PARTITION_KEY, row_key=self.replica_id, select=['Count']
+                )
+            except ResourceNotFoundError:
+                try:
+                    self.table_client.create_entity(entity={
+                        'PartitionKey': GCOUNTER_PARTITION_KEY,
+                        'RowKey': self.replica_id,
+                        'Count': amount,
+                    })
+                except ResourceExistsError:
+                    # Another instance in this replica created it first
+                    self.conflicts += 1
+                    continue
+                own = amount
+            else:
+                own = entity.get('Count', 0) + amount
+                try:
+                    self.table_client.update_entity(
+                        entity={'PartitionKey': GCOUNTER_PARTITION_KEY, 'RowKey': self.replica_id, 'Count': own},
+                        mode=UpdateMode.MERGE,
+                        etag=(getattr(entity, 'metadata', None) or {}).get('etag'),
+                        match_condition=MatchConditions.IfNotModified
+                    )
+                except ResourceModifiedError:
+                    self.conflicts += 1
+                    continue
+            self.increments += 1
+            return self._observe({self.replica_id: own})
+        raise ResourceModifiedError(f"G-Counter increment lost {self.max_attempts} races")
+
+    def _raise_rows(self, table_client, rows, merged):
+        pushed = 0
+        for replica, count in merged.items():
+            current, etag = rows.get(replica, (None, None))
+            if current is not None and current >= count:
+                continue
+            entity = {'PartitionKey': GCOUNTER_PARTITION_KEY, 'RowKey': replica, 'Count': count}
+            try:
+                if current is None:
+                    table_client.create_entity(entity=entity)
+                else:
+                    table_client.update_entity(
+                        entity=entity,
+                        mode=UpdateMode.MERGE,
+                        etag=etag,
+                        match_condition=MatchConditions.IfNotModified
+                    )
+                pushed += 1
+            except (ResourceExistsError, ResourceModifiedError):
+                # Changed underneath us; the next round compares again
+                self.conflicts += 1
+        return pushed
+
+    def sync(self):
+        """
+        Exchange replica rows with the peer table and return how many rows were raised
+        """
+        if self.peer_client is None:
+            return 0
+        local_rows = self._rows(self.table_client)
+        peer_rows = self._rows(self.peer_client)
+        merged = merge(
+            {replica: count for replica, (count, _) in local_rows.items()},
+            {replica: count for replica, (count, _) in peer_rows.items()},
+        )
+        pushed = self._raise_rows(self.table_client, local_rows, merged)
+        pushed += self._raise_rows(self.peer_client, peer_rows, merged)
+        self._observe(merged)
+        self.syncs += 1
+        self.rows_pushed += pushed
+        self.last_sync = self.clock()
+        return pushed
+
+    def describe(self):
+        """
+        Return the fields identifying the counter mode and this replica
+        """
+        return {'mode': "crdt", 'replica': self.replica_id}
+
+    def stats(self):
+        """
+        Return replica counts and sync counters for diagnostics
+        """
+        with self._lock:
+            replicas = dict(self._state)
+        return {
+            **self.describe(),
+            'replicas': replicas,
+            'increments': self.increments,
+            'conflicts': self.conflicts,
+            'syncs': self.syncs,
+            'rowsPushed': self.rows_pushed,
+            'lastSync': self.last_sync,
+        }
@@ -0,0 +1,121 @@
+"""
+Hedged reads for the visitor counter
+
+A read that has not returned within the recent p95 latency is issued a
+second time, and whichever attempt finishes first wins. Hedges spend from a
+token bucket that each read refills by the hedge ratio, up to the burst
+size, so the extra load stays bounded even when the service is slow across
+the board, and a long quiet period cannot bank budget for a later hedge
+storm. A synchronous HTTP call cannot be interrupted, so the losing attempt
+is cancelled if it has not started and otherwise left to finish in the
+background with its result discarded.
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+
+class HedgedReader:
+    """
+    Runs reads with a second attempt after an adaptive delay
+    """
+
+    def __init__(self, percentile=0.95, initial_delay=0.05, min_delay=0.005, max_delay=1.0,
+                 max_hedge_ratio=0.1, burst=5, window=256, min_samples=20, max_workers=16):
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_hedge_ratio = max_hedge_ratio
+        self.burst = burst
+        self.min_samples = min_samples
+        self._budget = float(burst)
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedged-read")
+        self.reads = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.capped = 0
+        self.cancelled = 0
+
+    def delay(self):
+        """
+        Return how long to wait before hedging: the recent latency percentile, clamped
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.initial_delay
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(self.percentile * len(ordered)))
+        return min(self.max_delay, max(self.min_delay, ordered[index]))
+
+    def _record(self, started):
+        with self._lock:
+            self._latencies.append(time.monotonic() - started)
+
+    def _start(self, fn, args, kwargs):
+        started = time.monotonic()
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, fn, *args, **kwargs)
+        future.add_done_callback(lambda f: f.cancelled() or self._record(started))
+        return future
+
+    def _may_hedge(self):
+        with self._lock:
+            if self._budget >= 1.0:
+                self._budget -= 1.0
+                self.hedges += 1
+                return True
+            self.capped += 1
+            return False
+
+    def run(self, fn, *args, **kwargs):
+        """
+        Return fn's result from the first attempt to finish, hedging once if it is slow
+        """
+        with self._lock:
+            self.reads += 1
+            self._budget = min(float(self.burst), self._budget + self.max_hedge_ratio)
+        first = self._start(fn, args, kwargs)
+        done, _ = wait([first], timeout=self.delay())
+        if done or not self._may_hedge():
+            return first.result()
+
+        second = self._start(fn, args, kwargs)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    for loser in pending:
+                        if loser.cancel():
+                            with self._lock:
+                                self.cancelled += 1
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def stats(self):
+        """
+        Return hedge counters for diagnostics
+        """
+        delay = self.delay()
+        with self._lock:
+            return {
+                'reads': self.reads,
+                'hedges': self.hedges,
+                'hedgeWins': self.hedge_wins,
+                'capped': self.capped,
+                'cancelled': self.cancelled,
+                'hedgeDelayMs': round(delay * 1000, 1),
+            }
@@ -0,0 +1,217 @@
+"""
+Host-local increment accumulator shared by worker processes
+
+Every worker process on a host claims one slot in a shared memory segment
+and bumps its slot's "produced" counter for each increment; no cross-process
+lock is taken on that path because each field has exactly one writer. One process per
+host, elected by holding an exclusive file lock, periodically sums
+produced - consumed across all slots, commits that delta to the table in a
+single write, and advances each slot's "consumed" counter. Storage writes
+per host then stay constant as worker processes are added.
+
+Where fcntl is unavailable there is no way to elect a flusher, so each
+process keeps a private segment and flushes its own increments.
+"""
+import contextlib
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+ACCUMULATOR_MAGIC = b"VCAC"
+HEADER_FORMAT = struct.Struct("<4sHH")
+HEADER_SIZE = 64
+# pid, produced, consumed, reserved
+SLOT_FORMAT = struct.Struct("<QQQQ")
+PRODUCED_OFFSET = 8
+CONSUMED_OFFSET = 16
+COUNTER_FORMAT = struct.Struct("<Q")
+
+
+def _process_alive(pid):
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class HostAccumulator:
+    """
+    Per-process slots in shared memory with an elected flusher process
+    """
+
+    def __init__(self, commit, name="visitor-counter-acc", slots=64, flush_interval=1.0, lock_dir=None):
+        self.commit = commit
+        # Without file locks each process accumulates alone under its own segment name
+        self.shared = fcntl is not None
+        self.name = name if self.shared else f"{name}-{os.getpid()}"
+        self.slots = slots
+        self.flush_interval = flush_interval
+        lock_dir = lock_dir or tempfile.gettempdir()
+        self._claim_path = os.path.join(lock_dir, f"{name}.claim")
+        self._leader_path = os.path.join(lock_dir, f"{name}.leader")
+        self._leader_fd = None
+        self._flusher = None
+        self._local_lock = threading.Lock()
+        self.flushes = 0
+        self.flushed = 0
+
+        with self._claim_lock():
+            self._shm = self._attach()
+            self.slot = self._claim_slot()
+        self._buf = self._shm.buf
+        self._produced_at = HEADER_SIZE + self.slot * SLOT_FORMAT.size + PRODUCED_OFFSET
+
+    @contextlib.contextmanager
+    def _claim_lock(self):
+        if not self.shared:
+            yield
+            return
+        fd = os.open(self._claim_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _attach(self):
+        size = HEADER_SIZE + self.slots * SLOT_FORMAT.size
+        try:
+            shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+            HEADER_FORMAT.pack_into(shm.buf, 0, ACCUMULATOR_MAGIC, 1, self.slots)
+        except FileExistsError:
+            shm = shared_memory.SharedMemory(name=self.name)
+            magic, _, slots = HEADER_FORMAT.unpack_from(shm.buf, 0)
+            if magic != ACCUMULATOR_MAGIC:
+                raise ValueError(f"Shared memory segment {self.name} is not a visitor counter accumulator")
+            self.slots = slots
+        if self.shared:
+            # The segment outlives any single worker; stop this process from unlinking it on exit
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+    def _claim_slot(self):
+        pid = os.getpid()
+        for index in range(self.slots):
+            offset = HEADER_SIZE + index * SLOT_FORMAT.size
+            owner, produced, consumed, _ = SLOT_FORMAT.unpack_from(self._shm.buf, offset)
+            # Reuse a slot whose owner is gone; its undelivered delta is kept and flushed later
+            if owner == pid or not _process_alive(owner):
+                COUNTER_FORMAT.pack_into(self._shm.buf, offset, pid)
+                return index
+        raise RuntimeError(f"No free accumulator slots in {self.name}")
+
+    def add(self, amount=1):
+        """
+        Record increments in this process's slot
+        """
+        with self._local_lock:
+            produced = COUNTER_FORMAT.unpack_from(self._buf, self._produced_at)[0]
+            COUNTER_FORMAT.pack_into(self._buf, self._produced_at, produced + amount)
+        self.start()
+
+    def pending(self):
+        """
+        Return increments accumulated on this host but not yet committed
+        """
+        total = 0
+        for index in range(self.slots):
+            _, produced, consumed, _ = SLOT_FORMAT.unpack_from(self._buf, HEADER_SIZE + index * SLOT_FORMAT.size)
+            total += produced - consumed
+        return total
+
+    def is_flusher(self):
+        """
+        Try to become (or confirm being) the host's flusher process
+        """
+        if self._leader_fd is not None or not self.shared:
+            return True
+        fd = os.open(self._leader_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        # Held until this process exits, at which point another worker takes over
+        self._leader_fd = fd
+        logger.info(f"Process {os.getpid()} elected accumulator flusher")
+        return True
+
+    def flush(self):
+        """
+        Commit the summed delta of all slots in one storage write
+        """
+        snapshot = []
+        total = 0
+        for index in range(self.slots):
+            offset = HEADER_SIZE + index * SLOT_FORMAT.size
+            _, produced, consumed, _ = SLOT_FORMAT.unpack_from(self._buf, offset)
+            if produced > consumed:
+                snapshot.append((offset, produced))
+                total += produced - consumed
+        if not total:
+            return 0
+
+        self.commit(total)
+        for offset, produced in snapshot:
+            COUNTER_FORMAT.pack_into(self._buf, offset + CONSUMED_OFFSET, produced)
+        self.flushes += 1
+        self.flushed += total
+        return total
+
+    def start(self):
+        """
+        Start the background loop that flushes whenever this process is the flusher
+        """
+        if self._flusher is not None:
+            return
+        with self._local_lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name="host-accumulator", daemon=True)
+                self._flusher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            if not self.is_flusher():
+                continue
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing host accumulator: {str(e)}")
+
+    def close(self, unlink=False):
+        """
+        Detach from the shared segment, optionally removing it
+        """
+        self._buf = None
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+
+    def stats(self):
+        """
+        Return accumulator counters for diagnostics
+        """
+        return {
+            'slot': self.slot,
+            'flusher': self._leader_fd is not None or not self.shared,
+            'pending': self.pending(),
+            'flushes': self.flushes,
+            'flushed': self.flushed,
+        }
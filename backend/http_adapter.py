@@ -0,0 +1,283 @@
+"""
+ASGI and WSGI adapters for the routes declared on a func.FunctionApp
+
+Lets the same HTTP-triggered handlers run outside the Functions host, for
+example under uvicorn or gunicorn with one worker per core. Requests are
+mapped to func.HttpRequest and responses back without re-buffering: a body
+that arrives in one chunk is handed to the handler as-is, and the response
+body is sent straight from func.HttpResponse.
+
+Outside the Functions host nothing adds X-Client-IP, so the adapters set it
+to the connection's peer address, replacing whatever the caller sent, and
+per-client rate limiting and repeat-visit checks keep working. Only when the
+peer is a configured trusted proxy (SERVER_TRUSTED_PROXIES, comma-separated
+addresses or networks) are its X-Client-IP and X-Forwarded-For passed through.
+"""
+import asyncio
+import inspect
+import ipaddress
+import json
+import os
+import re
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qsl
+
+import azure.functions as func
+
+ROUTE_PARAM = re.compile(r"\{(\w+)(?::[^}]*)?\??\}")
+
+
+class Route:
+    """
+    One HTTP-triggered function registered on the FunctionApp
+    """
+    __slots__ = ("name", "pattern", "methods", "handler")
+
+    def __init__(self, name, route, methods, handler, prefix):
+        self.name = name
+        path = "/".join(part for part in (prefix, route.strip("/")) if part)
+        self.pattern = re.compile("^/" + ROUTE_PARAM.sub(r"(?P<\1>[^/]+)", path) + "/?$")
+        self.methods = {str(getattr(m, "value", m)).upper() for m in methods} if methods else None
+        self.handler = handler
+
+
+# FunctionApp.get_functions() validates name uniqueness against every earlier
+# call, so the built functions are cached per app and shared by all adapters
+_functions_by_app = weakref.WeakKeyDictionary()
+
+
+def collect_routes(function_app, route_prefix="api"):
+    """
+    Return the HTTP routes declared on a FunctionApp, in declaration order
+    """
+    functions = _functions_by_app.get(function_app)
+    if functions is None:
+        functions = _functions_by_app[function_app] = function_app.get_functions()
+
+    routes = []
+    for function in functions:
+        if not function.is_http_function():
+            continue
+        trigger = function.get_trigger()
+        routes.append(Route(
+            function.get_function_name(),
+            trigger.route or function.get_function_name(),
+            trigger.methods,
+            function.get_user_function(),
+            route_prefix,
+        ))
+    return routes
+
+
+class FunctionRouter:
+    """
+    Resolves a method and path to a handler and builds error responses
+    """
+
+    def __init__(self, function_app, route_prefix="api"):
+        self.routes = collect_routes(function_app, route_prefix)
+
+    def resolve(self, method, path):
+        """
+        Return (route, route_params) or an error func.HttpResponse
+        """
+        allowed = set()
+        for route in self.routes:
+            match = route.pattern.match(path)
+            if match is None:
+                continue
+            if route.methods is None or method in route.methods:
+                return route, match.groupdict()
+            allowed |= route.methods
+        if allowed:
+            return None, self._error(405, f"Method {method} not allowed", {"Allow": ", ".join(sorted(allowed))})
+        return None, self._error(404, f"No function is registered for {path}")
+
+    def _error(self, status_code, message, headers=None):
+        return func.HttpResponse(
+            json.dumps({"success": False, "error": message}),
+            status_code=status_code,
+            headers={"Content-Type": "application/json", **(headers or {})},
+        )
+
+    def prepare(self, method, url, path, query, headers, body):
+        """
+        Return (handler, func.HttpRequest) for one request, or (None, error func.HttpResponse)
+        """
+        route, resolved = self.resolve(method, path)
+        if route is None:
+            return None, resolved
+        request = func.HttpRequest(
+            method, url,
+            headers=headers,
+            params=dict(parse_qsl(query, keep_blank_values=True)),
+            route_params=resolved,
+            body=body,
+        )
+        return route.handler, request
+
+    def dispatch(self, method, url, path, query, headers, body):
+        """
+        Run the handler for one request and return its func.HttpResponse
+        """
+        handler, request = self.prepare(method, url, path, query, headers, body)
+        if handler is None:
+            return request
+        if inspect.iscoroutinefunction(handler):
+            return asyncio.run(handler(request))
+        return handler(request)
+
+
+def trusted_proxies_from_environment():
+    """
+    Parse SERVER_TRUSTED_PROXIES into a list of networks
+    """
+    value = os.environ.get("SERVER_TRUSTED_PROXIES", "")
+    return [ipaddress.ip_network(entry.strip(), strict=False) for entry in value.split(",") if entry.strip()]
+
+
+def _is_trusted(address, trusted_proxies):
+    try:
+        peer = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(peer in network for network in trusted_proxies)
+
+
+def add_peer_address(headers, address, trusted_proxies=()):
+    """
+    Set X-Client-IP to the connection's peer address, unless the peer is a trusted proxy
+    """
+    if address and _is_trusted(address, trusted_proxies):
+        # The proxy's own X-Client-IP / X-Forwarded-For identify the client
+        return headers
+    for name in [name for name in headers if name.lower() == "x-client-ip"]:
+        del headers[name]
+    if address:
+        headers["X-Client-IP"] = address
+    return headers
+
+
+def response_headers(response):
+    """
+    Yield (name, value) header pairs for a func.HttpResponse
+    """
+    has_content_type = False
+    for name, value in response.headers.items():
+        if name.lower() == "content-type":
+            has_content_type = True
+        yield name, value
+    if not has_content_type and response.mimetype:
+        charset = f"; charset={response.charset}" if response.charset else ""
+        yield "Content-Type", f"{response.mimetype}{charset}"
+
+
+class FunctionAsgiApp:
+    """
+    ASGI application serving the FunctionApp's HTTP routes
+    """
+
+    def __init__(self, function_app, route_prefix="api", max_threads=None, mounts=None, trusted_proxies=None):
+        self.router = FunctionRouter(function_app, route_prefix)
+        self.trusted_proxies = trusted_proxies_from_environment() if trusted_proxies is None else trusted_proxies
+        # Native ASGI apps (e.g. streaming endpoints) served at exact paths ahead of the functions
+        self.mounts = dict(mounts or {})
+        # Handlers are synchronous and block on storage calls
+        self.executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="function-handler")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        mounted = self.mounts.get(scope["path"])
+        if mounted is not None:
+            await mounted(scope, receive, send)
+            return
+
+        body = await self._read_body(receive)
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        client = scope.get("client")
+        add_peer_address(headers, client[0] if client else None, self.trusted_proxies)
+        host = headers.get("host", "localhost")
+        query = scope.get("query_string", b"").decode("latin-1")
+        url = f"{scope.get('scheme', 'http')}://{host}{scope['path']}" + (f"?{query}" if query else "")
+
+        handler, request = self.router.prepare(scope["method"], url, scope["path"], query, headers, body)
+        if handler is None:
+            response = request
+        elif inspect.iscoroutinefunction(handler):
+            # Async handlers (long-polls) wait on the loop without holding a handler thread
+            response = await handler(request)
+        else:
+            response = await asyncio.get_running_loop().run_in_executor(self.executor, handler, request)
+
+        await send({
+            "type": "http.response.start",
+            "status": response.status_code,
+            "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in response_headers(response)],
+        })
+        await send({"type": "http.response.body", "body": response.get_body() or b""})
+
+    async def _read_body(self, receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        # Avoid a join (and copy) for the common single-chunk body
+        return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+class FunctionWsgiApp:
+    """
+    WSGI application serving the FunctionApp's HTTP routes
+    """
+
+    def __init__(self, function_app, route_prefix="api", trusted_proxies=None):
+        self.router = FunctionRouter(function_app, route_prefix)
+        self.trusted_proxies = trusted_proxies_from_environment() if trusted_proxies is None else trusted_proxies
+
+    def __call__(self, environ, start_response):
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        body = environ["wsgi.input"].read(length) if length else b""
+        headers = {
+            key[5:].replace("_", "-").title(): value
+            for key, value in environ.items() if key.startswith("HTTP_")
+        }
+        if environ.get("CONTENT_TYPE"):
+            headers["Content-Type"] = environ["CONTENT_TYPE"]
+        add_peer_address(headers, environ.get("REMOTE_ADDR"), self.trusted_proxies)
+        path = environ.get("PATH_INFO", "/")
+        query = environ.get("QUERY_STRING", "")
+        host = environ.get("HTTP_HOST") or environ.get("SERVER_NAME", "localhost")
+        url = f"{environ.get('wsgi.url_scheme', 'http')}://{host}{path}" + (f"?{query}" if query else "")
+
+        response = self.router.dispatch(environ["REQUEST_METHOD"], url, path, query, headers, body)
+
+        status = f"{response.status_code} {_reason(response.status_code)}"
+        start_response(status, list(response_headers(response)))
+        return [response.get_body() or b""]
+
+
+def _reason(status_code):
+    try:
+        return HTTPStatus(status_code).phrase
+    except ValueError:
+        return ""
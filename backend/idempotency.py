@@ -0,0 +1,235 @@
+"""
+Idempotency keys for visitor counter increments
+
+The first response for an Idempotency-Key is remembered and replayed for
+duplicates without writing again. Keys live in a bounded TTL map in the
+worker; concurrent duplicates in one worker share the leader's execution.
+An optional table gives cross-instance dedupe: a key is reserved before the
+increment runs, so a retry that lands on another instance while the first
+attempt is still running gets 409 instead of a second increment. A
+reservation is only held for a short lease: if the instance that made it
+crashes before completing, a retry after the lease takes it over instead of
+getting 409 until the record's TTL runs out.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+from azure.data.tables import UpdateMode
+
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class StoredResponse:
+    """
+    Status, body and headers of a response kept for replay
+    """
+    __slots__ = ("status_code", "body", "headers")
+
+    def __init__(self, status_code, body, headers):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers
+
+
+class IdempotencyConflict(Exception):
+    """
+    Raised when another instance is still processing the same key
+    """
+
+
+class IdempotencyStore:
+    """
+    Bounded TTL map of recent keys with optional table-backed sharing
+    """
+
+    def __init__(self, ttl_seconds=86400, max_keys=10000, table_client=None, lease_seconds=30, clock=time.monotonic):
+        self.ttl = ttl_seconds
+        self.lease = lease_seconds
+        self.max_keys = max_keys
+        self.table_client = table_client
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._single_flight = SingleFlight()
+        self.replayed = 0
+        self.stored = 0
+
+    @staticmethod
+    def hash_key(key):
+        """
+        Return a fixed-length storage key for a client-supplied idempotency key
+        """
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _get_local(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            expires_at, response = entry
+            if expires_at < self.clock():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return response
+
+    def _put_local(self, digest, response):
+        with self._lock:
+            self._entries[digest] = (self.clock() + self.ttl, response)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+            self.stored += 1
+
+    def run(self, key, produce):
+        """
+        Return (response, replayed) for key, calling produce only for the first request
+        """
+        digest = self.hash_key(key)
+        response = self._get_local(digest)
+        if response is not None:
+            self.replayed += 1
+            return response, True
+
+        # Concurrent duplicates in this worker wait for the leader's response
+        token = object()
+        response, fresh, runner = self._single_flight.do(digest, self._run_once, digest, produce, token)
+        replayed = not fresh or runner is not token
+        if replayed:
+            self.replayed += 1
+        return response, replayed
+
+    def _run_once(self, digest, produce, token):
+        response = self._get_local(digest)
+        if response is not None:
+            return response, False, token
+        if self.table_client is not None:
+            stored = self._reserve(digest)
+            if stored is not None:
+                self._put_local(digest, stored)
+                return stored, False, token
+
+        try:
+            response = produce()
+        except Exception:
+            self._release(digest)
+            raise
+
+        if 200 <= response.status_code < 300:
+            self._put_local(digest, response)
+            self._complete(digest, response)
+        else:
+            # Only successful increments are remembered; failures may be retried
+            self._release(digest)
+        return response, True, token
+
+    def _row(self, digest):
+        return {'PartitionKey': f"idem-{digest[:2]}", 'RowKey': digest}
+
+    def _reserve(self, digest):
+        """
+        Claim the key in the shared table, or return the response already stored for it
+        """
+        entity = dict(self._row(digest), Status=0, CreatedAt=datetime.now(timezone.utc))
+        try:
+            self.table_client.create_entity(entity=entity)
+            return None
+        except ResourceExistsError:
+            pass
+
+        existing = self.table_client.get_entity(**self._key_args(digest))
+        created = existing.get('CreatedAt')
+        # In-progress reservations are leased briefly; completed responses live for the TTL
+        held_for = self.ttl if existing.get('Status') else self.lease
+        if created and created < datetime.now(timezone.utc) - timedelta(seconds=held_for):
+            self._take_over(digest, existing, entity)
+            return None
+        if not existing.get('Status'):
+            raise IdempotencyConflict(digest)
+        if existing.get('Headers'):
+            headers = json.loads(existing['Headers'])
+        else:
+            # Written before full headers were stored
+            headers = {'Content-Type': existing.get('ContentType', 'application/json'),
+                       'Access-Control-Allow-Origin': '*'}
+        return StoredResponse(existing['Status'], existing.get('Body', '').encode('utf-8'), headers)
+
+    def _take_over(self, digest, existing, entity):
+        """
+        Replace an expired reservation, unless another instance got there first
+        """
+        etag = (getattr(existing, 'metadata', None) or {}).get('etag')
+        try:
+            self.table_client.update_entity(
+                entity=entity, mode=UpdateMode.REPLACE, etag=etag, match_condition=MatchConditions.IfNotModified
+            )
+        except (ResourceModifiedError, ResourceNotFoundError):
+            raise IdempotencyConflict(digest)
+
+    def _key_args(self, digest):
+        row = self._row(digest)
+        return {'partition_key': row['PartitionKey'], 'row_key': row['RowKey']}
+
+    def _complete(self, digest, response):
+        if self.table_client is None:
+            return
+        try:
+            self.table_client.upsert_entity(entity=dict(
+                self._row(digest),
+                Status=response.status_code,
+                Body=response.body.decode('utf-8'),
+                ContentType=response.headers.get('Content-Type', 'application/json'),
+                Headers=json.dumps(dict(response.headers)),
+                CreatedAt=datetime.now(timezone.utc),
+            ), mode="replace")
+        except Exception as e:
+            logger.error(f"Error storing idempotent response: {str(e)}")
+
+    def _release(self, digest):
+        if self.table_client is None:
+            return
+        try:
+            self.table_client.delete_entity(**self._key_args(digest))
+        except ResourceNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error releasing idempotency key: {str(e)}")
+
+    def purge_expired(self):
+        """
+        Delete shared keys older than the TTL; return how many were removed
+        """
+        if self.table_client is None:
+            return 0
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+        removed = 0
+        for entity in self.table_client.query_entities(
+            "CreatedAt lt @cutoff", parameters={'cutoff': cutoff}, select=['PartitionKey', 'RowKey']
+        ):
+            try:
+                self.table_client.delete_entity(partition_key=entity['PartitionKey'], row_key=entity['RowKey'])
+                removed += 1
+            except ResourceNotFoundError:
+                pass
+        return removed
+
+    def stats(self):
+        """
+        Return idempotency counters for diagnostics
+        """
+        with self._lock:
+            return {
+                'trackedKeys': len(self._entries),
+                'stored': self.stored,
+                'replayed': self.replayed,
+                'shared': self.table_client is not None,
+            }
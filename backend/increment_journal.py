@@ -0,0 +1,283 @@
+"""
+Local write-ahead journal for visitor count increments
+
+When Table Storage is unavailable, increments are appended to a local file
+instead of being lost. Records are written immediately and fsync'd in
+groups by a background thread. A replayer applies pending records to the
+table in batches; each replay stores the journal's last applied sequence in
+a marker entity in the same transaction, so replaying twice never counts an
+increment twice.
+
+File layout: a fixed header (magic, journal id, base sequence, crc) followed
+by fixed-size records (sequence, amount, crc). A torn trailing record is
+ignored on load.
+
+A journal file belongs to one process at a time. Each journal holds an
+exclusive flock on "<path>.lock" for its lifetime; when another worker
+already owns the path, the next free slot ("<path>.1", "<path>.2", ...) is
+used instead. The lock dies with its process. On startup a worker also
+locks every other slot whose owner is gone, so a crashed worker's records
+are replayed even when no restarted worker lands on its slot again.
+"""
+import itertools
+import logging
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_MAGIC = b"VCJ1"
+HEADER_FORMAT = struct.Struct("<4s16sQI")
+RECORD_FORMAT = struct.Struct("<QqI")
+
+
+def default_journal_path():
+    """
+    Return the journal location used when none is configured
+    """
+    return os.path.join(tempfile.gettempdir(), "visitor-counter.journal")
+
+
+def claim_journal_path(path):
+    """
+    Lock the first journal slot no other process owns; return (path, lock file)
+    """
+    if fcntl is None:
+        # No advisory locks on this platform; keep workers apart by process id
+        return f"{path}.{os.getpid()}", None
+    for slot in itertools.count():
+        candidate = path if slot == 0 else f"{path}.{slot}"
+        lock_file = open(f"{candidate}.lock", "ab")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return candidate, lock_file
+        except OSError:
+            lock_file.close()
+
+
+def claim_orphaned_journals(path, own_path):
+    """
+    Lock every other journal slot whose owner is gone; return [(path, lock file)]
+    """
+    if fcntl is None:
+        # Slots are keyed by process id here, so a dead owner can't be told apart
+        return []
+    directory, name = os.path.split(path)
+    slot_name = re.compile(re.escape(name) + r"(\.\d+)?")
+    claimed = []
+    for entry in sorted(os.listdir(directory or ".")):
+        candidate = os.path.join(directory, entry)
+        if not slot_name.fullmatch(entry) or candidate == own_path:
+            continue
+        lock_file = open(f"{candidate}.lock", "ab")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            claimed.append((candidate, lock_file))
+        except OSError:
+            lock_file.close()
+    return claimed
+
+
+def _with_crc(fmt, *values):
+    raw = fmt.pack(*values, 0)
+    return raw[:-4] + struct.pack("<I", zlib.crc32(raw[:-4]))
+
+
+def _crc_ok(raw):
+    return zlib.crc32(raw[:-4]) == struct.unpack("<I", raw[-4:])[0]
+
+
+class IncrementJournal:
+    """
+    Append-only journal of increments that could not be written to storage
+    """
+
+    def __init__(self, path=None, sync_interval=0.05, replay_interval=5.0, owner_lock=None):
+        self.slot_path = path or default_journal_path()
+        if owner_lock is not None:
+            # Opened for a slot the caller has already locked
+            self.path, self._owner_lock = self.slot_path, owner_lock
+        else:
+            self.path, self._owner_lock = claim_journal_path(self.slot_path)
+        self.sync_interval = sync_interval
+        self.replay_interval = replay_interval
+        self._lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._entries = []
+        self._file = None
+        self._syncer = None
+        self._replayer = None
+        self.journal_id = None
+        self.base_sequence = 0
+        self.next_sequence = 1
+        self.appended = 0
+        self.replayed = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                header = f.read(HEADER_FORMAT.size)
+                if len(header) == HEADER_FORMAT.size and _crc_ok(header):
+                    magic, journal_id, base, _ = HEADER_FORMAT.unpack(header)
+                    if magic == JOURNAL_MAGIC:
+                        self.journal_id = str(uuid.UUID(bytes=journal_id))
+                        self.base_sequence = base
+                while self.journal_id:
+                    raw = f.read(RECORD_FORMAT.size)
+                    if len(raw) < RECORD_FORMAT.size or not _crc_ok(raw):
+                        break
+                    sequence, amount, _ = RECORD_FORMAT.unpack(raw)
+                    if sequence > self.base_sequence:
+                        self._entries.append((sequence, amount))
+        except FileNotFoundError:
+            pass
+
+        if self.journal_id is None:
+            self.journal_id = str(uuid.uuid4())
+        self.next_sequence = max([self.base_sequence] + [s for s, _ in self._entries]) + 1
+        # Rewrite so a torn tail is dropped before new records are appended
+        self._rewrite()
+        if self._entries:
+            logger.info(f"Increment journal has {len(self._entries)} pending records to replay")
+
+    def _rewrite(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(_with_crc(HEADER_FORMAT, JOURNAL_MAGIC, uuid.UUID(self.journal_id).bytes, self.base_sequence))
+            for sequence, amount in self._entries:
+                f.write(_with_crc(RECORD_FORMAT, sequence, amount))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.path, "ab")
+
+    @property
+    def pending_amount(self):
+        """
+        Total increments not yet applied to storage
+        """
+        with self._lock:
+            return sum(amount for _, amount in self._entries)
+
+    def has_pending(self):
+        """
+        Return True while increments are waiting to be replayed
+        """
+        return bool(self._entries)
+
+    def append(self, amount):
+        """
+        Journal an increment; it is fsync'd with the next group
+        """
+        with self._lock:
+            sequence = self.next_sequence
+            self.next_sequence += 1
+            self._file.write(_with_crc(RECORD_FORMAT, sequence, amount))
+            self._file.flush()
+            self._entries.append((sequence, amount))
+            self.appended += amount
+        self._dirty.set()
+        return sequence
+
+    def pending_entries(self, limit=None):
+        """
+        Return pending (sequence, amount) records, oldest first
+        """
+        with self._lock:
+            return list(self._entries[:limit] if limit else self._entries)
+
+    def mark_applied(self, through_sequence):
+        """
+        Drop records up to a sequence the storage marker confirms as applied
+        """
+        with self._lock:
+            applied = [amount for sequence, amount in self._entries if sequence <= through_sequence]
+            self._entries = [(s, a) for s, a in self._entries if s > through_sequence]
+            self.replayed += sum(applied)
+            self.base_sequence = max(self.base_sequence, through_sequence)
+            self._rewrite()
+
+    def _sync_loop(self):
+        while True:
+            self._dirty.wait()
+            # Group every append that lands during the interval into one fsync
+            time.sleep(self.sync_interval)
+            self._dirty.clear()
+            with self._lock:
+                try:
+                    os.fsync(self._file.fileno())
+                except (OSError, ValueError) as e:
+                    logger.error(f"Error syncing increment journal: {str(e)}")
+
+    def start(self, replay):
+        """
+        Start the group-commit syncer and the background replayer
+        """
+        with self._lock:
+            if self._syncer is None:
+                self._syncer = threading.Thread(target=self._sync_loop, name="journal-sync", daemon=True)
+                self._syncer.start()
+            if self._replayer is None:
+                self._replayer = threading.Thread(
+                    target=self._replay_loop, args=(replay,), name="journal-replay", daemon=True
+                )
+                self._replayer.start()
+
+    def _replay_loop(self, replay):
+        while True:
+            time.sleep(self.replay_interval)
+            if not self.has_pending():
+                continue
+            try:
+                replay()
+            except Exception as e:
+                logger.warning(f"Increment journal replay deferred: {str(e)}")
+
+    def adopt_orphans(self):
+        """
+        Open the journals left in other slots by workers that are gone
+        """
+        return [
+            IncrementJournal(orphan_path, self.sync_interval, self.replay_interval, owner_lock=lock_file)
+            for orphan_path, lock_file in claim_orphaned_journals(self.slot_path, self.path)
+        ]
+
+    def close(self):
+        """
+        Close the journal file and give up ownership of its path
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._owner_lock is not None:
+                self._owner_lock.close()
+                self._owner_lock = None
+
+    def stats(self):
+        """
+        Return journal counters for diagnostics
+        """
+        with self._lock:
+            return {
+                'journalId': self.journal_id,
+                'path': self.path,
+                'pendingRecords': len(self._entries),
+                'pendingAmount': sum(amount for _, amount in self._entries),
+                'appended': self.appended,
+                'replayed': self.replayed,
+            }
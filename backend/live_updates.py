@@ -0,0 +1,199 @@
+"""
+Live visitor count updates with one upstream poller per worker
+
+Clients wait for a count newer than the version they already have. A single
+background thread per worker watches the counter entity's ETag and wakes
+every waiter at once, so storage reads no longer grow with open tabs. The
+poller only runs while someone is waiting. Writes made by this worker are
+published straight to the watcher, so its own increments wake waiters
+without waiting for the next poll.
+
+Long-poll handlers block in wait(); the SSE stream awaits wait_async(),
+which parks on an asyncio.Event per client instead of holding an executor
+thread for every open connection.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LiveCountWatcher:
+    """
+    Shares one polling loop on the counter version among all waiting clients
+    """
+
+    def __init__(self, read_current, poll_interval=2.0, idle_timeout=30.0):
+        self.read_current = read_current
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self._condition = threading.Condition()
+        self._poller = None
+        self._async_waiters = set()
+        self._waiters = 0
+        self._last_wait = 0.0
+        self.count = None
+        self.version = None
+        self.polls = 0
+        self.published = 0
+        self.wakeups = 0
+
+    def _refresh(self):
+        with self._condition:
+            published = self.published
+        count, version = self.read_current()
+        self.polls += 1
+        with self._condition:
+            # A write published while this read was in flight is newer than what it returned
+            if self.published == published:
+                self._update(count, version)
+
+    def publish(self, count, version):
+        """
+        Record a count this worker just wrote and wake every waiter if its version is new
+        """
+        with self._condition:
+            self.published += 1
+            self._update(count, version)
+
+    def _update(self, count, version):
+        # Called with the condition held
+        if version == self.version:
+            return
+        self.count, self.version = count, version
+        self.wakeups += 1
+        self._condition.notify_all()
+        for loop, event in self._async_waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The waiter's event loop has already closed
+                pass
+
+    def _run(self):
+        while True:
+            try:
+                self._refresh()
+            except Exception as e:
+                logger.error(f"Error polling visitor count version: {str(e)}")
+            time.sleep(self.poll_interval)
+            with self._condition:
+                if self._waiters == 0 and time.monotonic() - self._last_wait > self.idle_timeout:
+                    self._poller = None
+                    return
+
+    def _ensure_poller(self):
+        if self._poller is None:
+            self._poller = threading.Thread(target=self._run, name="live-count-poller", daemon=True)
+            self._poller.start()
+
+    def wait(self, since=None, timeout=25.0):
+        """
+        Return (count, version, changed) once the version differs from since or on timeout
+        """
+        if self.version is None:
+            self._refresh()
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self._waiters += 1
+            self._last_wait = time.monotonic()
+            self._ensure_poller()
+            try:
+                while since is not None and self.version == since:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return self.count, self.version, False
+                    self._condition.wait(remaining)
+                return self.count, self.version, True
+            finally:
+                self._waiters -= 1
+                self._last_wait = time.monotonic()
+
+    async def wait_async(self, since=None, timeout=25.0):
+        """
+        Awaitable wait(): return (count, version, changed) without occupying a thread while waiting
+        """
+        loop = asyncio.get_running_loop()
+        if self.version is None:
+            await loop.run_in_executor(None, self._refresh)
+        waiter = (loop, asyncio.Event())
+        deadline = loop.time() + timeout
+        with self._condition:
+            self._async_waiters.add(waiter)
+            self._waiters += 1
+            self._last_wait = time.monotonic()
+            self._ensure_poller()
+        try:
+            while True:
+                # Cleared before the check, so a publish in between still wakes the wait below
+                waiter[1].clear()
+                if since is None or self.version != since:
+                    return self.count, self.version, True
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return self.count, self.version, False
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._condition:
+                self._async_waiters.discard(waiter)
+                self._waiters -= 1
+                self._last_wait = time.monotonic()
+
+    def stats(self):
+        """
+        Return poller counters for diagnostics
+        """
+        with self._condition:
+            return {
+                'waiters': self._waiters,
+                'polling': self._poller is not None,
+                'polls': self.polls,
+                'published': self.published,
+                'wakeups': self.wakeups,
+            }
+
+
+class LiveCountEventStream:
+    """
+    ASGI app streaming count changes as server-sent events
+    """
+
+    def __init__(self, watcher, keepalive=15.0):
+        self.watcher = watcher
+        self.keepalive = keepalive
+
+    async def __call__(self, scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"access-control-allow-origin", b"*"),
+            ],
+        })
+        disconnected = asyncio.ensure_future(self._wait_disconnect(receive))
+        since = None
+        try:
+            while not disconnected.done():
+                count, version, changed = await self.watcher.wait_async(since, self.keepalive)
+                if changed:
+                    since = version
+                    payload = json.dumps({"count": count, "version": version})
+                    chunk = f"id: {version}\nevent: count\ndata: {payload}\n\n"
+                else:
+                    chunk = ": keepalive\n\n"
+                await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+        finally:
+            disconnected.cancel()
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _wait_disconnect(self, receive):
+        while (await receive())["type"] != "http.disconnect":
+            pass
@@ -0,0 +1,125 @@
+"""
+Memory-bounded per-client token-bucket rate limiting for counter increments
+
+Buckets live in a fixed-size LRU keyed by a hashed client identifier, so
+memory stays bounded no matter how many distinct clients show up. Evicting
+an idle client only forgets its history, which errs on the side of allowing.
+Requests with no client identity are not pooled into one shared bucket,
+where a single noisy caller would lock out everyone else without an address;
+they are let through and counted, leaving them to the storage-wide limiter.
+"""
+import hashlib
+import ipaddress
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def _without_port(address):
+    """
+    Return an address with any port removed, handling "v4:port", "[v6]:port" and bare IPv6
+    """
+    if address.startswith('['):
+        address = address[1:].partition(']')[0]
+    else:
+        try:
+            ipaddress.ip_address(address)
+        except ValueError:
+            host, _, port = address.rpartition(':')
+            if host and port.isdigit():
+                address = host
+    try:
+        # One spelling per address, so "::1" and "0:0::1" share a bucket
+        return str(ipaddress.ip_address(address))
+    except ValueError:
+        return address
+
+
+def client_key(req):
+    """
+    Return a hashed identifier for the client behind an HTTP request, or None if it has none
+
+    The address comes from the platform: X-Client-IP (also set by the ASGI/WSGI
+    adapters from the connection), else the X-Forwarded-For entry appended by
+    the outermost trusted proxy (TRUSTED_PROXY_HOPS from the right, default 1;
+    entries to its left are whatever the client sent). X-Client-Id is taken
+    first only when TRUST_CLIENT_ID_HEADER=true, since any caller can set it.
+    """
+    identifier = ''
+    if os.environ.get('TRUST_CLIENT_ID_HEADER', 'false').lower() == 'true':
+        identifier = req.headers.get('X-Client-Id', '').strip()
+    if not identifier:
+        address = req.headers.get('X-Client-IP', '').strip()
+        if not address:
+            hops = int(os.environ.get('TRUSTED_PROXY_HOPS', '1'))
+            forwarded = [entry.strip() for entry in req.headers.get('X-Forwarded-For', '').split(',') if entry.strip()]
+            if hops > 0 and forwarded:
+                address = forwarded[-min(hops, len(forwarded))]
+        # The Functions front end forwards "ip:port"; the port changes per connection
+        identifier = _without_port(address) if address else ''
+    if not identifier:
+        return None
+    return hashlib.blake2b(identifier.encode('utf-8'), digest_size=8).digest()
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket per client, stored in a fixed-capacity LRU
+    """
+
+    def __init__(self, rate_per_second, burst, max_clients=10000, clock=time.monotonic):
+        self.rate = rate_per_second
+        self.burst = burst
+        self.max_clients = max_clients
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+        self.evicted = 0
+        self.unidentified = 0
+
+    def acquire(self, key):
+        """
+        Take one token for key; return (allowed, retry_after_seconds)
+        """
+        if key is None:
+            with self._lock:
+                self.unidentified += 1
+            return True, 0
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = float(self.burst)
+                if len(self._buckets) >= self.max_clients:
+                    self._buckets.popitem(last=False)
+                    self.evicted += 1
+            else:
+                tokens, updated = bucket
+                tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+                self._buckets.move_to_end(key)
+
+            if tokens >= 1.0:
+                self._buckets[key] = (tokens - 1.0, now)
+                self.allowed += 1
+                return True, 0
+
+            self._buckets[key] = (tokens, now)
+            self.rejected += 1
+            return False, max(1, math.ceil((1.0 - tokens) / self.rate))
+
+    def stats(self):
+        """
+        Return limiter counters for diagnostics
+        """
+        with self._lock:
+            return {
+                'allowed': self.allowed,
+                'rejected': self.rejected,
+                'evicted': self.evicted,
+                'unidentified': self.unidentified,
+                'trackedClients': len(self._buckets),
+            }
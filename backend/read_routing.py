@@ -0,0 +1,136 @@
+"""
+Route counter reads to a secondary endpoint with a staleness bound
+
+GET count and stats reads go to a secondary table endpoint (an RA-GRS
+secondary, a Cosmos DB read region or any stand-in with the same table)
+while writes stay on the primary. Reads fall back to the primary when:
+
+- the secondary fails; it is then skipped for a cooldown period
+- the secondary does not have the counter yet
+- the secondary's replication lag, when it reports one (RA-GRS
+  get_service_stats), exceeds the staleness bound
+- the secondary returns a count lower than one this worker committed more
+  than the staleness bound ago, i.e. it is provably too far behind
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from azure.core.exceptions import ResourceNotFoundError
+
+logger = logging.getLogger(__name__)
+
+
+def geo_replication_probe(service_client):
+    """
+    Return a probe reporting the secondary's last sync time from get_service_stats
+    """
+    def probe():
+        stats = service_client.get_service_stats()
+        return stats['geo_replication']['last_sync_time']
+    return probe
+
+
+class ReadRouter:
+    """
+    Chooses the secondary or primary table client for each read
+    """
+
+    def __init__(self, primary, secondary, max_staleness=30.0, cooldown=30.0,
+                 sync_probe=None, probe_interval=30.0, clock=time.time):
+        self.primary = primary
+        self.secondary = secondary
+        self.max_staleness = max_staleness
+        self.cooldown = cooldown
+        self.sync_probe = sync_probe
+        self.probe_interval = probe_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._skip_until = 0.0
+        self._probed_at = None
+        self._lag = None
+        self._last_write = None
+        self.secondary_reads = 0
+        self.primary_reads = 0
+        self.fallbacks = 0
+        self.stale = 0
+
+    def note_write(self, count):
+        """
+        Remember a count this worker committed to the primary
+        """
+        with self._lock:
+            self._last_write = (count, self.clock())
+
+    def replication_lag(self):
+        """
+        Return the secondary's reported lag in seconds, or None if it does not report one
+        """
+        if self.sync_probe is None:
+            return None
+        now = self.clock()
+        if self._probed_at is not None and now - self._probed_at < self.probe_interval:
+            return self._lag
+        self._probed_at = now
+        try:
+            last_sync = self.sync_probe()
+            self._lag = None if last_sync is None else max(
+                0.0, datetime.now(timezone.utc).timestamp() - last_sync.timestamp()
+            )
+        except Exception as e:
+            # Not an RA-GRS secondary (e.g. a Cosmos read region); rely on the write check
+            logger.info(f"Secondary does not report replication lag: {str(e)}")
+            self.sync_probe = None
+            self._lag = None
+        return self._lag
+
+    def _secondary_usable(self):
+        if self.clock() < self._skip_until:
+            return False
+        lag = self.replication_lag()
+        if lag is not None and lag > self.max_staleness:
+            self.stale += 1
+            return False
+        return True
+
+    def _fresh_enough(self, count):
+        with self._lock:
+            last_write = self._last_write
+        if last_write is None or count >= last_write[0]:
+            return True
+        return self.clock() - last_write[1] <= self.max_staleness
+
+    def read(self, fetch):
+        """
+        Return fetch(client) from the secondary when it is usable, else from the primary
+        """
+        if self._secondary_usable():
+            try:
+                record = fetch(self.secondary)
+                if self._fresh_enough(record.count):
+                    self.secondary_reads += 1
+                    return record
+                self.stale += 1
+            except ResourceNotFoundError:
+                # Not replicated yet; the primary decides whether the counter exists
+                self.fallbacks += 1
+            except Exception as e:
+                logger.warning(f"Secondary read failed, using primary for {self.cooldown}s: {str(e)}")
+                self._skip_until = self.clock() + self.cooldown
+                self.fallbacks += 1
+        self.primary_reads += 1
+        return fetch(self.primary)
+
+    def stats(self):
+        """
+        Return routing counters for diagnostics
+        """
+        return {
+            'secondaryReads': self.secondary_reads,
+            'primaryReads': self.primary_reads,
+            'fallbacks': self.fallbacks,
+            'stale': self.stale,
+            'replicationLagSeconds': self._lag,
+            'secondarySkipped': self.clock() < self._skip_until,
+        }
@@ -0,0 +1,218 @@
+"""
+Opt-in sampling profiler for route handlers
+
+A single background thread wakes every few milliseconds while requests are
+in flight and records the Python stack of each request that is being
+profiled. A request is profiled if it was picked by the sample rate when it
+started, or once it has been running longer than the slow threshold (so a
+slow request's profile covers the part after the threshold, which is where
+the regression is). Requests that are neither cost one dict insert and
+removal; when the profiler is disabled the decorator returns the handler
+unchanged, as it does for async handlers.
+
+Profiles are written in collapsed-stack format ("route;frame;frame count"
+per line), which flamegraph.pl, speedscope and inferno read directly, either
+to a directory capped at a number of files or to the log stream. Emitted
+profiles are rate limited with a token bucket.
+"""
+import functools
+import inspect
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _Session:
+    __slots__ = ('route', 'thread_id', 'started', 'sampled', 'stacks')
+
+    def __init__(self, route, thread_id, started, sampled):
+        self.route = route
+        self.thread_id = thread_id
+        self.started = started
+        self.sampled = sampled
+        self.stacks = {}
+
+
+class RequestProfiler:
+    """
+    Samples the stacks of selected requests and writes collapsed stacks
+    """
+
+    def __init__(self, enabled=False, sample_rate=0.0, slow_ms=1000.0, interval_ms=10.0, output_dir=None,
+                 max_files=50, max_per_minute=6, max_depth=64, rng=None, clock=time.monotonic):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_ms / 1000 if slow_ms > 0 else None
+        self.interval = interval_ms / 1000
+        self.output_dir = output_dir
+        self.max_files = max_files
+        self.max_per_minute = max_per_minute
+        self.max_depth = max_depth
+        self.rng = rng or random.Random()
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._sessions = {}
+        self._sampler = None
+        self._tokens = float(max_per_minute)
+        self._refilled_at = clock()
+        self.profiled = 0
+        self.emitted = 0
+        self.rate_limited = 0
+        self.samples = 0
+
+    def profile_route(self, handler):
+        """
+        Decorate a route handler so selected calls are profiled under its name
+        """
+        if not self.enabled or inspect.iscoroutinefunction(handler):
+            # Stacks are sampled per thread; an awaiting coroutine is not on one
+            return handler
+
+        @functools.wraps(handler)
+        def profiled(*args, **kwargs):
+            return self._call(handler.__name__, handler, args, kwargs)
+        return profiled
+
+    def _call(self, route, handler, args, kwargs):
+        session = _Session(route, threading.get_ident(), self.clock(), self.rng.random() < self.sample_rate)
+        self._register(session)
+        try:
+            return handler(*args, **kwargs)
+        finally:
+            self._finish(session)
+
+    def _register(self, session):
+        with self._lock:
+            self._sessions[id(session)] = session
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._sampler.start()
+        self._wake.set()
+
+    def _due(self, session, now):
+        return session.sampled or (self.slow_seconds is not None and now - session.started >= self.slow_seconds)
+
+    def _stack(self, frame):
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            if code is RequestProfiler._call.__code__:
+                break
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}".replace(';', ':'))
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def _run(self):
+        while True:
+            with self._lock:
+                sessions = list(self._sessions.values())
+            if not sessions:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            now = self.clock()
+            frames = sys._current_frames()
+            for session in sessions:
+                frame = frames.get(session.thread_id)
+                if frame is None or not self._due(session, now):
+                    continue
+                stack = self._stack(frame)
+                session.stacks[stack] = session.stacks.get(stack, 0) + 1
+                self.samples += 1
+            del frames
+            time.sleep(self.interval)
+
+    def _allow(self):
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(
+                float(self.max_per_minute), self._tokens + (now - self._refilled_at) * self.max_per_minute / 60
+            )
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            self.rate_limited += 1
+            return False
+
+    def _finish(self, session):
+        with self._lock:
+            self._sessions.pop(id(session), None)
+        now = self.clock()
+        elapsed = now - session.started
+        if not self._due(session, now) or not session.stacks:
+            return
+        self.profiled += 1
+        if not self._allow():
+            return
+        try:
+            self._emit(session, elapsed)
+            self.emitted += 1
+        except Exception as e:
+            logger.warning(f"Failed to write request profile: {str(e)}")
+
+    def _emit(self, session, elapsed):
+        folded = '\n'.join(
+            f"{session.route};{stack} {count}" if stack else f"{session.route} {count}"
+            for stack, count in sorted(session.stacks.items())
+        )
+        reason = "sampled" if session.sampled else "slow"
+        if not self.output_dir:
+            logger.info(f"Profile {session.route} {elapsed * 1000:.0f}ms ({reason}):\n{folded}")
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{id(session):x}-{session.route}-{reason}.folded"
+        path = os.path.join(self.output_dir, name)
+        with open(path + '.tmp', 'w') as f:
+            f.write(folded + '\n')
+        os.replace(path + '.tmp', path)
+        self._prune()
+
+    def _prune(self):
+        profiles = sorted(
+            (entry for entry in os.scandir(self.output_dir) if entry.name.endswith('.folded')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in profiles[:max(0, len(profiles) - self.max_files)]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def stats(self):
+        """
+        Return profiler counters for diagnostics
+        """
+        with self._lock:
+            active = len(self._sessions)
+        return {
+            'enabled': self.enabled,
+            'sampleRate': self.sample_rate,
+            'slowMs': None if self.slow_seconds is None else self.slow_seconds * 1000,
+            'active': active,
+            'profiled': self.profiled,
+            'emitted': self.emitted,
+            'rateLimited': self.rate_limited,
+            'samples': self.samples,
+        }
+
+
+def profiler_from_environment():
+    """
+    Build the profiler from PROFILER_* settings; disabled unless PROFILER_ENABLED=true
+    """
+    return RequestProfiler(
+        enabled=os.environ.get('PROFILER_ENABLED', 'false').lower() == 'true',
+        sample_rate=float(os.environ.get('PROFILER_SAMPLE_RATE', '0.0')),
+        slow_ms=float(os.environ.get('PROFILER_SLOW_MS', '1000')),
+        interval_ms=float(os.environ.get('PROFILER_INTERVAL_MS', '10')),
+        output_dir=os.environ.get('PROFILER_OUTPUT_DIR') or None,
+        max_files=int(os.environ.get('PROFILER_MAX_FILES', '50')),
+        max_per_minute=int(os.environ.get('PROFILER_MAX_PER_MINUTE', '6'))
+    )
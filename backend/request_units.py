@@ -0,0 +1,148 @@
+"""
+Request unit (RU) accounting for Cosmos DB Table operations
+
+Cosmos returns the cost of every operation in the x-ms-request-charge
+response header. A raw_response_hook on the table service client reads it
+for every call and attributes it to the HTTP route being served (set by the
+track_route decorator; background work is counted as "background") and to
+the table operation, inferred from the request method and path. Charges are
+also bucketed per second so the meter can report RU/s over a sliding window.
+
+With a ceiling configured, near_ceiling() turns true once RU/s crosses the
+threshold fraction of it, and callers switch to cheaper paths.
+"""
+import contextvars
+import functools
+import inspect
+import threading
+import time
+
+REQUEST_CHARGE_HEADER = "x-ms-request-charge"
+BACKGROUND_ROUTE = "background"
+
+_current_route = contextvars.ContextVar("ru_route", default=BACKGROUND_ROUTE)
+
+
+def classify_operation(request):
+    """
+    Name the table operation behind an outgoing HTTP request
+    """
+    method = request.method.upper()
+    path = request.url.split("?", 1)[0]
+    if path.endswith("$batch"):
+        return "submit_transaction"
+    if path.rstrip("/").endswith("/Tables"):
+        return "create_table" if method == "POST" else "list_tables"
+    if method == "GET":
+        return "get_entity" if path.endswith(")") else "query_entities"
+    if method == "POST":
+        return "create_entity"
+    if method == "DELETE":
+        return "delete_entity"
+    # Updates carry If-Match; upserts do not
+    return "update_entity" if "If-Match" in request.headers else "upsert_entity"
+
+
+class RequestUnitMeter:
+    """
+    Per-route and per-operation RU totals with a sliding RU/s window
+    """
+
+    def __init__(self, window_seconds=10, ceiling=None, threshold=0.8, clock=time.monotonic):
+        self.window_seconds = window_seconds
+        self.ceiling = ceiling
+        self.threshold = threshold
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._buckets = [[None, 0.0] for _ in range(window_seconds)]
+        self._totals = {}
+        self.total = 0.0
+        self.cached_reads = 0
+        self.deferred_writes = 0
+
+    def record(self, route, operation, charge):
+        """
+        Add one operation's charge to the totals and the current second's bucket
+        """
+        second = int(self.clock())
+        with self._lock:
+            bucket = self._buckets[second % self.window_seconds]
+            if bucket[0] != second:
+                bucket[0], bucket[1] = second, 0.0
+            bucket[1] += charge
+            entry = self._totals.setdefault(route, {}).setdefault(operation, [0, 0.0])
+            entry[0] += 1
+            entry[1] += charge
+            self.total += charge
+
+    def response_hook(self, pipeline_response):
+        """
+        raw_response_hook for table clients: record the charge of every response
+        """
+        charge = pipeline_response.http_response.headers.get(REQUEST_CHARGE_HEADER)
+        if charge is None:
+            # Azure Storage tables do not report request units
+            return
+        self.record(_current_route.get(), classify_operation(pipeline_response.http_request), float(charge))
+
+    def rate(self):
+        """
+        Return RU/s averaged over the sliding window
+        """
+        now = int(self.clock())
+        with self._lock:
+            used = sum(ru for second, ru in self._buckets
+                       if second is not None and now - self.window_seconds < second <= now)
+        return used / self.window_seconds
+
+    def near_ceiling(self):
+        """
+        True when a ceiling is configured and RU/s is within the threshold of it
+        """
+        return self.ceiling is not None and self.rate() >= self.ceiling * self.threshold
+
+    def track_route(self, handler):
+        """
+        Decorate a route handler so storage charges during it are attributed to its name
+        """
+        if inspect.iscoroutinefunction(handler):
+            @functools.wraps(handler)
+            async def tracked_async(*args, **kwargs):
+                token = _current_route.set(handler.__name__)
+                try:
+                    return await handler(*args, **kwargs)
+                finally:
+                    _current_route.reset(token)
+            return tracked_async
+
+        @functools.wraps(handler)
+        def tracked(*args, **kwargs):
+            token = _current_route.set(handler.__name__)
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                _current_route.reset(token)
+        return tracked
+
+    def stats(self):
+        """
+        Return RU totals, RU/s and budget state for diagnostics
+        """
+        rate = self.rate()
+        with self._lock:
+            by_route = {
+                route: {
+                    operation: {'calls': calls, 'requestUnits': round(ru, 2)}
+                    for operation, (calls, ru) in operations.items()
+                }
+                for route, operations in self._totals.items()
+            }
+            return {
+                'totalRequestUnits': round(self.total, 2),
+                'requestUnitsPerSecond': round(rate, 2),
+                'ceiling': self.ceiling,
+                'nearCeiling': self.ceiling is not None and rate >= self.ceiling * self.threshold,
+                'cachedReads': self.cached_reads,
+                'deferredWrites': self.deferred_writes,
+                'byRoute': by_route,
+            }
@@ -0,0 +1,69 @@
+"""
+Production entry point for running the function app outside the Functions host
+
+    python serve.py                      # uvicorn, one worker process per core
+    gunicorn serve:wsgi_app -c serve.py  # gunicorn gthread workers, same tuning
+
+Requires uvicorn (and optionally uvloop/httptools) or gunicorn, which are
+not part of the Functions deployment in requirements.txt.
+"""
+import multiprocessing
+import os
+
+from function_app import app as function_app, live_count_watcher
+from http_adapter import FunctionAsgiApp, FunctionWsgiApp
+from live_updates import LiveCountEventStream
+
+route_prefix = os.environ.get('SERVER_ROUTE_PREFIX', 'api')
+
+asgi_app = FunctionAsgiApp(
+    function_app,
+    route_prefix=route_prefix,
+    max_threads=int(os.environ.get('SERVER_HANDLER_THREADS', '32')),
+    # Server-sent events are only possible with a streaming server, not the Functions host
+    mounts={f"/{route_prefix}/visitor-counter/events": LiveCountEventStream(live_count_watcher)}
+)
+wsgi_app = FunctionWsgiApp(function_app, route_prefix=route_prefix)
+
+# gunicorn settings, read when this module is passed with -c
+bind = f"{os.environ.get('SERVER_HOST', '0.0.0.0')}:{os.environ.get('SERVER_PORT', '8000')}"
+workers = int(os.environ.get('SERVER_WORKERS', os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count())))
+# Tells each worker's table manager it shares the host (see HOST_ACCUMULATOR_ENABLED)
+os.environ.setdefault('SERVER_WORKERS', str(workers))
+threads = int(os.environ.get('SERVER_HANDLER_THREADS', '32'))
+worker_class = "gthread"
+backlog = 2048
+keepalive = 5
+# Recycle workers occasionally so slow leaks cannot accumulate
+max_requests = 100000
+max_requests_jitter = 10000
+# Each worker starts its own background threads; never fork an initialized app
+preload_app = False
+
+
+def main():
+    """
+    Serve the ASGI app under uvicorn with one worker per core
+    """
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("uvicorn is required: pip install 'uvicorn[standard]'")
+
+    uvicorn.run(
+        "serve:asgi_app",
+        host=os.environ.get('SERVER_HOST', '0.0.0.0'),
+        port=int(os.environ.get('SERVER_PORT', '8000')),
+        workers=workers,
+        loop="auto",
+        http="auto",
+        backlog=backlog,
+        timeout_keep_alive=keepalive,
+        access_log=os.environ.get('SERVER_ACCESS_LOG', 'false').lower() == 'true',
+        limit_concurrency=int(os.environ.get('SERVER_LIMIT_CONCURRENCY', '1024')),
+        log_level=os.environ.get('SERVER_LOG_LEVEL', 'warning'),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Single-flight request collapsing for the visitor counter backend
+
+Concurrent calls that share a key are collapsed into one in-flight execution;
+every caller receives the same result (or the same exception).
+"""
+import threading
+
+
+class _Call:
+    """
+    In-flight call shared by the leader and any waiting followers
+    """
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent identical calls within a worker process
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.collapsed = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Run fn once for all concurrent callers using the same key
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+                self.executed += 1
+            else:
+                leader = False
+                self.collapsed += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """
+        Return collapsing counters for diagnostics
+        """
+        with self._lock:
+            return {
+                'executed': self.executed,
+                'collapsed': self.collapsed,
+                'inFlight': len(self._calls),
+            }
@@ -0,0 +1,459 @@
+"""
+Startup and memory footprint benchmark across the function entry points
+
+    python startup_benchmark.py                          # every entry point, 5 fresh interpreters each
+    python startup_benchmark.py --runs 10 v2-backend v1-health
+    python startup_benchmark.py --history benchmarks/startup.jsonl
+
+Each run starts a fresh interpreter that imports one entry point, lets the
+adapter index its routes (v2) and serves a first request against a local
+in-memory Table service, then reports:
+
+- importMs: importing the entry module
+- indexMs: building the route table the host would index (v2 only)
+- firstResponseMs: the first request, including table client creation
+- processMs: the whole child process, interpreter startup and exit included
+- peakRssKb: peak resident set size of the child
+- allocatedBlocks: live allocator blocks added by import and first request
+- tracedPeakKb: peak Python allocations, from one extra tracemalloc run
+
+Medians over the runs are printed as a table and appended to a JSONL history
+file with the commit and Python version, and each metric is compared with the
+previous record for the same entry point so regressions show up over time.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(BACKEND_DIR, 'api')
+
+# name: (kind, entry file, method, route of the first request)
+ENTRY_POINTS = {
+    'v2-backend': ('v2', os.path.join(BACKEND_DIR, 'function_app.py'), 'POST', '/api/visitor-counter'),
+    'v2-api': ('v2', os.path.join(API_DIR, 'function_app.py'), 'POST', '/api/visitor-counter'),
+    'v1-visitor-counter': ('v1', os.path.join(API_DIR, 'visitor-counter', '__init__.py'), 'POST',
+                           '/api/visitor-counter'),
+    'v1-visitor-counter-simple': ('v1', os.path.join(API_DIR, 'visitor-counter-simple', '__init__.py'), 'POST',
+                                  '/api/visitor-counter-simple'),
+    'v1-health': ('v1', os.path.join(API_DIR, 'health', '__init__.py'), 'GET', '/api/health'),
+    'v1-simple_test': ('v1', os.path.join(API_DIR, 'simple_test', '__init__.py'), 'GET', '/api/simple_test'),
+}
+
+METRICS = ('importMs', 'indexMs', 'firstResponseMs', 'processMs', 'peakRssKb', 'allocatedBlocks')
+
+# Runs in the child with nothing imported beforehand except what is needed to measure
+CHILD_SCRIPT = r"""
+import importlib.util, os, sys, time
+kind, path, method, route, adapter_path = sys.argv[1:6]
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+traced = os.environ.get('STARTUP_BENCH_TRACE') == '1'
+if traced:
+    import tracemalloc
+    tracemalloc.start()
+baseline_blocks = sys.getallocatedblocks()
+baseline_rss = peak_rss_kb()
+
+started = time.perf_counter()
+if kind == 'v2':
+    sys.path.insert(0, os.path.dirname(path))
+    import function_app as module
+else:
+    # The host puts the app root, one level above the function folder, on the path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(path)))
+    spec = importlib.util.spec_from_file_location('entry_point', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+imported = time.perf_counter()
+import_blocks = sys.getallocatedblocks()
+
+import azure.functions as func
+if kind == 'v2':
+    spec = importlib.util.spec_from_file_location('http_adapter', adapter_path)
+    adapter = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(adapter)
+    router = adapter.FunctionRouter(module.app)
+    handle = lambda: router.dispatch(method, 'http://localhost' + route, route, '', {}, b'')
+else:
+    handle = lambda: module.main(func.HttpRequest(method, 'http://localhost' + route, headers={}, body=b''))
+indexed = time.perf_counter()
+response = handle()
+responded = time.perf_counter()
+
+result = {
+    'importMs': (imported - started) * 1000,
+    'indexMs': (indexed - imported) * 1000 if kind == 'v2' else None,
+    'firstResponseMs': (responded - indexed) * 1000,
+    'status': response.status_code,
+    'baselineRssKb': baseline_rss,
+    'peakRssKb': peak_rss_kb(),
+    'importBlocks': import_blocks - baseline_blocks,
+    'allocatedBlocks': sys.getallocatedblocks() - baseline_blocks,
+}
+if traced:
+    result['tracedPeakKb'] = tracemalloc.get_traced_memory()[1] // 1024
+import json
+sys.stdout.write(json.dumps(result) + '\n')
+sys.stdout.flush()
+# Background threads started by the app must not keep the child alive
+os._exit(0)
+"""
+
+ENTITY_PATH = re.compile(r"^/(?:[^/]+/)?(?P<table>[A-Za-z][A-Za-z0-9]*)"
+                         r"(?:\(PartitionKey='(?P<pk>(?:[^']|'')*)',RowKey='(?P<rk>(?:[^']|'')*)'\)|\(\))?$")
+FILTER_PARTITION = re.compile(r"PartitionKey eq '((?:[^']|'')*)'")
+
+
+class _TableRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=None, etag=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;odata=minimalmetadata;streaming=true;charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("x-ms-request-id", str(uuid.uuid4()))
+        self.send_header("Date", formatdate(usegmt=True))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _error(self, status, code):
+        self._send(status, {'odata.error': {'code': code, 'message': {'lang': 'en-US', 'value': code}}})
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _route(self):
+        with self.server.store.lock:
+            self.server.store.operations += 1
+        url = urlsplit(self.path)
+        match = ENTITY_PATH.match(unquote(url.path))
+        if match is None:
+            return None, None, parse_qs(url.query)
+        key = None
+        if match.group('pk') is not None:
+            key = (match.group('pk').replace("''", "'"), match.group('rk').replace("''", "'"))
+        return match.group('table'), key, parse_qs(url.query)
+
+    def _entity(self, table, key):
+        stored = self.server.store.tables.get(table, {}).get(key)
+        if stored is None:
+            return None
+        entity, etag, timestamp = stored
+        return {**entity, 'PartitionKey': key[0], 'RowKey': key[1], 'Timestamp': timestamp, 'odata.etag': etag}
+
+    def _write(self, table, key, entity, merge):
+        store = self.server.store
+        rows = store.tables.setdefault(table, {})
+        properties = {k: v for k, v in entity.items()
+                      if k.split('@')[0] not in ('PartitionKey', 'RowKey', 'Timestamp')}
+        if merge and key in rows:
+            properties = {**rows[key][0], **properties}
+        store.version += 1
+        etag = f"W/\"datetime'{store.version}'\""
+        rows[key] = (properties, etag, datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'))
+        return etag
+
+    def do_GET(self):
+        table, key, query = self._route()
+        if table is None:
+            return self._error(404, "ResourceNotFound")
+        with self.server.store.lock:
+            if key is not None:
+                entity = self._entity(table, key)
+                if entity is None:
+                    return self._error(404, "ResourceNotFound")
+                return self._send(200, entity, etag=entity['odata.etag'])
+            partition = FILTER_PARTITION.search(query.get('$filter', [''])[0])
+            values = [self._entity(table, row) for row in sorted(self.server.store.tables.get(table, {}))
+                      if partition is None or row[0] == partition.group(1).replace("''", "'")]
+        return self._send(200, {'value': values})
+
+    def do_POST(self):
+        table, key, _ = self._route()
+        body = self._body()
+        with self.server.store.lock:
+            if table == "Tables":
+                name = body.get('TableName')
+                if name in self.server.store.tables:
+                    return self._error(409, "TableAlreadyExists")
+                self.server.store.tables[name] = {}
+                return self._send(201, {'TableName': name})
+            if table is None:
+                return self._error(400, "InvalidInput")
+            key = (body.get('PartitionKey'), body.get('RowKey'))
+            if self._entity(table, key) is not None:
+                return self._error(409, "EntityAlreadyExists")
+            etag = self._write(table, key, body, merge=False)
+        return self._send(204, etag=etag)
+
+    def _update(self, merge):
+        table, key, _ = self._route()
+        body = self._body()
+        if table is None or key is None:
+            return self._error(400, "InvalidInput")
+        if_match = self.headers.get("If-Match")
+        with self.server.store.lock:
+            current = self._entity(table, key)
+            if if_match is not None:
+                if current is None:
+                    return self._error(404, "ResourceNotFound")
+                if if_match != "*" and if_match != current['odata.etag']:
+                    return self._error(412, "UpdateConditionNotSatisfied")
+            etag = self._write(table, key, body, merge)
+        return self._send(204, etag=etag)
+
+    def do_PUT(self):
+        self._update(merge=False)
+
+    def do_PATCH(self):
+        self._update(merge=True)
+
+    def do_MERGE(self):
+        self._update(merge=True)
+
+    def do_DELETE(self):
+        table, key, _ = self._route()
+        with self.server.store.lock:
+            rows = self.server.store.tables.get(table, {})
+            if key not in rows:
+                return self._error(404, "ResourceNotFound")
+            del rows[key]
+        return self._send(204)
+
+
+class _TableStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tables = {}
+        self.version = 0
+        self.operations = 0
+
+
+class LocalTableBackend:
+    """
+    In-memory Table service on localhost covering the calls the entry points make
+    """
+
+    ACCOUNT_NAME = "devstoreaccount1"
+    # The well-known development storage key; requests are not authenticated
+    ACCOUNT_KEY = "Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=="
+
+    def __init__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _TableRequestHandler)
+        self.server.daemon_threads = True
+        self.server.store = _TableStore()
+        self._thread = None
+
+    @property
+    def operations(self):
+        """
+        Number of storage requests served so far
+        """
+        return self.server.store.operations
+
+    @property
+    def connection_string(self):
+        port = self.server.server_address[1]
+        return (f"DefaultEndpointsProtocol=http;AccountName={self.ACCOUNT_NAME};AccountKey={self.ACCOUNT_KEY};"
+                f"TableEndpoint=http://127.0.0.1:{port}/{self.ACCOUNT_NAME};")
+
+    def reset(self):
+        """
+        Drop every table so each run starts from an empty account
+        """
+        with self.server.store.lock:
+            self.server.store.tables.clear()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="local-table-backend", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def run_entry_point(name, backend, python=sys.executable, trace=False):
+    """
+    Run one entry point in a fresh interpreter and return its measurements
+    """
+    kind, path, method, route = ENTRY_POINTS[name]
+    backend.reset()
+    state_dir = tempfile.mkdtemp(prefix="startup-bench-")
+    env = {key: value for key, value in os.environ.items() if not key.startswith('PYTHON')}
+    env.update({
+        'AzureWebJobsStorage': backend.connection_string,
+        'COSMOS_DB_CONNECTION_STRING': backend.connection_string,
+        'COUNT_SNAPSHOT_PATH': os.path.join(state_dir, "count.snapshot"),
+        'INCREMENT_JOURNAL_PATH': os.path.join(state_dir, "increments.journal"),
+    })
+    if trace:
+        env['STARTUP_BENCH_TRACE'] = '1'
+    started = time.perf_counter()
+    result = subprocess.run(
+        [python, '-I', '-c', CHILD_SCRIPT, kind, path, method, route, os.path.join(BACKEND_DIR, 'http_adapter.py')],
+        env=env, cwd=state_dir, capture_output=True, text=True, timeout=120
+    )
+    elapsed = time.perf_counter() - started
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        error = (result.stderr.strip().splitlines() or ["no output"])[-1]
+        raise RuntimeError(f"{name} failed: {error}")
+    measured = json.loads(lines[-1])
+    measured['processMs'] = elapsed * 1000
+    return measured
+
+
+def summarize(runs, traced=None):
+    """
+    Return the median of each metric over the runs
+    """
+    summary = {}
+    for metric in METRICS:
+        values = [run[metric] for run in runs if run.get(metric) is not None]
+        summary[metric] = round(statistics.median(values), 1) if values else None
+    summary['status'] = runs[-1]['status']
+    summary['tracedPeakKb'] = traced.get('tracedPeakKb') if traced else None
+    return summary
+
+
+def current_commit():
+    """
+    Return the checked out commit, or None outside a git checkout
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_results(history_path):
+    """
+    Return the latest recorded summary for each entry point in the history file
+    """
+    previous = {}
+    if not history_path or not os.path.exists(history_path):
+        return previous
+    with open(history_path) as f:
+        for line in f:
+            if line.strip():
+                previous.update(json.loads(line).get('results', {}))
+    return previous
+
+
+def record_history(history_path, results, runs):
+    """
+    Append this benchmark's summaries to the history file
+    """
+    directory = os.path.dirname(os.path.abspath(history_path))
+    os.makedirs(directory, exist_ok=True)
+    record = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': current_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'runs': runs,
+        'results': results,
+    }
+    with open(history_path, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+
+def format_table(results, previous):
+    """
+    Render the summaries with the change against the previous record
+    """
+    columns = ('importMs', 'firstResponseMs', 'processMs', 'peakRssKb', 'allocatedBlocks', 'tracedPeakKb')
+    lines = [f"{'entry point':<28}" + ''.join(f"{column:>22}" for column in columns)]
+    for name, summary in results.items():
+        cells = []
+        for column in columns:
+            value = summary.get(column)
+            before = previous.get(name, {}).get(column)
+            cell = '-' if value is None else f"{value:g}"
+            if value is not None and before:
+                cell += f" ({(value - before) / before:+.0%})"
+            cells.append(f"{cell:>22}")
+        lines.append(f"{name:<28}" + ''.join(cells))
+    return '\n'.join(lines)
+
+
+def benchmark(names, runs=5, python=sys.executable, trace=True):
+    """
+    Benchmark the named entry points against a local backend and return their summaries
+    """
+    results = {}
+    with LocalTableBackend() as backend:
+        for name in names:
+            measured = [run_entry_point(name, backend, python) for _ in range(runs)]
+            traced = run_entry_point(name, backend, python, trace=True) if trace else None
+            results[name] = summarize(measured, traced)
+    return results
+
+
+def main(argv=None):
+    """
+    Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="Measure startup time and memory of each function entry point")
+    parser.add_argument("entry_points", nargs="*",
+                        help=f"entry points to run (default: all of {', '.join(ENTRY_POINTS)})")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per entry point")
+    parser.add_argument("--python", default=sys.executable, help="interpreter to benchmark")
+    parser.add_argument("--history", default=os.path.join(BACKEND_DIR, 'benchmarks', 'startup_history.jsonl'),
+                        help="JSONL file the results are appended to and compared against")
+    parser.add_argument("--no-trace", action="store_true", help="skip the extra tracemalloc run")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    names = args.entry_points or list(ENTRY_POINTS)
+    unknown = [name for name in names if name not in ENTRY_POINTS]
+    if unknown:
+        parser.error(f"unknown entry points: {', '.join(unknown)}")
+    previous = previous_results(args.history)
+    results = benchmark(names, runs=args.runs, python=args.python, trace=not args.no_trace)
+    record_history(args.history, results, args.runs)
+    print(json.dumps(results) if args.json else format_table(results, previous))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Streaming export and import of the visitor counter table as gzipped NDJSON
+
+    python table_backup.py export backup.ndjson.gz
+    python table_backup.py import backup.ndjson.gz --table VisitorCounterClone
+    python table_backup.py export legacy.ndjson.gz --connection-setting AzureWebJobsStorage
+
+Export splits the PartitionKey space into ranges scanned in parallel; pages
+flow through a bounded queue to a single writer, so memory stays constant
+whatever the table size. Import reads the file line by line and submits
+batch transactions of up to 100 entities per partition with a bounded number
+of batches in flight. Property types that JSON cannot carry (DateTime, Int64,
+Guid, Binary) are written as {"$edm": type, "value": text} and restored on import.
+"""
+import argparse
+import base64
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from azure.core.exceptions import ResourceExistsError
+from azure.data.tables import EdmType, EntityProperty, TableServiceClient, UpdateMode
+
+logger = logging.getLogger(__name__)
+
+# Azure Tables rejects transactions with more than 100 operations
+MAX_BATCH_OPERATIONS = 100
+# Range boundaries for the parallel scan; keys outside them fall into the first or last range
+KEY_ALPHABET = "-0123456789abcdefghijklmnopqrstuvwxyz"
+_END = object()
+
+
+def encode_value(value):
+    """
+    Return a JSON-safe form of an entity property value
+    """
+    if isinstance(value, EntityProperty):
+        edm_type = EdmType(value.edm_type)
+        inner = value.value
+        if edm_type == EdmType.BINARY:
+            inner = base64.b64encode(inner).decode("ascii")
+        elif edm_type == EdmType.DATETIME and isinstance(inner, datetime):
+            inner = inner.isoformat()
+        return {"$edm": edm_type.value, "value": str(inner) if edm_type == EdmType.INT64 else inner}
+    if isinstance(value, datetime):
+        return {"$edm": EdmType.DATETIME.value, "value": value.isoformat()}
+    if isinstance(value, bytes):
+        return {"$edm": EdmType.BINARY.value, "value": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, uuid.UUID):
+        return {"$edm": EdmType.GUID.value, "value": str(value)}
+    return value
+
+
+def decode_value(value):
+    """
+    Restore a property value written by encode_value
+    """
+    if not isinstance(value, dict) or "$edm" not in value:
+        return value
+    edm_type, inner = EdmType(value["$edm"]), value["value"]
+    if edm_type == EdmType.DATETIME:
+        return datetime.fromisoformat(inner)
+    if edm_type == EdmType.BINARY:
+        return base64.b64decode(inner)
+    if edm_type == EdmType.GUID:
+        return uuid.UUID(inner)
+    if edm_type == EdmType.INT64:
+        return EntityProperty(int(inner), EdmType.INT64)
+    return EntityProperty(inner, edm_type)
+
+
+def encode_entity(entity):
+    """
+    Serialize one entity to a single NDJSON line
+    """
+    return json.dumps({name: encode_value(value) for name, value in entity.items()}, separators=(",", ":"))
+
+
+def decode_entity(line):
+    """
+    Parse one NDJSON line back into an entity dict
+    """
+    return {name: decode_value(value) for name, value in json.loads(line).items()}
+
+
+def key_ranges(parallelism):
+    """
+    Split the PartitionKey space into contiguous (low, high) ranges; None means unbounded
+    """
+    parallelism = max(1, min(parallelism, len(KEY_ALPHABET)))
+    step = len(KEY_ALPHABET) / parallelism
+    bounds = [KEY_ALPHABET[int(i * step)] for i in range(1, parallelism)]
+    lows = [None] + bounds
+    highs = bounds + [None]
+    return list(zip(lows, highs))
+
+
+def _range_filter(low, high):
+    clauses, parameters = [], {}
+    if low is not None:
+        clauses.append("PartitionKey ge @low")
+        parameters["low"] = low
+    if high is not None:
+        clauses.append("PartitionKey lt @high")
+        parameters["high"] = high
+    return " and ".join(clauses), parameters
+
+
+class TransferReport:
+    """
+    Entity and byte counts for an export or import, with throughput
+    """
+    __slots__ = ("entities", "bytes", "batches", "started", "finished")
+
+    def __init__(self):
+        self.entities = 0
+        self.bytes = 0
+        self.batches = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def finish(self):
+        self.finished = time.perf_counter()
+        return self
+
+    def to_dict(self):
+        seconds = (self.finished or time.perf_counter()) - self.started
+        return {
+            'entities': self.entities,
+            'bytes': self.bytes,
+            'batches': self.batches,
+            'seconds': round(seconds, 3),
+            'entitiesPerSecond': round(self.entities / seconds, 1) if seconds > 0 else None,
+            'megabytesPerSecond': round(self.bytes / seconds / 1e6, 3) if seconds > 0 else None,
+        }
+
+
+def export_table(table_client, path, parallelism=8, page_size=1000, queue_pages=16):
+    """
+    Stream every entity of the table to a gzipped NDJSON file and return a TransferReport
+    """
+    report = TransferReport()
+    pages = queue.Queue(maxsize=queue_pages)
+    errors = []
+    stop = threading.Event()
+
+    def put(item):
+        # Give up if the writer failed, rather than blocking on a queue nobody drains
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=1)
+                return
+            except queue.Full:
+                pass
+
+    def scan(low, high):
+        try:
+            query_filter, parameters = _range_filter(low, high)
+            if query_filter:
+                entities = table_client.query_entities(
+                    query_filter, parameters=parameters, results_per_page=page_size
+                )
+            else:
+                entities = table_client.list_entities(results_per_page=page_size)
+            for page in entities.by_page():
+                if stop.is_set():
+                    return
+                lines = [encode_entity(entity) for entity in page]
+                if lines:
+                    put(lines)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            put(_END)
+
+    ranges = key_ranges(parallelism)
+    with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="table-export") as executor:
+        for low, high in ranges:
+            executor.submit(scan, low, high)
+
+        remaining = len(ranges)
+        try:
+            with gzip.open(path, "wt", encoding="utf-8") as out:
+                while remaining:
+                    lines = pages.get()
+                    if lines is _END:
+                        remaining -= 1
+                        continue
+                    for line in lines:
+                        out.write(line)
+                        out.write("\n")
+                        report.bytes += len(line) + 1
+                    report.entities += len(lines)
+                    report.batches += 1
+        except BaseException:
+            stop.set()
+            raise
+
+    if errors:
+        raise errors[0]
+    return report.finish()
+
+
+def import_table(table_client, path, parallelism=8, mode="upsert", max_open_partitions=64):
+    """
+    Load a gzipped NDJSON export into the table with per-partition batches; return a TransferReport
+    """
+    report = TransferReport()
+    in_flight = threading.BoundedSemaphore(parallelism * 2)
+    buffers = {}
+    errors = []
+    # Restores replace rows wholesale rather than merging into what is there
+    options = ({"mode": UpdateMode.REPLACE},) if mode == "upsert" else ()
+
+    def submit(operations):
+        try:
+            table_client.submit_transaction(operations)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            in_flight.release()
+
+    def flush(partition_key):
+        entities = buffers.pop(partition_key)
+        in_flight.acquire()
+        executor.submit(submit, [(mode, entity, *options) for entity in entities])
+        report.batches += 1
+
+    with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix="table-import") as executor:
+        with gzip.open(path, "rt", encoding="utf-8") as source:
+            for line in source:
+                if errors:
+                    # Stop early instead of after the whole file
+                    break
+                if not line.strip():
+                    continue
+                entity = decode_entity(line)
+                report.bytes += len(line)
+                report.entities += 1
+                partition_key = entity['PartitionKey']
+                buffers.setdefault(partition_key, []).append(entity)
+                if len(buffers[partition_key]) == MAX_BATCH_OPERATIONS:
+                    flush(partition_key)
+                elif len(buffers) > max_open_partitions:
+                    # Bound memory when partitions are interleaved: send the oldest partial batch
+                    flush(next(iter(buffers)))
+            if not errors:
+                for partition_key in list(buffers):
+                    flush(partition_key)
+
+    if errors:
+        raise errors[0]
+    return report.finish()
+
+
+def table_client_from_environment(table_name=None, connection_setting=None):
+    """
+    Return a table client using the function app's storage configuration
+    """
+    if connection_setting:
+        connection_string = os.environ.get(connection_setting)
+        if not connection_string:
+            raise SystemExit(f"{connection_setting} is not set")
+        service = TableServiceClient.from_connection_string(conn_str=connection_string)
+    else:
+        from function_app import create_table_service_client
+        service = create_table_service_client()
+    return service.get_table_client(table_name=table_name or os.environ.get('COSMOS_DB_TABLE', 'VisitorCounter'))
+
+
+def main(argv=None):
+    """
+    Command line entry point for export and import
+    """
+    parser = argparse.ArgumentParser(description="Export or import the visitor counter table as gzipped NDJSON")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", help="gzipped NDJSON file to write or read")
+    parser.add_argument("--table", help="table name (default: COSMOS_DB_TABLE or VisitorCounter)")
+    parser.add_argument("--connection-setting",
+                        help="environment variable holding a connection string, e.g. AzureWebJobsStorage")
+    parser.add_argument("--parallelism", type=int, default=8)
+    parser.add_argument("--mode", choices=["upsert", "create"], default="upsert",
+                        help="import operation; create fails on existing rows")
+    args = parser.parse_args(argv)
+
+    table_client = table_client_from_environment(args.table, args.connection_setting)
+    if args.command == "export":
+        report = export_table(table_client, args.path, parallelism=args.parallelism)
+    else:
+        try:
+            table_client.create_table()
+        except ResourceExistsError:
+            pass
+        report = import_table(table_client, args.path, parallelism=args.parallelism, mode=args.mode)
+    print(json.dumps({'command': args.command, 'table': table_client.table_name, **report.to_dict()}))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Shared pytest configuration for the backend unit tests
+"""
+
+import itertools
+import os
+import sys
+import tempfile
+from unittest.mock import Mock, patch
+
+import pytest
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    ResourceExistsError, ResourceModifiedError, ResourceNotFoundError, ServiceRequestError
+)
+from azure.data.tables import TableEntity, TableTransactionError, UpdateMode
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# Keep the local count snapshot and increment journal out of the real temp dir
+_state_dir = tempfile.mkdtemp(prefix="visitor-counter-tests-")
+os.environ.setdefault('COUNT_SNAPSHOT_PATH', os.path.join(_state_dir, "count.snapshot"))
+os.environ.setdefault('INCREMENT_JOURNAL_PATH', os.path.join(_state_dir, "increments.journal"))
+# Manager tests configure the table client mock directly; the limiter has its own tests
+os.environ.setdefault('TABLE_CONCURRENCY_LIMIT_ENABLED', 'false')
+
+
+class FakeClock:
+    """Manually advanced clock for helpers that take a clock callable"""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class InMemoryTable:
+    """Table client stand-in with per-row ETags, conditional writes and atomic batches"""
+
+    def __init__(self):
+        self.rows = {}
+        self.writes = 0
+        self.fail_transactions = 0
+        self._etags = itertools.count(1)
+        self._interleaved = []
+
+    def add_concurrently(self, partition_key, row_key, field, amount):
+        """Have another writer add amount to a row's field right before the next update"""
+        def write():
+            row = self.rows[(partition_key, row_key)]
+            self._store({**row, field: row[field] + amount})
+        self._interleaved.append(write)
+
+    def _store(self, entity):
+        row = TableEntity(**entity)
+        row._metadata = {'etag': f'W/"{next(self._etags)}"'}
+        self.rows[(entity['PartitionKey'], entity['RowKey'])] = row
+        return dict(row.metadata)
+
+    def _copy(self, row):
+        entity = TableEntity(**row)
+        entity._metadata = dict(row.metadata)
+        return entity
+
+    def _check(self, operation, entity, etag=None, match_condition=None, **kwargs):
+        current = self.rows.get((entity['PartitionKey'], entity['RowKey']))
+        if operation == "create" and current is not None:
+            raise ResourceExistsError("exists")
+        if operation == "update":
+            if current is None:
+                raise ResourceNotFoundError("missing")
+            if match_condition == MatchConditions.IfNotModified and current.metadata['etag'] != etag:
+                raise ResourceModifiedError("etag mismatch")
+
+    def _write(self, operation, entity, mode=UpdateMode.MERGE, **kwargs):
+        row = dict(entity)
+        if operation == "update" and mode == UpdateMode.MERGE:
+            row = {**self.rows[(entity['PartitionKey'], entity['RowKey'])], **entity}
+        self.writes += 1
+        return self._store(row)
+
+    def get_entity(self, partition_key, row_key, select=None):
+        try:
+            return self._copy(self.rows[(partition_key, row_key)])
+        except KeyError:
+            raise ResourceNotFoundError("missing")
+
+    def query_entities(self, query_filter, select=None):
+        # Only partition scans of the form "PartitionKey eq '<partition>'"
+        partition = query_filter.split("'")[1]
+        return [self._copy(row) for key, row in self.rows.items() if key[0] == partition]
+
+    def create_entity(self, entity):
+        self._check("create", entity)
+        return self._write("create", entity)
+
+    def update_entity(self, entity, mode=UpdateMode.MERGE, **kwargs):
+        while self._interleaved:
+            self._interleaved.pop(0)()
+        self._check("update", entity, **kwargs)
+        return self._write("update", entity, mode)
+
+    def submit_transaction(self, operations):
+        if self.fail_transactions:
+            self.fail_transactions -= 1
+            raise ServiceRequestError("unreachable")
+        for operation, entity, *rest in operations:
+            try:
+                self._check(operation, entity, **(rest[0] if rest else {}))
+            except (ResourceExistsError, ResourceModifiedError, ResourceNotFoundError) as e:
+                raise TableTransactionError(message=str(e))
+        for operation, entity, *rest in operations:
+            self._write(operation, entity, **(rest[0] if rest else {}))
+
+
+@pytest.fixture
+def make_table():
+    return InMemoryTable
+
+
+@pytest.fixture
+def make_manager():
+    """Build TableStorageManagers whose table service hands out the given table client"""
+    import function_app
+
+    def make(table=None, **settings):
+        table = table if table is not None else Mock()
+        with patch.dict(os.environ, {'COSMOS_DB_CONNECTION_STRING': 'test', **settings}), \
+                patch.object(function_app, 'TableServiceClient') as mock_service:
+            mock_service.from_connection_string.return_value.get_table_client.return_value = table
+            return function_app.TableStorageManager()
+
+    return make
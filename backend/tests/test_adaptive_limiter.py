@@ -0,0 +1,143 @@
+"""
+Unit tests for the AIMD storage concurrency limiter
+"""
+
+import os
+import sys
+import threading
+from unittest.mock import Mock, patch
+
+import pytest
+from azure.core.exceptions import HttpResponseError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from adaptive_limiter import AdaptiveConcurrencyLimiter, ConcurrencyLimitExceeded, LimitedTableClient
+import function_app
+
+
+def throttled_error():
+    error = HttpResponseError(message="throttled")
+    error.status_code = 429
+    return error
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """Test cases for additive increase and multiplicative decrease"""
+
+    def test_grows_by_about_one_per_window_while_healthy(self, clock):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=10, clock=clock)
+
+        for _ in range(4):
+            limiter.release(limiter.acquire())
+
+        assert limiter.limit == pytest.approx(5, abs=0.1)
+
+    def test_throttling_halves_once_per_window(self, clock):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=16, clock=clock)
+        starts = [limiter.acquire() for _ in range(8)]
+        clock.now = 0.01
+
+        for started in starts:
+            limiter.release(started, throttled=True)
+
+        assert limiter.limit == 8
+        assert limiter.decreases == 1
+        assert limiter.throttled == 8
+
+    def test_rising_latency_shrinks_the_limit(self, clock):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=16, latency_tolerance=2.0, clock=clock)
+        for _ in range(5):
+            started = limiter.acquire()
+            clock.now += 0.01
+            limiter.release(started)
+        before = limiter.limit
+
+        started = limiter.acquire()
+        clock.now += 0.1
+        limiter.release(started)
+
+        assert limiter.limit == pytest.approx(before / 2)
+        assert limiter.slow == 1
+
+    def test_slow_cold_call_does_not_set_the_baseline(self, clock):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=16, latency_tolerance=2.0, warmup_samples=3, clock=clock)
+        for latency in (1.0, 0.01, 0.01):
+            started = limiter.acquire()
+            clock.now += latency
+            limiter.release(started)
+
+        started = limiter.acquire()
+        clock.now += 0.1
+        limiter.release(started)
+
+        assert limiter.baseline_latency == pytest.approx(0.01)
+        assert limiter.slow == 1
+        assert limiter.decreases == 1
+
+    def test_never_drops_below_the_floor(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, min_limit=1)
+        for _ in range(5):
+            limiter.release(limiter.acquire(), throttled=True)
+
+        assert limiter.limit == 1
+
+    def test_excess_work_is_shed_when_the_queue_is_full(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_queue=0)
+        limiter.acquire()
+
+        with pytest.raises(ConcurrencyLimitExceeded):
+            limiter.acquire()
+        assert limiter.stats()['shed'] == 1
+
+    def test_queued_call_runs_when_a_permit_frees(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, queue_timeout=5)
+        started = limiter.acquire()
+        threading.Timer(0.05, limiter.release, args=(started,)).start()
+
+        limiter.release(limiter.acquire())
+
+        assert limiter.shed == 0
+        assert limiter.queue_wait > 0
+
+    def test_queue_wait_times_out(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, queue_timeout=0.05)
+        limiter.acquire()
+
+        with pytest.raises(ConcurrencyLimitExceeded):
+            limiter.acquire()
+
+
+class TestLimitedTableClient:
+    """Test cases for the limited table client proxy"""
+
+    def test_429_from_storage_counts_as_throttling(self):
+        inner = Mock()
+        inner.get_entity.side_effect = throttled_error()
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+        client = LimitedTableClient(inner, limiter)
+
+        with pytest.raises(HttpResponseError):
+            client.get_entity(partition_key="p", row_key="r")
+
+        assert limiter.limit == 4
+        assert limiter.in_flight == 0
+
+    def test_each_page_takes_a_permit(self):
+        inner = Mock()
+        inner.query_entities.return_value.by_page.return_value = iter([iter([1, 2]), iter([3])])
+        limiter = AdaptiveConcurrencyLimiter()
+        client = LimitedTableClient(inner, limiter)
+
+        assert list(client.query_entities("PartitionKey eq 'p'")) == [1, 2, 3]
+        assert limiter.completed == 3
+
+    def test_manager_calls_go_through_the_shared_limiter(self, make_manager):
+        limiter = AdaptiveConcurrencyLimiter()
+        table = Mock()
+        table.get_entity.return_value = {'Count': 3}
+        with patch.object(function_app, 'storage_limiter', limiter):
+            manager = make_manager(table)
+
+        assert manager.get_visitor_count() == 3
+
+        assert limiter.completed == 1
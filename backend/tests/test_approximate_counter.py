@@ -0,0 +1,111 @@
+"""
+Unit tests for the approximate (Morris) counter mode
+"""
+
+import json
+import os
+import random
+import statistics
+import sys
+from unittest.mock import Mock, patch
+
+import azure.functions as func
+from azure.core.exceptions import ResourceNotFoundError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from approximate_counter import ApproximateCounter, MorrisCounter
+import function_app
+
+
+class TestMorrisCounter:
+    """Test cases for the probabilistic counting arithmetic"""
+
+    def test_estimate_is_unbiased_with_configured_error(self):
+        morris = MorrisCounter(relative_error=0.1, rng=random.Random(7))
+        estimates = [morris.estimate(morris.advance(0, 2000)) for _ in range(400)]
+
+        assert abs(statistics.mean(estimates) - 2000) / 2000 < 0.02
+        assert 0.07 < statistics.pstdev(estimates) / 2000 < 0.13
+
+    def test_register_for_is_unbiased(self):
+        morris = MorrisCounter(relative_error=0.05, rng=random.Random(3))
+        estimates = [morris.estimate(morris.register_for(12345)) for _ in range(2000)]
+
+        assert abs(statistics.mean(estimates) - 12345) / 12345 < 0.005
+
+    def test_base_follows_relative_error(self):
+        assert MorrisCounter(relative_error=0.05).base == 1.005
+        assert round(MorrisCounter(base=1.02).relative_error, 4) == 0.1
+
+
+class TestApproximateCounter:
+    """Test cases for the stored register"""
+
+    def test_writes_are_a_fraction_of_visits(self, make_table):
+        table = make_table()
+        counter = ApproximateCounter(table, relative_error=0.1, rng=random.Random(1))
+        counter.seed(0)
+        for _ in range(5000):
+            counter.add(1)
+
+        assert table.writes < 500
+        assert abs(counter.estimate() - 5000) / 5000 < 0.4
+        assert counter.stats()['visits'] == 5000
+
+    def test_lost_race_retests_draw_against_fresh_register(self, make_table):
+        table = make_table()
+        rng = Mock(random=Mock(return_value=0.0))
+        counter = ApproximateCounter(table, rng=rng)
+        counter.seed(0)
+        # Another instance bumps the register first
+        table.add_concurrently("visitor-counter", "approximate", 'Register', 1)
+
+        counter.add(1)
+
+        assert counter.conflicts == 1
+        assert table.rows[("visitor-counter", "approximate")]['Register'] == 2
+        assert rng.random.call_count == 1
+
+    def test_contended_estimate_stays_unbiased(self, make_table):
+        rng = random.Random(11)
+        estimates = []
+        for _ in range(400):
+            table = make_table()
+            # Two instances that only see each other's writes through lost races
+            instances = [ApproximateCounter(table, relative_error=0.1, rng=rng, refresh_interval=1e9)
+                         for _ in range(2)]
+            instances[0].seed(0)
+            for visit in range(200):
+                instances[visit % 2].add(1)
+            estimates.append(instances[0].read())
+
+        assert sum(instance.conflicts for instance in instances) > 0
+        assert abs(statistics.mean(estimates) - 200) / 200 < 0.02
+
+    def test_read_before_seed_raises_not_found(self, make_table):
+        counter = ApproximateCounter(make_table())
+
+        try:
+            counter.read()
+            raise AssertionError("expected ResourceNotFoundError")
+        except ResourceNotFoundError:
+            pass
+
+
+class TestManagerApproximateMode:
+    """Test cases for COUNTER_MODE=approximate in the table manager"""
+
+    def test_response_is_marked_approximate(self, make_table, make_manager):
+        table = make_table()
+        table.get_entity = Mock(wraps=table.get_entity)
+        manager = make_manager(table, COUNTER_MODE='approximate', APPROXIMATE_RELATIVE_ERROR='0.05')
+
+        request = func.HttpRequest(method="GET", url="/api/visitor-counter", body=b"")
+        with patch.object(function_app, 'table_manager', manager), \
+                patch.object(function_app, 'get_table_manager', return_value=manager):
+            body = json.loads(function_app.visitor_counter_response(request).get_body())
+
+        assert body['mode'] == "approximate"
+        assert body['relativeError'] == 0.05
+        assert body['count'] == 0
+        assert manager.get_visitor_stats()['mode'] == "approximate"
@@ -0,0 +1,69 @@
+"""
+Unit tests for beacon-style deferred visitor counter increments
+"""
+
+import os
+import sys
+from unittest.mock import Mock, patch
+
+import azure.functions as func
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from beacon import DeferredIncrementQueue
+from visit_filter import RotatingVisitFilter
+import function_app
+
+
+class TestDeferredIncrementQueue:
+    """Test cases for the bounded increment queue"""
+
+    def test_pending_increments_are_applied_as_one_batch(self):
+        apply_increment = Mock()
+        queue = DeferredIncrementQueue(apply_increment, max_pending=10, flush_interval=60)
+        queue._worker = Mock()  # drive draining by hand
+
+        for _ in range(5):
+            assert queue.submit()
+
+        assert queue.drain() == 5
+        apply_increment.assert_called_once_with(5)
+        assert queue.stats()['batches'] == 1
+
+    def test_overflow_is_dropped_and_counted(self):
+        queue = DeferredIncrementQueue(Mock(), max_pending=3, flush_interval=60)
+        queue._worker = Mock()
+
+        results = [queue.submit() for _ in range(5)]
+
+        assert results == [True, True, True, False, False]
+        assert queue.stats()['dropped'] == 2
+
+    def test_failed_apply_is_accounted(self):
+        queue = DeferredIncrementQueue(Mock(side_effect=Exception("down")), flush_interval=60)
+        queue._worker = Mock()
+        queue.submit()
+
+        assert queue.drain() == 0
+        assert queue.stats()['failed'] == 1
+
+
+class TestBeaconRoute:
+    """Test cases for POST ?mode=beacon"""
+
+    @patch('function_app.get_table_manager')
+    def test_beacon_returns_204_without_waiting_for_storage(self, mock_get_manager):
+        queue = DeferredIncrementQueue(Mock(), flush_interval=60)
+        queue._worker = Mock()
+        req = func.HttpRequest(
+            "POST", "/api/visitor-counter", params={'mode': 'beacon'},
+            headers={'X-Client-IP': '192.0.2.40'}, body=b""
+        )
+
+        with patch.object(function_app, 'beacon_queue', queue), \
+                patch.object(function_app, 'repeat_visit_filter', RotatingVisitFilter(window_seconds=60)):
+            response = function_app.visitor_counter(req)
+
+        assert response.status_code == 204
+        assert response.get_body() == b""
+        assert queue.stats()['pending'] == 1
+        mock_get_manager.assert_not_called()
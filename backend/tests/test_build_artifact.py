@@ -0,0 +1,102 @@
+"""
+Unit tests for the deployment artifact builder
+"""
+
+import os
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from build_artifact import build, prune_requirements, resolve_imports
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def make_app(root):
+    write(root / "function_app.py", (
+        "import json\n"
+        "from helper import VALUE\n"
+        "try:\n"
+        "    from optional_helper import wrap\n"
+        "except ImportError:\n"
+        "    wrap = None\n"
+        "def handler():\n"
+        "    import lazy_helper\n"
+        "    return lazy_helper\n"
+    ))
+    write(root / "helper.py", "import azure.data.tables\nVALUE = 1\n")
+    write(root / "optional_helper.py", "def wrap(x):\n    return x\n")
+    write(root / "lazy_helper.py", "from pkg import sub\n")
+    write(root / "pkg" / "__init__.py", "")
+    write(root / "pkg" / "sub.py", "from . import other\n")
+    write(root / "pkg" / "other.py", "")
+    write(root / "serve.py", "import function_app\n")
+    write(root / "tests" / "test_app.py", "import function_app\n")
+    write(root / "requirements.txt", (
+        "# Core\n"
+        "azure-functions>=1.18.0\n"
+        "azure-data-tables>=12.4.0\n"
+        "requests>=2.31.0\n"
+        "python-dateutil>=2.8.2\n"
+    ))
+    write(root / "host.json", "{}\n")
+
+
+class TestResolveImports:
+    """Test cases for following local imports"""
+
+    def test_only_reachable_local_modules_are_included(self, tmp_path):
+        make_app(tmp_path)
+
+        local, external = resolve_imports(str(tmp_path / "function_app.py"), [str(tmp_path)])
+
+        assert sorted(local) == ["function_app", "helper", "lazy_helper", "optional_helper",
+                                 "pkg", "pkg.other", "pkg.sub"]
+        assert external == {"azure.data.tables"}
+
+
+class TestPruneRequirements:
+    """Test cases for dropping unused requirements"""
+
+    def test_unused_distributions_are_dropped(self):
+        kept, dropped = prune_requirements(
+            ["azure-functions>=1.18.0", "azure_data_tables>=12.4.0", "requests>=2.31.0", "", "# comment"],
+            {"azure.data.tables.TableServiceClient"}
+        )
+
+        assert kept == ["azure-functions>=1.18.0", "azure_data_tables>=12.4.0"]
+        assert dropped == ["requests>=2.31.0"]
+
+
+class TestBuild:
+    """Test cases for the built artifact and report"""
+
+    def test_artifact_is_slim_and_precompiled(self, tmp_path):
+        make_app(tmp_path / "src")
+        output = tmp_path / "dist" / "app.zip"
+
+        report = build(str(tmp_path / "src" / "function_app.py"), str(output), check_import=False)
+
+        names = set(zipfile.ZipFile(output).namelist())
+        assert "function_app.py" in names and "pkg/sub.py" in names and "host.json" in names
+        assert "serve.py" not in names
+        assert not any(name.startswith("tests/") for name in names)
+        tag = sys.implementation.cache_tag
+        assert f"__pycache__/function_app.{tag}.pyc" in names
+        assert f"pkg/__pycache__/sub.{tag}.pyc" in names
+        requirements = zipfile.ZipFile(output).read("requirements.txt").decode().split()
+        assert requirements == ["azure-functions>=1.18.0", "azure-data-tables>=12.4.0"]
+        assert report['droppedRequirements'] == ["requests>=2.31.0", "python-dateutil>=2.8.2"]
+        assert report['artifactBytes'] == os.path.getsize(output)
+
+    def test_import_time_is_measured_from_the_built_tree(self, tmp_path):
+        write(tmp_path / "src" / "function_app.py", "import helper\n")
+        write(tmp_path / "src" / "helper.py", "VALUE = 1\n")
+
+        report = build(str(tmp_path / "src" / "function_app.py"), str(tmp_path / "app.zip"))
+
+        assert report['importSeconds'] > 0
+        assert report['moduleImportMs'] is not None
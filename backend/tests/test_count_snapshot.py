@@ -0,0 +1,161 @@
+"""
+Unit tests for the local last-known-count snapshot
+"""
+
+import importlib.util
+import os
+import sys
+import uuid
+from unittest.mock import Mock, patch
+
+import azure.functions as func
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from api.count_snapshot import SLOT_SIZE, CountSnapshot
+import function_app
+
+API_DIR = os.path.join(os.path.dirname(__file__), '..', 'api')
+
+
+def load_api_module(name, relative_path, snapshot_path):
+    """Import a fresh copy of a module from the api/ app with its snapshot at snapshot_path"""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(API_DIR, relative_path))
+    module = importlib.util.module_from_spec(spec)
+    # The Functions host puts the app root on the path, which is where count_snapshot lives
+    with patch.dict(os.environ, {'COUNT_SNAPSHOT_PATH': snapshot_path}), \
+            patch.object(sys, 'path', [API_DIR] + sys.path):
+        spec.loader.exec_module(module)
+    return module
+
+
+class TestCountSnapshot:
+    """Test cases for the memory-mapped snapshot"""
+
+    def test_count_survives_reopen(self, tmp_path):
+        path = str(tmp_path / "count.snapshot")
+        version = str(uuid.uuid4())
+        CountSnapshot(path).store(41, version)
+
+        reopened = CountSnapshot(path)
+
+        assert reopened.count == 41
+        assert reopened.version == version
+
+    def test_torn_write_falls_back_to_previous_slot(self, tmp_path):
+        path = str(tmp_path / "count.snapshot")
+        snapshot = CountSnapshot(path)
+        snapshot.store(10)
+        snapshot.store(11)
+        # Corrupt the newest slot (sequence 2 lives in slot 0)
+        snapshot._map[4:8] = b"\xff\xff\xff\xff"
+
+        assert CountSnapshot(path).count == 10
+
+    def test_etag_version_survives_reopen(self, tmp_path):
+        path = str(tmp_path / "count.snapshot")
+        etag = 'W/"datetime\'2025-10-21T01%3A40%3A04.1234567Z\'"'
+        CountSnapshot(path).store(41, etag)
+
+        reopened = CountSnapshot(path)
+
+        assert reopened.version == etag
+        # The restored version matches, so the same commit is not written again
+        sequence = reopened.sequence
+        reopened.store(41, etag)
+        assert reopened.sequence == sequence
+
+    def test_latest_write_wins_across_processes(self, tmp_path):
+        path = str(tmp_path / "count.snapshot")
+        busy = CountSnapshot(path)
+        idle = CountSnapshot(path)
+        for count in range(1, 6):
+            busy.store(count)
+        # The idle worker's own sequence is behind, but its write is the newest
+        idle.store(7)
+
+        assert CountSnapshot(path).count == 7
+
+    def test_empty_file_has_no_count(self, tmp_path):
+        assert CountSnapshot(str(tmp_path / "new.snapshot")).count is None
+        assert os.path.getsize(tmp_path / "new.snapshot") == 2 * SLOT_SIZE
+
+
+class TestSnapshotFallbacks:
+    """Test cases for serving the snapshot instead of 0"""
+
+    def test_storage_error_serves_last_known_count(self, tmp_path, make_manager):
+        snapshot = CountSnapshot(str(tmp_path / "count.snapshot"))
+        snapshot.store(99)
+        with patch.object(function_app, 'count_snapshot', snapshot):
+            manager = make_manager()
+            manager.table_client.get_entity.side_effect = Exception("storage down")
+
+            assert manager.get_visitor_count() == 99
+
+    def test_cold_get_is_served_from_snapshot(self, tmp_path):
+        snapshot = CountSnapshot(str(tmp_path / "count.snapshot"))
+        snapshot.store(123)
+        req = func.HttpRequest("GET", "/api/visitor-counter", body=b"")
+
+        with patch.object(function_app, 'count_snapshot', snapshot), \
+                patch.object(function_app, 'table_manager', None), \
+                patch.object(function_app, 'warm_table_manager') as warm:
+            response = function_app.visitor_counter(req)
+
+        assert response.status_code == 200
+        assert b'"count": 123' in response.get_body()
+        warm.assert_called_once()
+
+
+class TestSimpleFunction:
+    """Test cases for visitor-counter-simple's persisted count"""
+
+    def test_count_survives_reload(self, tmp_path):
+        path = str(tmp_path / "simple.snapshot")
+        simple = load_api_module("visitor_counter_simple", "visitor-counter-simple/__init__.py", path)
+        for _ in range(3):
+            simple.main(func.HttpRequest("POST", "/api/visitor-counter-simple", body=b""))
+
+        assert CountSnapshot(path).count == 3
+        reloaded = load_api_module("visitor_counter_simple", "visitor-counter-simple/__init__.py", path)
+        assert reloaded.counter_state["count"] == 3
+
+
+class TestDeployedAppFallbacks:
+    """Test cases for the last known count in the api/ app's storage error paths"""
+
+    def test_function_app_serves_last_known_count(self, tmp_path):
+        api_app = load_api_module("api_function_app", "function_app.py", str(tmp_path / "api.snapshot"))
+        table = Mock()
+        table.get_entity.side_effect = [{'Count': 7}, Exception("storage down"), Exception("storage down")]
+
+        with patch.object(api_app, 'get_table_client', return_value=table):
+            assert api_app.get_visitor_count() == 7
+            assert api_app.get_visitor_count() == 7
+            assert api_app.increment_visitor_count() == 7
+
+        # A failed read is never turned into a write of the stale count
+        table.upsert_entity.assert_not_called()
+
+    def test_v1_function_serves_last_known_count(self, tmp_path):
+        v1 = load_api_module("api_visitor_counter", "visitor-counter/__init__.py", str(tmp_path / "v1.snapshot"))
+        table = Mock()
+        table.get_entity.side_effect = [{'Count': 12}, Exception("storage down"), Exception("storage down")]
+
+        with patch.object(v1, 'get_table_client', return_value=table):
+            assert v1.increment_visitor_count() == 13
+            assert v1.get_visitor_count() == 13
+            assert v1.increment_visitor_count() == 13
+
+    def test_last_known_count_survives_reload(self, tmp_path):
+        path = str(tmp_path / "api.snapshot")
+        api_app = load_api_module("api_function_app", "function_app.py", path)
+        table = Mock()
+        table.get_entity.return_value = {'Count': 7}
+        with patch.object(api_app, 'get_table_client', return_value=table):
+            assert api_app.get_visitor_count() == 7
+
+        restarted = load_api_module("api_function_app", "function_app.py", path)
+        table.get_entity.side_effect = Exception("storage down")
+        with patch.object(restarted, 'get_table_client', return_value=table):
+            assert restarted.get_visitor_count() == 7
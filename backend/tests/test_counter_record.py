@@ -0,0 +1,150 @@
+"""
+Unit tests for the compact counter record, projected reads and merge writes
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceModifiedError, ResourceNotFoundError
+from azure.data.tables import TableEntity, UpdateMode
+from azure.data.tables._deserialize import _convert_to_entity
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from counter_record import COUNT_PROJECTION, STATS_PROJECTION, CounterRecord
+
+
+def counter_entity(count, etag='W/"1"', **properties):
+    entity = TableEntity(PartitionKey="visitor-counter", RowKey="count", Count=count, **properties)
+    entity._metadata = {'etag': etag, 'timestamp': datetime(2025, 1, 2, tzinfo=timezone.utc)}
+    return entity
+
+
+class TestCounterRecord:
+    """Test cases for the slotted record"""
+
+    def test_has_no_instance_dict(self):
+        record = CounterRecord(3)
+
+        assert not hasattr(record, '__dict__')
+        with pytest.raises(AttributeError):
+            record.extra = 1
+
+    def test_from_entity_uses_metadata(self):
+        record = CounterRecord.from_entity(counter_entity(5, etag='W/"abc"'))
+
+        assert record.count == 5
+        assert record.version == 'W/"abc"'
+        assert record.last_updated == datetime(2025, 1, 2, tzinfo=timezone.utc)
+
+    def test_from_plain_dict(self):
+        record = CounterRecord.from_entity({'Count': 4})
+
+        assert record.count == 4
+        assert record.version == ''
+
+    def test_count_entity_carries_only_count(self):
+        assert CounterRecord(9, created_at=datetime.now(timezone.utc)).count_entity() == {
+            'PartitionKey': "visitor-counter", 'RowKey': "count", 'Count': 9
+        }
+
+
+class TestProjectedStorageCalls:
+    """Test cases for the manager's projected reads and merge writes"""
+
+    @pytest.fixture
+    def manager(self, make_manager):
+        return make_manager(INCREMENT_JOURNAL_ENABLED='false')
+
+    def test_count_read_selects_count_only(self, manager):
+        manager.table_client.get_entity.return_value = counter_entity(7)
+
+        assert manager.get_visitor_count() == 7
+        assert manager.table_client.get_entity.call_args.kwargs['select'] == list(COUNT_PROJECTION)
+
+    def test_stats_read_selects_stats_fields(self, manager):
+        manager.table_client.get_entity.return_value = counter_entity(
+            7, CreatedAt=datetime(2024, 1, 1, tzinfo=timezone.utc)
+        )
+
+        stats = manager.get_visitor_stats()
+
+        assert manager.table_client.get_entity.call_args.kwargs['select'] == list(STATS_PROJECTION)
+        assert stats['count'] == 7
+        assert stats['createdAt'].startswith('2024-01-01')
+        assert stats['version'] == 'W/"1"'
+
+    def test_stats_last_updated_comes_from_the_projected_timestamp(self, manager):
+        stored = {
+            'odata.etag': 'W/"datetime\'2025-03-04T05%3A06%3A07.1234567Z\'"',
+            'PartitionKey': "visitor-counter", 'RowKey': "count", 'Count': 7,
+            'CreatedAt@odata.type': "Edm.DateTime", 'CreatedAt': "2024-01-01T00:00:00Z",
+            'LastUpdated@odata.type': "Edm.DateTime", 'LastUpdated': "2024-06-01T00:00:00Z",
+            'Timestamp': "2025-03-04T05:06:07.1234567Z",
+        }
+
+        def get_entity(partition_key, row_key, select=None, **kwargs):
+            # Shape the payload the way the service answers a $select
+            payload = {name: value for name, value in stored.items()
+                       if name.startswith('odata.') or name.split('@')[0] in select}
+            return _convert_to_entity(payload)
+
+        manager.table_client.get_entity.side_effect = get_entity
+
+        stats = manager.get_visitor_stats()
+
+        assert stats['lastUpdated'].startswith('2025-03-04T05:06:07')
+
+    def test_increment_merges_changed_count(self, manager):
+        manager.table_client.get_entity.return_value = counter_entity(7)
+        manager.table_client.update_entity.return_value = {'etag': 'W/"2"'}
+
+        assert manager.commit_increment(1) == 8
+
+        kwargs = manager.table_client.update_entity.call_args.kwargs
+        assert kwargs['mode'] == UpdateMode.MERGE
+        assert kwargs['entity'] == {'PartitionKey': "visitor-counter", 'RowKey': "count", 'Count': 8}
+        assert kwargs['etag'] == 'W/"1"'
+        assert kwargs['match_condition'] == MatchConditions.IfNotModified
+
+    def test_increment_retries_when_modified_between_read_and_write(self, manager):
+        stored = {'count': 7, 'version': 1}
+
+        def get_entity(partition_key, row_key, select=None, **kwargs):
+            return counter_entity(stored['count'], etag=f'W/"{stored["version"]}"')
+
+        def update_entity(entity, mode=None, etag=None, match_condition=None):
+            if stored['version'] == 1:
+                # Another worker commits its increment right after our read
+                stored.update(count=stored['count'] + 1, version=2)
+            if etag != f'W/"{stored["version"]}"':
+                raise ResourceModifiedError("etag mismatch")
+            stored.update(count=entity['Count'], version=stored['version'] + 1)
+            return {'etag': f'W/"{stored["version"]}"'}
+
+        manager.table_client.get_entity.side_effect = get_entity
+        manager.table_client.update_entity.side_effect = update_entity
+
+        assert manager.commit_increment(1) == 9
+        assert stored['count'] == 9
+        assert manager.table_client.update_entity.call_count == 2
+
+    def test_increment_gives_up_after_repeated_conflicts(self, manager):
+        manager.table_client.get_entity.return_value = counter_entity(7)
+        manager.table_client.update_entity.side_effect = ResourceModifiedError("etag mismatch")
+
+        # The lost increment falls back to the reported count instead of overwriting a newer one
+        assert manager.commit_increment(1) == 8
+        assert manager.table_client.update_entity.call_count == manager.max_update_attempts
+
+    def test_increment_creates_missing_counter(self, manager):
+        manager.table_client.get_entity.side_effect = ResourceNotFoundError("missing")
+        manager.table_client.create_entity.return_value = {'etag': 'W/"1"'}
+
+        assert manager.commit_increment(1) == 1
+
+        entity = manager.table_client.create_entity.call_args.kwargs['entity']
+        assert entity['Count'] == 1
+        assert 'CreatedAt' in entity
@@ -0,0 +1,107 @@
+"""
+Unit tests for the visit event log and its compaction job
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+from unittest.mock import Mock
+
+from azure.core.exceptions import ResourceNotFoundError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from event_log import (
+    MAX_BATCH_OPERATIONS, ROLLUP_ROW_PREFIX, VisitEventLog, compact_events, event_partition_key, hash_value
+)
+
+
+class FakeTable:
+    """Minimal in-memory table honouring the calls made by the event log"""
+
+    def __init__(self):
+        self.rows = {}
+        self.transactions = []
+
+    def submit_transaction(self, operations):
+        partitions = {entity['PartitionKey'] for _, entity in operations}
+        assert len(operations) <= MAX_BATCH_OPERATIONS
+        assert len(partitions) == 1
+        self.transactions.append(operations)
+        for operation, entity in operations:
+            key = (entity['PartitionKey'], entity['RowKey'])
+            if operation == "delete":
+                del self.rows[key]
+            else:
+                self.rows[key] = dict(entity)
+
+    def get_entity(self, partition_key, row_key, select=None):
+        try:
+            return self.rows[(partition_key, row_key)]
+        except KeyError:
+            raise ResourceNotFoundError("missing")
+
+    def query_entities(self, query_filter, parameters, select=None):
+        low, high, rollup = parameters['low'], parameters['high'], parameters['rollup']
+        for (partition, row), entity in sorted(self.rows.items()):
+            if low <= partition < high and row < rollup:
+                yield entity
+
+
+class TestVisitEventLog:
+    """Test cases for batched appends"""
+
+    def test_flush_groups_events_by_partition(self):
+        table = FakeTable()
+        log = VisitEventLog(table, batch_size=1000)
+        first = datetime(2025, 10, 1, 9, 30, tzinfo=timezone.utc)
+        second = datetime(2025, 10, 1, 10, 5, tzinfo=timezone.utc)
+
+        for _ in range(150):
+            log.record("/index.html", "https://example.com", moment=first)
+        log.record("/index.html", moment=second)
+
+        assert log.flush() == 151
+        assert [len(t) for t in table.transactions] == [100, 50, 1]
+        entity = next(iter(table.rows.values()))
+        assert entity['ReferrerHash'] == hash_value("https://example.com")
+        assert "example.com" not in str(entity)
+
+    def test_buffer_is_bounded(self):
+        log = VisitEventLog(Mock(), batch_size=1000, max_buffer=3)
+        for _ in range(5):
+            log.record("/")
+        assert log.dropped == 2
+
+
+class TestCompaction:
+    """Test cases for folding events into rollups"""
+
+    def test_old_partitions_fold_into_rollups(self):
+        table = FakeTable()
+        log = VisitEventLog(table, batch_size=1000)
+        old = datetime(2025, 10, 1, 9, 0, tzinfo=timezone.utc)
+        recent = datetime(2025, 10, 3, 9, 0, tzinfo=timezone.utc)
+        for index in range(250):
+            log.record("/a" if index % 2 else "/b", moment=old)
+        log.record("/a", moment=recent)
+        log.flush()
+
+        compacted = compact_events(table, older_than_hours=24, now=recent)
+
+        assert compacted == 250
+        old_rows = {row: e for (p, row), e in table.rows.items() if p == event_partition_key(old)}
+        assert set(old_rows) == {f"{ROLLUP_ROW_PREFIX}{hash_value('/a')}", f"{ROLLUP_ROW_PREFIX}{hash_value('/b')}"}
+        assert sorted(e['Count'] for e in old_rows.values()) == [125, 125]
+        assert sum(1 for p, _ in table.rows if p == event_partition_key(recent)) == 1
+
+    def test_failed_transaction_keeps_events(self):
+        table = FakeTable()
+        log = VisitEventLog(table, batch_size=1000)
+        old = datetime(2025, 10, 1, 9, 0, tzinfo=timezone.utc)
+        for _ in range(10):
+            log.record("/", moment=old)
+        log.flush()
+        table.submit_transaction = Mock(side_effect=Exception("throttled"))
+
+        assert compact_events(table, now=datetime(2025, 10, 3, tzinfo=timezone.utc)) == 0
+        assert len(table.rows) == 10
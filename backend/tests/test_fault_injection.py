@@ -0,0 +1,129 @@
+"""
+Unit tests for the latency and fault injecting table client
+"""
+
+import json
+import os
+import random
+import sys
+from unittest.mock import Mock, patch
+
+import pytest
+from azure.core.exceptions import HttpResponseError, ResourceModifiedError, ServiceResponseTimeoutError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from adaptive_limiter import AdaptiveConcurrencyLimiter, LimitedTableClient
+from fault_injection import FaultInjectingTableClient, latency_sampler, load_fault_config, wrap_table_client
+import function_app
+
+
+def faulty(operations, seed=7):
+    sleeps = []
+    client = FaultInjectingTableClient(Mock(), operations, seed=seed, sleep=sleeps.append)
+    return client, sleeps
+
+
+def outcomes(client, operation, calls=200):
+    results = []
+    for _ in range(calls):
+        try:
+            getattr(client, operation)(partition_key="p", row_key="r")
+            results.append("ok")
+        except HttpResponseError as e:
+            results.append(e.status_code)
+        except ServiceResponseTimeoutError:
+            results.append("timeout")
+    return results
+
+
+class TestFaultInjection:
+    """Test cases for injected latency and errors"""
+
+    def test_same_seed_reproduces_the_same_run(self):
+        operations = {"*": {"throttle_rate": 0.3, "latency": {"distribution": "exponential", "mean_ms": 10}}}
+        first, first_sleeps = faulty(operations)
+        second, second_sleeps = faulty(operations)
+
+        assert outcomes(first, "get_entity") == outcomes(second, "get_entity")
+        assert first_sleeps == second_sleeps
+
+    def test_error_rates_and_status_codes(self):
+        client, _ = faulty({"read": {"throttle_rate": 0.2, "unavailable_rate": 0.1}})
+
+        results = outcomes(client, "get_entity", calls=2000)
+
+        assert 0.15 < results.count(429) / 2000 < 0.25
+        assert 0.05 < results.count(503) / 2000 < 0.15
+        assert client.stats()['faults']['throttle'] == results.count(429)
+
+    def test_precondition_failures_only_hit_writes(self):
+        client, _ = faulty({"*": {"precondition_rate": 1.0}})
+
+        client.get_entity(partition_key="p", row_key="r")
+        with pytest.raises(ResourceModifiedError) as raised:
+            client.update_entity(entity={})
+        assert raised.value.status_code == 412
+
+    def test_operation_settings_override_type_and_default(self):
+        client, _ = faulty({"*": {"throttle_rate": 1.0}, "get_entity": {"throttle_rate": 0.0}})
+
+        assert outcomes(client, "get_entity", calls=5) == ["ok"] * 5
+        assert outcomes(client, "delete_entity", calls=5) == [429] * 5
+
+    def test_timeout_waits_before_raising(self):
+        client, sleeps = faulty({"*": {"timeout_rate": 1.0, "timeout_seconds": 3}})
+
+        assert outcomes(client, "get_entity", calls=1) == ["timeout"]
+        assert sleeps == [3.0]
+
+    def test_other_attributes_pass_through(self):
+        inner = Mock(table_name="VisitorCounter")
+        client = FaultInjectingTableClient(inner, {"*": {"throttle_rate": 1.0}})
+
+        assert client.table_name == "VisitorCounter"
+
+    def test_latency_distributions(self):
+        rng = random.Random(1)
+        uniform = latency_sampler({"distribution": "uniform", "min_ms": 500, "max_ms": 900}, rng)
+        capped = latency_sampler({"distribution": "lognormal", "median_ms": 50, "sigma": 3, "max_ms": 100}, rng)
+
+        assert all(0.5 <= uniform() <= 0.9 for _ in range(100))
+        assert max(capped() for _ in range(1000)) == 0.1
+
+
+class TestConfiguration:
+    """Test cases for enabling injection from the environment"""
+
+    def test_unset_leaves_client_unwrapped(self):
+        inner = Mock()
+        with patch.dict(os.environ, {}, clear=False):
+            os.environ.pop('TABLE_FAULT_INJECTION', None)
+            assert wrap_table_client(inner) is inner
+
+    def test_config_from_file(self, tmp_path):
+        path = tmp_path / "faults.json"
+        path.write_text(json.dumps({"seed": 3, "operations": {"*": {"throttle_rate": 1.0}}}))
+
+        assert load_fault_config(f"@{path}")["seed"] == 3
+
+    def test_manager_uses_wrapped_client(self, make_manager):
+        config = json.dumps({"seed": 1, "operations": {"*": {"throttle_rate": 1.0}}})
+        manager = make_manager(TABLE_FAULT_INJECTION=config)
+
+        assert isinstance(manager.table_client, FaultInjectingTableClient)
+        with pytest.raises(HttpResponseError):
+            manager._fetch_counter()
+
+    @pytest.mark.parametrize("limited", [True, False])
+    def test_diagnostics_find_the_injector_under_any_wrapping(self, limited, make_manager):
+        # conftest turns the limiter off; the default deployment wraps the injector in it
+        limiter = AdaptiveConcurrencyLimiter() if limited else None
+        config = json.dumps({"seed": 1, "operations": {"*": {"throttle_rate": 1.0}}})
+        with patch.object(function_app, 'storage_limiter', limiter):
+            manager = make_manager(TABLE_FAULT_INJECTION=config)
+            with patch.object(function_app, 'table_manager', manager):
+                diagnostics = function_app.worker_diagnostics()
+
+        assert isinstance(manager.table_client, LimitedTableClient if limited else FaultInjectingTableClient)
+        assert 'faultInjection' in diagnostics
+        assert ('storageLimiter' in diagnostics) == limited
@@ -0,0 +1,125 @@
+"""
+Unit tests for the multi-region G-Counter mode
+"""
+
+import importlib.util
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from gcounter import GCounter, merge, replica_key
+import function_app
+
+
+class TestMerge:
+    """Test cases for the merge function"""
+
+    def test_merge_takes_per_replica_max(self):
+        assert merge({'east': 5, 'west': 2}, {'east': 3, 'west': 4, 'baseline': 10}) == \
+            {'east': 5, 'west': 4, 'baseline': 10}
+
+    def test_merge_is_idempotent_and_commutative(self):
+        a, b = {'east': 5}, {'east': 3, 'west': 1}
+        assert merge(a, b) == merge(b, a) == merge(merge(a, b), b)
+
+    def test_replica_key_strips_reserved_characters(self):
+        assert replica_key("west/europe#1") == "west-europe-1"
+
+
+class TestGCounter:
+    """Test cases for local increments and anti-entropy sync"""
+
+    def test_each_region_writes_only_its_own_row(self, make_table):
+        east_table, west_table = make_table(), make_table()
+        east = GCounter(east_table, "east", peer_client=west_table)
+        west = GCounter(west_table, "west", peer_client=east_table)
+
+        east.increment(3)
+        west.increment(2)
+
+        assert east.value() == 3
+        assert west.value() == 2
+        assert ("visitor-gcounter", "west") not in east_table.rows
+
+    def test_sync_converges_both_regions(self, make_table):
+        east_table, west_table = make_table(), make_table()
+        east = GCounter(east_table, "east", peer_client=west_table)
+        west = GCounter(west_table, "west", peer_client=east_table)
+        east.seed(100)
+        east.increment(3)
+        west.increment(2)
+
+        assert east.sync() == 3
+        assert east.value() == west.value() == 105
+        assert west.sync() == 0
+
+    def test_sync_never_lowers_a_row(self, make_table):
+        east_table, west_table = make_table(), make_table()
+        east = GCounter(east_table, "east", peer_client=west_table)
+        east.increment(5)
+        east.sync()
+        east.increment(1)
+
+        east.sync()
+        assert west_table.rows[("visitor-gcounter", "east")]['Count'] == 6
+        assert east_table.rows[("visitor-gcounter", "east")]['Count'] == 6
+
+    def test_concurrent_local_increment_retries(self, make_table):
+        table = make_table()
+        counter = GCounter(table, "east")
+        counter.increment(1)
+        # Another instance in the region increments first
+        table.add_concurrently("visitor-gcounter", "east", 'Count', 1)
+
+        assert counter.increment(1) == 3
+        assert counter.conflicts == 1
+
+    def test_seed_is_created_once(self, make_table):
+        table = make_table()
+        GCounter(table, "east").seed(10)
+        GCounter(table, "west").seed(99)
+
+        assert table.rows[("visitor-gcounter", "baseline")]['Count'] == 10
+
+
+class TestManagerCrdtMode:
+    """Test cases for COUNTER_MODE=crdt in the table manager"""
+
+    def test_manager_counts_locally_and_returns_merged_value(self, make_table, make_manager):
+        table = make_table()
+        table.create_entity({'PartitionKey': "visitor-counter", 'RowKey': "count", 'Count': 40})
+        table.create_entity({'PartitionKey': "visitor-gcounter", 'RowKey': "west", 'Count': 7})
+
+        manager = make_manager(table, COUNTER_MODE='crdt', GCOUNTER_REPLICA_ID='east')
+
+        assert manager.journal is None
+        assert manager.get_visitor_count() == 47
+        assert manager.commit_increment(1) == 48
+        assert table.rows[("visitor-counter", "count")]['Count'] == 40
+        assert manager.get_visitor_stats()['mode'] == "crdt"
+
+
+def timer_names(environment):
+    """Import a fresh copy of function_app under the given settings and list its timers"""
+    spec = importlib.util.spec_from_file_location("function_app_timers", function_app.__file__)
+    module = importlib.util.module_from_spec(spec)
+    with patch.dict(os.environ, environment):
+        spec.loader.exec_module(module)
+    return {function.get_function_name() for function in module.app.get_functions()
+            if function.get_trigger().get_binding_name() == "timerTrigger"}
+
+
+class TestTimerRegistration:
+    """Test cases for registering timers only for enabled features"""
+
+    def test_default_app_has_no_timers(self):
+        assert timer_names({}) == set()
+
+    def test_each_feature_registers_its_timer(self):
+        assert timer_names({'COUNTER_MODE': 'crdt', 'GCOUNTER_PEER_CONNECTION_STRING': 'peer'}) == {
+            "sync_counter_replicas"
+        }
+        assert timer_names({'COUNTER_MIGRATION_MODE': 'dual'}) == {"backfill_legacy_counter"}
+        assert timer_names({'VISIT_EVENT_LOG_ENABLED': 'true'}) == {"compact_visit_events"}
+        assert timer_names({'IDEMPOTENCY_TABLE': 'idempotency'}) == {"purge_idempotency_keys"}
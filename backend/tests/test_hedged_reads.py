@@ -0,0 +1,115 @@
+"""
+Unit tests for hedged counter reads
+"""
+
+import os
+import sys
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+from azure.core.exceptions import ResourceNotFoundError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from hedged_reads import HedgedReader
+
+
+class TestHedgedReader:
+    """Test cases for hedging, the rate cap and the adaptive delay"""
+
+    def test_fast_read_is_not_hedged(self):
+        reader = HedgedReader(initial_delay=0.5)
+        fn = Mock(return_value=7)
+
+        assert reader.run(fn) == 7
+        assert fn.call_count == 1
+        assert reader.stats()['hedges'] == 0
+
+    def test_slow_first_attempt_loses_to_the_hedge(self):
+        reader = HedgedReader(initial_delay=0.01)
+        calls = []
+
+        def read():
+            calls.append(1)
+            if len(calls) == 1:
+                time.sleep(0.3)
+                return "slow"
+            return "fast"
+
+        assert reader.run(read) == "fast"
+        assert reader.stats()['hedgeWins'] == 1
+
+    def test_hedge_rate_is_capped(self):
+        reader = HedgedReader(initial_delay=0.001, max_hedge_ratio=0.0, burst=1)
+        release = threading.Event()
+
+        def slow():
+            release.wait(1)
+            return 1
+
+        threading.Timer(0.05, release.set).start()
+        reader.run(slow)
+        reader.run(lambda: (time.sleep(0.02), 2)[1])
+
+        assert reader.stats()['hedges'] == 1
+        assert reader.stats()['capped'] == 1
+
+    def test_quiet_period_does_not_bank_hedges(self):
+        reader = HedgedReader(initial_delay=0.005, max_hedge_ratio=0.1, burst=2)
+        for _ in range(1000):
+            reader.run(lambda: 1)
+        before = reader.stats()
+
+        for _ in range(10):
+            reader.run(lambda: (time.sleep(0.03), 2)[1])
+
+        # The burst, and less than one more refilled by the slow reads themselves
+        after = reader.stats()
+        assert after['hedges'] - before['hedges'] == 2
+        assert after['capped'] - before['capped'] == 8
+
+    def test_errors_fall_back_to_the_other_attempt(self):
+        reader = HedgedReader(initial_delay=0.01)
+        calls = []
+
+        def read():
+            calls.append(1)
+            if len(calls) == 1:
+                time.sleep(0.05)
+                raise RuntimeError("connection reset")
+            time.sleep(0.1)
+            return 3
+
+        assert reader.run(read) == 3
+
+    def test_not_found_is_raised_without_hedging(self):
+        reader = HedgedReader(initial_delay=0.5)
+
+        with pytest.raises(ResourceNotFoundError):
+            reader.run(Mock(side_effect=ResourceNotFoundError("missing")))
+        assert reader.hedges == 0
+
+    def test_delay_follows_recent_p95(self):
+        reader = HedgedReader(min_samples=10, min_delay=0.0)
+        with reader._lock:
+            reader._latencies.extend([0.01] * 95 + [0.2] * 5)
+
+        assert reader.delay() == 0.2
+        with reader._lock:
+            reader._latencies.clear()
+            reader._latencies.extend([0.01] * 100)
+        assert reader.delay() == 0.01
+
+
+class TestManagerHedging:
+    """Test cases for hedging in the table manager"""
+
+    def test_counter_reads_are_hedged_when_enabled(self, make_manager):
+        table_client = Mock()
+        manager = make_manager(table_client, HEDGED_READS_ENABLED='true')
+        table_client.get_entity.return_value = {'Count': 5}
+
+        assert manager.get_visitor_count() == 5
+        assert manager.get_visitor_stats()['count'] == 5
+        assert manager.hedger.stats()['reads'] == 2
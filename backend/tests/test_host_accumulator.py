@@ -0,0 +1,104 @@
+"""
+Unit tests for the shared-memory increment accumulator
+"""
+
+import multiprocessing
+import os
+import sys
+import uuid
+from unittest.mock import Mock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import host_accumulator
+from host_accumulator import HostAccumulator
+import function_app
+
+
+def add_in_child(name, lock_dir, amount):
+    accumulator = HostAccumulator(commit=Mock(), name=name, lock_dir=lock_dir)
+    for _ in range(amount):
+        accumulator.add()
+
+
+@pytest.fixture
+def accumulator(tmp_path):
+    commit = Mock()
+    accumulator = HostAccumulator(commit=commit, name=f"vc-test-{uuid.uuid4().hex[:8]}", lock_dir=str(tmp_path))
+    accumulator._flusher = Mock()  # flush by hand
+    yield accumulator
+    accumulator.close(unlink=True)
+
+
+class TestHostAccumulator:
+    """Test cases for cross-process accumulation"""
+
+    def test_worker_processes_are_committed_in_one_write(self, accumulator, tmp_path):
+        context = multiprocessing.get_context("fork")
+        children = [
+            context.Process(target=add_in_child, args=(accumulator.name, str(tmp_path), 25))
+            for _ in range(4)
+        ]
+        for child in children:
+            child.start()
+        for child in children:
+            child.join()
+        accumulator.add(5)
+
+        assert accumulator.pending() == 105
+        assert accumulator.flush() == 105
+        accumulator.commit.assert_called_once_with(105)
+        assert accumulator.pending() == 0
+
+    def test_failed_commit_keeps_delta(self, accumulator):
+        accumulator.add(3)
+        accumulator.commit.side_effect = Exception("storage down")
+
+        with pytest.raises(Exception):
+            accumulator.flush()
+        assert accumulator.pending() == 3
+
+    def test_only_one_flusher_per_host(self, accumulator, tmp_path):
+        other = HostAccumulator(commit=Mock(), name=accumulator.name, lock_dir=str(tmp_path))
+
+        assert accumulator.is_flusher()
+        # flock is per open file description, so a second holder in this process is refused too
+        assert not other.is_flusher()
+        other.close()
+
+
+    def test_without_fcntl_each_process_flushes_its_own_segment(self, tmp_path):
+        name = f"vc-test-{uuid.uuid4().hex[:8]}"
+        with patch.object(host_accumulator, 'fcntl', None):
+            private = HostAccumulator(commit=Mock(), name=name, lock_dir=str(tmp_path))
+        private._flusher = Mock()
+        try:
+            private.add(2)
+
+            assert private.name == f"{name}-{os.getpid()}"
+            assert private.is_flusher()
+            assert private.flush() == 2
+            private.commit.assert_called_once_with(2)
+        finally:
+            private.close(unlink=True)
+
+
+class TestAccumulatorDefault:
+    """Test cases for turning the accumulator on when the host runs several workers"""
+
+    WORKER_COUNTS = ('FUNCTIONS_WORKER_PROCESS_COUNT', 'WEB_CONCURRENCY', 'SERVER_WORKERS')
+
+    @pytest.mark.parametrize("name", WORKER_COUNTS)
+    def test_enabled_for_several_workers(self, name, make_manager):
+        with patch.object(function_app, 'HostAccumulator') as accumulator:
+            manager = make_manager(**{**dict.fromkeys(self.WORKER_COUNTS, '1'), name: '4'})
+
+        assert manager.accumulator is accumulator.return_value
+
+    def test_disabled_for_a_single_worker(self, make_manager):
+        with patch.object(function_app, 'HostAccumulator') as accumulator:
+            manager = make_manager(**dict.fromkeys(self.WORKER_COUNTS, '1'))
+
+        assert manager.accumulator is None
+        accumulator.assert_not_called()
@@ -0,0 +1,169 @@
+"""
+Unit tests for running the FunctionApp routes under ASGI and WSGI servers
+"""
+
+import asyncio
+import io
+import ipaddress
+import json
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from http_adapter import FunctionAsgiApp, FunctionWsgiApp, collect_routes
+from rate_limiter import TokenBucketLimiter
+import function_app
+
+
+def wsgi_request(app, method, path, remote_addr=None, **extra):
+    """Drive one request through a WSGI app and return (status, body)"""
+    environ = {
+        "REQUEST_METHOD": method, "PATH_INFO": path, "QUERY_STRING": "", "HTTP_HOST": "testserver",
+        "wsgi.input": io.BytesIO(b""), "wsgi.url_scheme": "http", "REMOTE_ADDR": remote_addr, **extra,
+    }
+    started = {}
+
+    def start_response(status, headers):
+        started["status"] = status
+
+    body = b"".join(app(environ, start_response))
+    return started["status"], body
+
+
+def asgi_request(app, method, path, query=b"", body=b"", headers=(), client=None):
+    """Drive one request through an ASGI app and return (status, headers, body)"""
+    scope = {
+        "type": "http", "method": method, "path": path, "query_string": query,
+        "headers": [(b"host", b"testserver"), *headers], "scheme": "http", "client": client,
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start, payload = sent
+    return start["status"], dict(start["headers"]), payload["body"]
+
+
+class TestRouteCollection:
+    """Test cases for discovering routes on the FunctionApp"""
+
+    def test_http_routes_are_registered(self):
+        routes = {route.name: route for route in collect_routes(function_app.app)}
+
+        assert set(routes) == {"visitor_counter", "visitor_counter_updates", "visitor_stats", "health_check"}
+        assert routes["visitor_counter"].methods == {"GET", "POST", "OPTIONS"}
+        assert routes["health_check"].pattern.match("/api/health")
+
+
+class TestAsgiAdapter:
+    """Test cases for the ASGI application"""
+
+    @patch('function_app.get_table_manager')
+    def test_health_check(self, mock_get_manager):
+        status, headers, body = asgi_request(FunctionAsgiApp(function_app.app), "GET", "/api/health")
+
+        assert status == 200
+        assert headers[b"Content-Type"] == b"application/json"
+        assert json.loads(body)["status"] == "healthy"
+
+    @patch('function_app.get_table_manager')
+    def test_query_params_reach_the_handler(self, mock_get_manager):
+        app = FunctionAsgiApp(function_app.app)
+        with patch.object(function_app.beacon_queue, 'submit', return_value=True) as submit:
+            status, _, body = asgi_request(
+                app, "POST", "/api/visitor-counter", query=b"mode=beacon",
+                client=("192.0.2.42", 50000)
+            )
+
+        assert status == 204
+        assert body == b""
+        submit.assert_called_once()
+
+    def test_unknown_route_and_method(self):
+        app = FunctionAsgiApp(function_app.app)
+
+        assert asgi_request(app, "GET", "/api/missing")[0] == 404
+        status, headers, _ = asgi_request(app, "DELETE", "/api/health")
+        assert status == 405
+        assert headers[b"Allow"] == b"GET"
+
+    @patch('function_app.get_table_manager')
+    def test_clients_are_limited_by_peer_address(self, mock_get_manager):
+        mock_get_manager.return_value.increment_visitor_count.return_value = 1
+        app = FunctionAsgiApp(function_app.app)
+
+        def post(peer):
+            return asgi_request(app, "POST", "/api/visitor-counter", client=(peer, 50000))[0]
+
+        with patch.object(function_app, 'increment_limiter', TokenBucketLimiter(rate_per_second=0.01, burst=1)), \
+                patch.dict(os.environ, {'VISIT_DEDUPE_ENABLED': 'false'}):
+            assert [post("198.51.100.10"), post("198.51.100.11")] == [200, 200]
+            assert post("198.51.100.10") == 429
+
+
+class TestWsgiAdapter:
+    """Test cases for the WSGI application"""
+
+    @patch('function_app.get_table_manager')
+    def test_visitor_counter_get(self, mock_get_manager):
+        mock_get_manager.return_value.get_visitor_count.return_value = 5
+        environ = {
+            "REQUEST_METHOD": "GET", "PATH_INFO": "/api/visitor-counter", "QUERY_STRING": "",
+            "HTTP_HOST": "testserver", "wsgi.input": io.BytesIO(b""), "wsgi.url_scheme": "http",
+        }
+        started = {}
+
+        def start_response(status, headers):
+            started["status"] = status
+
+        with patch.object(function_app, 'table_manager', object()):
+            body = b"".join(FunctionWsgiApp(function_app.app)(environ, start_response))
+
+        assert started["status"] == "200 OK"
+        assert json.loads(body)["count"] == 5
+
+    @patch('function_app.get_table_manager')
+    def test_clients_are_limited_by_remote_addr(self, mock_get_manager):
+        mock_get_manager.return_value.increment_visitor_count.return_value = 1
+        app = FunctionWsgiApp(function_app.app)
+
+        with patch.object(function_app, 'increment_limiter', TokenBucketLimiter(rate_per_second=0.01, burst=1)), \
+                patch.dict(os.environ, {'VISIT_DEDUPE_ENABLED': 'false'}):
+            statuses = [wsgi_request(app, "POST", "/api/visitor-counter", remote_addr=peer)[0]
+                        for peer in ("198.51.100.20", "198.51.100.21", "198.51.100.20")]
+
+        assert statuses == ["200 OK", "200 OK", "429 Too Many Requests"]
+
+    @patch('function_app.get_table_manager')
+    def test_rotating_client_ip_header_does_not_escape_the_limit(self, mock_get_manager):
+        mock_get_manager.return_value.increment_visitor_count.return_value = 1
+        app = FunctionWsgiApp(function_app.app, trusted_proxies=[])
+
+        with patch.object(function_app, 'increment_limiter', TokenBucketLimiter(rate_per_second=0.01, burst=1)), \
+                patch.dict(os.environ, {'VISIT_DEDUPE_ENABLED': 'false'}):
+            statuses = [wsgi_request(app, "POST", "/api/visitor-counter", remote_addr="198.51.100.23",
+                                     HTTP_X_CLIENT_IP=f"203.0.113.{index}",
+                                     HTTP_X_FORWARDED_FOR=f"203.0.113.{index}")[0]
+                        for index in range(3)]
+
+        assert statuses == ["200 OK", "429 Too Many Requests", "429 Too Many Requests"]
+
+    @patch('function_app.get_table_manager')
+    def test_trusted_proxy_passes_the_client_address_through(self, mock_get_manager):
+        mock_get_manager.return_value.increment_visitor_count.return_value = 1
+        app = FunctionWsgiApp(function_app.app, trusted_proxies=[ipaddress.ip_network("10.0.0.0/8")])
+
+        with patch.object(function_app, 'increment_limiter', TokenBucketLimiter(rate_per_second=0.01, burst=1)), \
+                patch.dict(os.environ, {'VISIT_DEDUPE_ENABLED': 'false'}):
+            statuses = [wsgi_request(app, "POST", "/api/visitor-counter", remote_addr="10.0.0.5",
+                                     HTTP_X_FORWARDED_FOR=client)[0]
+                        for client in ("198.51.100.24", "198.51.100.25", "198.51.100.24")]
+
+        assert statuses == ["200 OK", "200 OK", "429 Too Many Requests"]
@@ -0,0 +1,190 @@
+"""
+Unit tests for Idempotency-Key handling on visitor counter increments
+"""
+
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock, patch
+
+import azure.functions as func
+import pytest
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from idempotency import IdempotencyConflict, IdempotencyStore, StoredResponse
+from visit_filter import RotatingVisitFilter
+import function_app
+
+
+def ok_response(count):
+    return StoredResponse(200, f'{{"count": {count}}}'.encode(), {'Content-Type': 'application/json'})
+
+
+class TestIdempotencyStore:
+    """Test cases for the bounded TTL map"""
+
+    def test_duplicate_is_replayed_without_producing(self):
+        store = IdempotencyStore()
+        produce = Mock(return_value=ok_response(1))
+
+        first, first_replayed = store.run("key-1", produce)
+        second, second_replayed = store.run("key-1", produce)
+
+        assert produce.call_count == 1
+        assert second is first
+        assert (first_replayed, second_replayed) == (False, True)
+
+    def test_concurrent_duplicates_share_one_execution(self):
+        store = IdempotencyStore()
+
+        def slow():
+            time.sleep(0.05)
+            return ok_response(1)
+
+        produce = Mock(side_effect=slow)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(store.run("k", produce))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert produce.call_count == 1
+        assert sorted(replayed for _, replayed in results) == [False, True, True, True, True]
+
+    def test_failures_are_not_remembered(self):
+        store = IdempotencyStore()
+        produce = Mock(side_effect=[StoredResponse(500, b"", {}), ok_response(1)])
+
+        assert store.run("k", produce)[0].status_code == 500
+        assert store.run("k", produce)[0].status_code == 200
+
+    def test_keys_expire_and_memory_is_bounded(self):
+        clock = Mock(return_value=0.0)
+        store = IdempotencyStore(ttl_seconds=10, max_keys=3, clock=clock)
+        for index in range(5):
+            store.run(f"k{index}", lambda: ok_response(1))
+        assert store.stats()['trackedKeys'] == 3
+
+        clock.return_value = 11.0
+        produce = Mock(return_value=ok_response(2))
+        store.run("k4", produce)
+        produce.assert_called_once()
+
+    def test_in_progress_key_on_another_instance_conflicts(self):
+        table = Mock()
+        table.create_entity.side_effect = ResourceExistsError("reserved")
+        table.get_entity.return_value = {'Status': 0}
+        store = IdempotencyStore(table_client=table)
+
+        with pytest.raises(IdempotencyConflict):
+            store.run("k", Mock())
+
+    def test_completed_key_on_another_instance_is_replayed(self):
+        table = Mock()
+        table.create_entity.side_effect = ResourceExistsError("reserved")
+        table.get_entity.return_value = {'Status': 200, 'Body': '{"count": 4}', 'ContentType': 'application/json'}
+        produce = Mock()
+
+        response, replayed = IdempotencyStore(table_client=table).run("k", produce)
+
+        produce.assert_not_called()
+        assert replayed and response.body == b'{"count": 4}'
+
+    def test_replay_from_the_table_keeps_every_header(self):
+        headers = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', 'Cache-Control': 'no-cache'}
+        table = Mock()
+        store = IdempotencyStore(table_client=table)
+        store.run("k", lambda: StoredResponse(200, b'{"count": 4}', headers))
+        stored = table.upsert_entity.call_args.kwargs['entity']
+
+        table.create_entity.side_effect = ResourceExistsError("reserved")
+        table.get_entity.return_value = stored
+        response, replayed = IdempotencyStore(table_client=table).run("k", Mock())
+
+        assert replayed and response.headers == headers
+
+    def test_abandoned_reservation_is_taken_over_after_the_lease(self):
+        table = Mock()
+        table.create_entity.side_effect = ResourceExistsError("reserved")
+        table.get_entity.return_value = {'Status': 0, 'CreatedAt': datetime.now(timezone.utc) - timedelta(seconds=60)}
+        produce = Mock(return_value=ok_response(5))
+
+        response, replayed = IdempotencyStore(table_client=table, lease_seconds=30).run("k", produce)
+
+        produce.assert_called_once()
+        assert not replayed and response.status_code == 200
+        assert table.update_entity.call_args.kwargs['match_condition'] == MatchConditions.IfNotModified
+
+    def test_recent_reservation_still_conflicts(self):
+        table = Mock()
+        table.create_entity.side_effect = ResourceExistsError("reserved")
+        table.get_entity.return_value = {'Status': 0, 'CreatedAt': datetime.now(timezone.utc) - timedelta(seconds=5)}
+
+        with pytest.raises(IdempotencyConflict):
+            IdempotencyStore(table_client=table, lease_seconds=30).run("k", Mock())
+        table.update_entity.assert_not_called()
+
+    def test_losing_a_takeover_race_conflicts(self):
+        table = Mock()
+        table.create_entity.side_effect = ResourceExistsError("reserved")
+        table.get_entity.return_value = {'Status': 0, 'CreatedAt': datetime.now(timezone.utc) - timedelta(seconds=60)}
+        table.update_entity.side_effect = ResourceModifiedError("taken")
+        produce = Mock()
+
+        with pytest.raises(IdempotencyConflict):
+            IdempotencyStore(table_client=table, lease_seconds=30).run("k", produce)
+        produce.assert_not_called()
+
+
+class TestIdempotentVisitorCounter:
+    """Test cases for the Idempotency-Key header on POST"""
+
+    @patch('function_app.get_table_manager')
+    def test_retry_with_same_key_does_not_increment_twice(self, mock_get_manager):
+        mock_get_manager.return_value.increment_visitor_count.side_effect = [21, 22]
+        req = func.HttpRequest(
+            "POST", "/api/visitor-counter",
+            headers={'Idempotency-Key': 'retry-key', 'X-Client-Id': 'idempotent-visitor'}, body=b""
+        )
+
+        with patch.object(function_app, 'idempotency_store', IdempotencyStore()), \
+                patch.object(function_app, 'repeat_visit_filter', RotatingVisitFilter(window_seconds=60)), \
+                patch.dict(os.environ, {'VISIT_DEDUPE_ENABLED': 'false'}):
+            first = function_app.visitor_counter(req)
+            second = function_app.visitor_counter(req)
+
+        assert mock_get_manager.return_value.increment_visitor_count.call_count == 1
+        assert second.get_body() == first.get_body()
+        assert second.headers['Idempotent-Replayed'] == "true"
+
+    def test_shared_table_store_is_built_on_first_request(self):
+        counter_table = Mock()
+        counter_table.get_entity.side_effect = ResourceNotFoundError("missing")
+        req = func.HttpRequest(
+            "POST", "/api/visitor-counter",
+            headers={'Idempotency-Key': 'first-key', 'X-Client-Id': 'shared-visitor'}, body=b""
+        )
+        responses = []
+
+        with patch.dict(os.environ, {'COSMOS_DB_CONNECTION_STRING': 'test', 'IDEMPOTENCY_TABLE': 'idempotency',
+                                     'VISIT_DEDUPE_ENABLED': 'false'}), \
+                patch.object(function_app, 'TableServiceClient') as mock_service, \
+                patch.object(function_app, 'table_manager', None), \
+                patch.object(function_app, 'idempotency_store', None):
+            service = mock_service.from_connection_string.return_value
+            service.get_table_client.return_value = counter_table
+            # Creating the store must not wait on the table manager's lock
+            worker = threading.Thread(target=lambda: responses.append(function_app.visitor_counter(req)), daemon=True)
+            worker.start()
+            worker.join(timeout=5)
+            store = function_app.idempotency_store
+
+        assert not worker.is_alive()
+        assert responses[0].status_code == 200
+        service.create_table_if_not_exists.assert_called_once_with(table_name='idempotency')
+        assert store.stats()['shared']
@@ -0,0 +1,143 @@
+"""
+Unit tests for the local increment journal and its replay
+"""
+
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+from azure.core.exceptions import ResourceNotFoundError, ServiceRequestError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from increment_journal import IncrementJournal
+import function_app
+
+
+class TestIncrementJournal:
+    """Test cases for the on-disk journal"""
+
+    def test_pending_records_survive_restart(self, tmp_path):
+        path = str(tmp_path / "increments.journal")
+        journal = IncrementJournal(path)
+        journal.append(1)
+        journal.append(2)
+        journal.close()
+
+        reopened = IncrementJournal(path)
+
+        assert reopened.journal_id == journal.journal_id
+        assert reopened.pending_entries() == [(1, 1), (2, 2)]
+
+    def test_torn_tail_is_ignored(self, tmp_path):
+        path = str(tmp_path / "increments.journal")
+        journal = IncrementJournal(path)
+        journal.append(1)
+        journal.close()
+        with open(path, "ab") as f:
+            f.write(b"\x07\x00\x00")
+
+        assert IncrementJournal(path).pending_entries() == [(1, 1)]
+
+    def test_concurrent_owners_get_separate_files(self, tmp_path):
+        path = str(tmp_path / "increments.journal")
+        first = IncrementJournal(path)
+        first.append(1)
+
+        second = IncrementJournal(path)
+        second.append(5)
+
+        assert second.path == f"{path}.1"
+        assert second.journal_id != first.journal_id
+        assert first.pending_entries() == [(1, 1)]
+        first.close()
+        assert IncrementJournal(path).pending_entries() == [(1, 1)]
+
+    def test_sequence_continues_after_truncation(self, tmp_path):
+        path = str(tmp_path / "increments.journal")
+        journal = IncrementJournal(path)
+        journal.append(1)
+        journal.append(1)
+        journal.mark_applied(2)
+        journal.close()
+
+        reopened = IncrementJournal(path)
+
+        assert reopened.pending_entries() == []
+        assert reopened.append(1) == 3
+
+
+class TestJournalReplay:
+    """Test cases for journaling failed increments and replaying them"""
+
+    @pytest.fixture
+    def manager(self, make_manager, tmp_path):
+        manager = make_manager(INCREMENT_JOURNAL_PATH=str(tmp_path / "increments.journal"))
+        manager.journal.start = lambda replay: None
+        manager.last_count = 10
+        return manager
+
+    def test_failed_increment_is_journaled_not_lost(self, manager):
+        manager.table_client.get_entity.side_effect = ServiceRequestError("unreachable")
+
+        assert manager.increment_visitor_count() == 11
+        assert manager.increment_visitor_count() == 12
+        assert manager.journal.pending_amount == 2
+        # The second increment went straight to the journal
+        assert manager.table_client.get_entity.call_count == 1
+
+    def test_replay_applies_counter_and_marker_atomically(self, manager):
+        manager.journal.append(3)
+        counter = MagicMock()
+        counter.get.return_value = 10
+        counter.metadata = {'etag': 'W/"1"'}
+        manager.table_client.get_entity.side_effect = [ResourceNotFoundError("no marker"), counter]
+
+        assert manager.replay_journal() == 3
+
+        operations = manager.table_client.submit_transaction.call_args[0][0]
+        assert operations[0][1]['Count'] == 13
+        assert operations[1][1]['AppliedThrough'] == 1
+        assert not manager.journal.has_pending()
+        assert manager.last_count == 13
+
+    def test_replay_skips_records_already_applied(self, manager):
+        manager.journal.append(3)
+        manager.table_client.get_entity.return_value = {'AppliedThrough': 1}
+
+        assert manager.replay_journal() == 0
+        manager.table_client.submit_transaction.assert_not_called()
+        assert not manager.journal.has_pending()
+
+    def test_restart_replays_every_crashed_workers_journal(self, tmp_path, make_manager):
+        path = str(tmp_path / "increments.journal")
+        first, second = IncrementJournal(path), IncrementJournal(path)
+        first.append(2)
+        second.append(5)
+        # Both workers die; their slot locks go with them
+        first.close()
+        second.close()
+
+        table = MagicMock()
+        counter = MagicMock()
+        counter.get.return_value = 10
+        counter.metadata = {'etag': 'W/"1"'}
+
+        def get_entity(partition_key, row_key, **kwargs):
+            if row_key != function_app.COUNTER_ROW_KEY:
+                raise ResourceNotFoundError("no marker")
+            return counter
+
+        table.get_entity.side_effect = get_entity
+        with patch.object(IncrementJournal, 'start'):
+            restarted = make_manager(table, INCREMENT_JOURNAL_PATH=path)
+
+        # The restarted worker owns slot 0; the other dead worker's slot was replayed and released
+        assert restarted.journal.path == path
+        assert restarted.journal.pending_entries() == [(1, 2)]
+        operations = table.submit_transaction.call_args[0][0]
+        assert operations[0][1]['Count'] == 15
+        assert operations[1][1]['RowKey'] == f"journal-{second.journal_id}"
+        reclaimed = IncrementJournal(path)
+        assert reclaimed.path == f"{path}.1"
+        assert not reclaimed.has_pending()
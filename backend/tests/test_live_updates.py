@@ -0,0 +1,152 @@
+"""
+Unit tests for long-poll live count updates
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from unittest.mock import AsyncMock, Mock, patch
+
+import azure.functions as func
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from http_adapter import FunctionAsgiApp
+from live_updates import LiveCountWatcher
+import function_app
+
+
+class TestLiveCountWatcher:
+    """Test cases for the shared version poller"""
+
+    def test_current_version_returns_immediately(self):
+        watcher = LiveCountWatcher(Mock(return_value=(5, "v1")), poll_interval=0.01)
+
+        assert watcher.wait(since=None, timeout=1) == (5, "v1", True)
+        assert watcher.wait(since="v0", timeout=1) == (5, "v1", True)
+
+    def test_times_out_without_change(self):
+        watcher = LiveCountWatcher(Mock(return_value=(5, "v1")), poll_interval=0.01)
+
+        assert watcher.wait(since="v1", timeout=0.05) == (5, "v1", False)
+
+    def test_one_poller_wakes_all_waiters(self):
+        state = {'current': (5, "v1")}
+        read_current = Mock(side_effect=lambda: state['current'])
+        watcher = LiveCountWatcher(read_current, poll_interval=0.02)
+        watcher.wait()
+        results = []
+
+        def waiter():
+            results.append(watcher.wait(since="v1", timeout=2))
+
+        threads = [threading.Thread(target=waiter) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        polls_while_waiting = read_current.call_count
+        state['current'] = (6, "v2")
+        for thread in threads:
+            thread.join()
+
+        assert results == [(6, "v2", True)] * 20
+        # Twenty waiters over ~5 poll intervals cost a handful of reads, not one per waiter per poll
+        assert polls_while_waiting < 20
+
+
+    def test_async_waiters_do_not_hold_threads(self):
+        watcher = LiveCountWatcher(Mock(return_value=(5, "v1")), poll_interval=60)
+        watcher.wait()
+
+        async def scenario():
+            waiters = [asyncio.ensure_future(watcher.wait_async(since="v1", timeout=2)) for _ in range(50)]
+            await asyncio.sleep(0.05)
+            threads_while_waiting = threading.active_count()
+            # A write on another thread wakes every client on the loop
+            threading.Thread(target=watcher.publish, args=(6, "v2")).start()
+            return threads_while_waiting, await asyncio.gather(*waiters)
+
+        before = threading.active_count()
+        threads_while_waiting, results = asyncio.run(scenario())
+
+        assert results == [(6, "v2", True)] * 50
+        # Only the shared poller thread, not one executor thread per client
+        assert threads_while_waiting <= before + 1
+        assert watcher.stats()['waiters'] == 0
+
+    def test_async_wait_times_out_without_change(self):
+        watcher = LiveCountWatcher(Mock(return_value=(5, "v1")), poll_interval=60)
+
+        assert asyncio.run(watcher.wait_async(since="v1", timeout=0.05)) == (5, "v1", False)
+
+    def test_write_path_publishes_without_a_poll(self):
+        stored = {'current': (5, "v1")}
+        watcher = LiveCountWatcher(lambda: stored['current'], poll_interval=60)
+        watcher.wait()
+        manager = function_app.TableStorageManager.__new__(function_app.TableStorageManager)
+        manager.read_router = None
+
+        with patch.object(function_app, 'live_count_watcher', watcher), \
+                patch.object(function_app, 'count_snapshot', Mock()):
+            stored['current'] = (6, "v2")
+            manager._remember_count(6, "v2", written=True)
+
+        # Well inside the poll interval
+        assert watcher.wait(since="v1", timeout=0.05) == (6, "v2", True)
+        assert watcher.stats()['published'] == 1
+
+
+class TestUpdatesRoute:
+    """Test cases for the long-poll HTTP route"""
+
+    def test_updates_route_reports_change(self):
+        watcher = Mock()
+        watcher.wait_async = AsyncMock(return_value=(8, "v3", True))
+        req = func.HttpRequest("GET", "/api/visitor-counter/updates", params={'since': 'v2', 'timeout': '999'}, body=b"")
+
+        with patch.object(function_app, 'live_count_watcher', watcher):
+            response = asyncio.run(function_app.visitor_counter_updates(req))
+
+        body = json.loads(response.get_body())
+        assert body['count'] == 8 and body['version'] == "v3" and body['changed']
+        watcher.wait_async.assert_awaited_once_with("v2", 30.0)
+
+    @patch('function_app.get_table_manager')
+    def test_pending_long_poll_does_not_block_an_increment(self, mock_get_manager):
+        mock_get_manager.return_value.increment_visitor_count.return_value = 9
+        watcher = LiveCountWatcher(Mock(return_value=(8, "v1")), poll_interval=60)
+        # One handler thread: a blocking long-poll would leave none for the POST
+        app = FunctionAsgiApp(function_app.app, max_threads=1)
+
+        async def request(method, path, query=b""):
+            scope = {"type": "http", "method": method, "path": path, "query_string": query,
+                     "headers": [(b"host", b"testserver")], "scheme": "http", "client": ("192.0.2.50", 50000)}
+            sent = []
+
+            async def receive():
+                return {"type": "http.request", "body": b"", "more_body": False}
+
+            async def send(message):
+                sent.append(message)
+
+            await app(scope, receive, send)
+            return sent[0]["status"], json.loads(sent[1]["body"])
+
+        async def scenario():
+            poll = asyncio.ensure_future(request("GET", "/api/visitor-counter/updates", b"since=v1&timeout=2"))
+            await asyncio.sleep(0.05)
+            started = time.monotonic()
+            status, body = await request("POST", "/api/visitor-counter")
+            elapsed = time.monotonic() - started
+            watcher.publish(9, "v2")
+            return status, body, elapsed, await poll
+
+        with patch.object(function_app, 'live_count_watcher', watcher), \
+                patch.dict(os.environ, {'VISIT_DEDUPE_ENABLED': 'false'}):
+            status, body, elapsed, (poll_status, poll_body) = asyncio.run(scenario())
+
+        assert status == 200 and body['count'] == 9
+        assert elapsed < 1
+        assert poll_status == 200 and poll_body['count'] == 9 and poll_body['changed']
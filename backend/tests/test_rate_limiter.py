@@ -0,0 +1,108 @@
+"""
+Unit tests for per-client rate limiting of visitor counter increments
+"""
+
+import os
+import sys
+from unittest.mock import patch
+
+import azure.functions as func
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from rate_limiter import TokenBucketLimiter, client_key
+import function_app
+
+
+class TestTokenBucketLimiter:
+    """Test cases for the token bucket"""
+
+    def test_burst_then_reject_with_retry_after(self, clock):
+        limiter = TokenBucketLimiter(rate_per_second=0.5, burst=3, clock=clock)
+
+        assert [limiter.acquire("a")[0] for _ in range(3)] == [True, True, True]
+        assert limiter.acquire("a") == (False, 2)
+
+        clock.now = 2.0
+        assert limiter.acquire("a") == (True, 0)
+
+    def test_clients_are_independent(self, clock):
+        limiter = TokenBucketLimiter(rate_per_second=1, burst=1, clock=clock)
+        assert limiter.acquire("a")[0]
+        assert not limiter.acquire("a")[0]
+        assert limiter.acquire("b")[0]
+
+    def test_memory_is_bounded(self, clock):
+        limiter = TokenBucketLimiter(rate_per_second=1, burst=1, max_clients=100, clock=clock)
+        for index in range(1000):
+            limiter.acquire(index)
+        assert limiter.stats()['trackedClients'] == 100
+        assert limiter.stats()['evicted'] == 900
+
+    def test_client_key_ignores_port_and_hashes(self):
+        first = func.HttpRequest("POST", "/api/visitor-counter", headers={'X-Forwarded-For': '203.0.113.7:5123'}, body=b"")
+        second = func.HttpRequest("POST", "/api/visitor-counter", headers={'X-Forwarded-For': '203.0.113.7:6001'}, body=b"")
+        assert client_key(first) == client_key(second)
+        assert b"203.0.113.7" not in client_key(first)
+
+    def test_client_key_ignores_ipv6_port(self):
+        keys = {
+            client_key(func.HttpRequest("POST", "/api/visitor-counter", headers={'X-Forwarded-For': address}, body=b""))
+            for address in ('[2001:db8::7]:5123', '[2001:db8::7]:6001', '2001:db8::7', '2001:DB8:0::7')
+        }
+        assert len(keys) == 1
+
+    def test_client_key_keeps_every_ipv6_group(self):
+        # A bare IPv6 address is not "host:port"; its last group is part of the address
+        first = func.HttpRequest("POST", "/api/visitor-counter", headers={'X-Client-IP': '2001:db8::1'}, body=b"")
+        second = func.HttpRequest("POST", "/api/visitor-counter", headers={'X-Client-IP': '2001:db8::2'}, body=b"")
+
+        assert client_key(first) != client_key(second)
+
+    def test_client_key_uses_the_trusted_forwarded_hop(self):
+        spoofed = func.HttpRequest("POST", "/api/visitor-counter",
+                                   headers={'X-Forwarded-For': '10.0.0.1, 203.0.113.7:5123'}, body=b"")
+        direct = func.HttpRequest("POST", "/api/visitor-counter",
+                                  headers={'X-Forwarded-For': '203.0.113.7:6001'}, body=b"")
+
+        assert client_key(spoofed) == client_key(direct)
+        with patch.dict(os.environ, {'TRUSTED_PROXY_HOPS': '2'}):
+            assert client_key(spoofed) != client_key(direct)
+
+    def test_client_key_prefers_the_platform_address(self):
+        headers = {'X-Client-IP': '203.0.113.8', 'X-Forwarded-For': '203.0.113.9', 'X-Client-Id': 'chosen'}
+        req = func.HttpRequest("POST", "/api/visitor-counter", headers=headers, body=b"")
+        platform = func.HttpRequest("POST", "/api/visitor-counter", headers={'X-Client-IP': '203.0.113.8'}, body=b"")
+
+        assert client_key(req) == client_key(platform)
+        with patch.dict(os.environ, {'TRUST_CLIENT_ID_HEADER': 'true'}):
+            assert client_key(req) != client_key(platform)
+
+    def test_client_key_is_none_without_an_identity(self):
+        req = func.HttpRequest("POST", "/api/visitor-counter", headers={'X-Client-Id': 'self-chosen'}, body=b"")
+
+        assert client_key(req) is None
+
+    def test_unidentified_requests_do_not_share_a_bucket(self, clock):
+        limiter = TokenBucketLimiter(rate_per_second=1, burst=1, clock=clock)
+
+        assert [limiter.acquire(None)[0] for _ in range(3)] == [True, True, True]
+        assert limiter.stats()['unidentified'] == 3
+        assert limiter.stats()['trackedClients'] == 0
+
+
+class TestVisitorCounterRateLimit:
+    """Test cases for the 429 path in the HTTP handler"""
+
+    @patch('function_app.get_table_manager')
+    def test_rejected_post_does_not_touch_storage(self, mock_get_manager):
+        mock_get_manager.return_value.increment_visitor_count.return_value = 1
+        limiter = TokenBucketLimiter(rate_per_second=0.01, burst=1)
+        req = func.HttpRequest("POST", "/api/visitor-counter", headers={'X-Forwarded-For': '198.51.100.1'}, body=b"")
+
+        with patch.object(function_app, 'increment_limiter', limiter):
+            assert function_app.visitor_counter(req).status_code == 200
+            response = function_app.visitor_counter(req)
+
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
+        assert mock_get_manager.call_count == 1
@@ -0,0 +1,123 @@
+"""
+Unit tests for routing counter reads to a secondary endpoint
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock, patch
+
+from azure.core.exceptions import ResourceNotFoundError, ServiceRequestError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from read_routing import ReadRouter
+import function_app
+
+
+class StandInEndpoint:
+    """Local stand-in for one table endpoint holding the counter row"""
+
+    def __init__(self, count=None, error=None):
+        self.count = count
+        self.error = error
+        self.reads = 0
+
+    def get_entity(self, partition_key, row_key, select=None):
+        self.reads += 1
+        if self.error is not None:
+            raise self.error
+        if self.count is None:
+            raise ResourceNotFoundError("missing")
+        return {'Count': self.count}
+
+
+def fetch_count(client):
+    return function_app.CounterRecord.from_entity(
+        client.get_entity(partition_key="visitor-counter", row_key="count")
+    )
+
+
+class TestReadRouter:
+    """Test cases for secondary reads and fallback"""
+
+    def test_reads_go_to_the_secondary(self):
+        primary, secondary = StandInEndpoint(10), StandInEndpoint(9)
+        router = ReadRouter(primary, secondary)
+
+        assert router.read(fetch_count).count == 9
+        assert (primary.reads, secondary.reads) == (0, 1)
+
+    def test_secondary_failure_falls_back_and_cools_down(self, clock):
+        primary, secondary = StandInEndpoint(10), StandInEndpoint(error=ServiceRequestError("down"))
+        router = ReadRouter(primary, secondary, cooldown=30, clock=clock)
+
+        assert router.read(fetch_count).count == 10
+        assert router.read(fetch_count).count == 10
+        assert secondary.reads == 1
+
+        clock.now += 31
+        secondary.error = None
+        secondary.count = 10
+        router.read(fetch_count)
+        assert secondary.reads == 2
+
+    def test_missing_on_secondary_reads_primary(self):
+        primary, secondary = StandInEndpoint(3), StandInEndpoint()
+        router = ReadRouter(primary, secondary)
+
+        assert router.read(fetch_count).count == 3
+        assert router.stats()['fallbacks'] == 1
+
+    def test_secondary_behind_own_write_is_tolerated_within_the_bound(self, clock):
+        primary, secondary = StandInEndpoint(10), StandInEndpoint(8)
+        router = ReadRouter(primary, secondary, max_staleness=5, clock=clock)
+        router.note_write(10)
+
+        assert router.read(fetch_count).count == 8
+        clock.now += 6
+        assert router.read(fetch_count).count == 10
+        assert router.stats()['stale'] == 1
+
+    def test_reported_replication_lag_over_the_bound_uses_primary(self):
+        primary, secondary = StandInEndpoint(10), StandInEndpoint(4)
+        last_sync = datetime.now(timezone.utc) - timedelta(minutes=5)
+        router = ReadRouter(primary, secondary, max_staleness=30, sync_probe=lambda: last_sync)
+
+        assert router.read(fetch_count).count == 10
+        assert secondary.reads == 0
+
+    def test_probe_errors_disable_lag_checks(self):
+        router = ReadRouter(StandInEndpoint(1), StandInEndpoint(1), sync_probe=Mock(side_effect=Exception("no stats")))
+
+        assert router.replication_lag() is None
+        assert router.sync_probe is None
+
+
+class TestManagerReadRouting:
+    """Test cases for read routing in the table manager"""
+
+    def test_gets_use_the_secondary_and_writes_the_primary(self):
+        primary, secondary = Mock(), StandInEndpoint(41)
+        primary.get_entity.return_value = {'Count': 41}
+        primary.update_entity.return_value = {'etag': 'W/"2"'}
+        clients = {'primary': primary, 'secondary': secondary}
+
+        def from_connection_string(conn_str, **kwargs):
+            service = Mock()
+            service.get_table_client.return_value = clients[conn_str]
+            service.get_service_stats.side_effect = Exception("not RA-GRS")
+            return service
+
+        with patch.dict(os.environ, {'COSMOS_DB_CONNECTION_STRING': 'primary',
+                                     'TABLE_READ_CONNECTION_STRING': 'secondary',
+                                     'INCREMENT_JOURNAL_ENABLED': 'false'}), \
+                patch.object(function_app, 'TableServiceClient') as mock_service:
+            mock_service.from_connection_string.side_effect = from_connection_string
+            manager = function_app.TableStorageManager()
+
+        assert manager.get_visitor_count() == 41
+        assert manager.get_visitor_stats()['count'] == 41
+        assert manager.commit_increment(1) == 42
+        assert secondary.reads == 2
+        assert primary.get_entity.call_count == 1
+        primary.update_entity.assert_called_once()
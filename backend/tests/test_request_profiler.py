@@ -0,0 +1,93 @@
+"""
+Unit tests for the opt-in request profiler
+"""
+
+import gc
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from request_profiler import RequestProfiler, profiler_from_environment
+
+
+def busy_handler(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        time.sleep(0.001)
+    return "ok"
+
+
+def read_profiles(directory):
+    return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+
+class TestRequestProfiler:
+    """Test cases for selection, output and limits"""
+
+    def test_disabled_profiler_leaves_handler_untouched(self):
+        profiler = RequestProfiler(enabled=False)
+
+        assert profiler.profile_route(busy_handler) is busy_handler
+
+    def test_sampled_request_writes_collapsed_stacks(self, tmp_path):
+        profiler = RequestProfiler(enabled=True, sample_rate=1.0, interval_ms=1, output_dir=str(tmp_path))
+        handler = profiler.profile_route(busy_handler)
+
+        assert handler(0.05) == "ok"
+
+        [name] = read_profiles(tmp_path)
+        assert name.endswith("-busy_handler-sampled.folded")
+        lines = (tmp_path / name).read_text().splitlines()
+        assert all(line.startswith("busy_handler;") for line in lines)
+        assert any("test_request_profiler.py:busy_handler" in line for line in lines)
+        assert sum(int(line.rsplit(' ', 1)[1]) for line in lines) == profiler.stats()['samples']
+
+    def test_only_requests_over_the_threshold_are_profiled(self, tmp_path):
+        profiler = RequestProfiler(enabled=True, slow_ms=30, interval_ms=1, output_dir=str(tmp_path))
+        handler = profiler.profile_route(busy_handler)
+
+        # A full collection of what earlier tests left behind can outlast the threshold
+        gc.collect()
+        handler(0.005)
+        assert read_profiles(tmp_path) == []
+
+        handler(0.08)
+        [name] = read_profiles(tmp_path)
+        assert name.endswith("-slow.folded")
+
+    def test_profiles_are_rate_limited(self, tmp_path):
+        profiler = RequestProfiler(enabled=True, sample_rate=1.0, interval_ms=1, output_dir=str(tmp_path),
+                                   max_per_minute=1)
+        handler = profiler.profile_route(busy_handler)
+
+        handler(0.02)
+        handler(0.02)
+
+        assert len(read_profiles(tmp_path)) == 1
+        assert profiler.stats()['rateLimited'] == 1
+
+    def test_output_directory_is_bounded(self, tmp_path):
+        profiler = RequestProfiler(enabled=True, sample_rate=1.0, interval_ms=1, output_dir=str(tmp_path),
+                                   max_files=2, max_per_minute=100)
+        handler = profiler.profile_route(busy_handler)
+
+        for _ in range(4):
+            handler(0.01)
+
+        assert len(read_profiles(tmp_path)) == 2
+
+    def test_log_output_without_directory(self, caplog):
+        profiler = RequestProfiler(enabled=True, sample_rate=1.0, interval_ms=1)
+        handler = profiler.profile_route(busy_handler)
+
+        with caplog.at_level(logging.INFO, logger="request_profiler"):
+            handler(0.02)
+
+        assert any(record.getMessage().startswith("Profile busy_handler") for record in caplog.records)
+
+    def test_environment_defaults_to_disabled(self, monkeypatch):
+        monkeypatch.delenv('PROFILER_ENABLED', raising=False)
+
+        assert profiler_from_environment().enabled is False
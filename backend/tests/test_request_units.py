@@ -0,0 +1,115 @@
+"""
+Unit tests for request unit accounting and the RU budget paths
+"""
+
+import json
+import os
+import sys
+from unittest.mock import Mock, patch
+
+import azure.functions as func
+from azure.core.pipeline.transport import HttpRequest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from request_units import RequestUnitMeter, classify_operation
+import function_app
+
+
+def pipeline_response(method, url, charge, headers=None):
+    response = Mock()
+    response.http_request = HttpRequest(method, url, headers=headers or {})
+    response.http_response.headers = {'x-ms-request-charge': charge} if charge is not None else {}
+    return response
+
+
+BASE = "https://account.table.cosmos.azure.com/VisitorCounter"
+
+
+class TestClassification:
+    """Test cases for naming operations from requests"""
+
+    def test_entity_operations(self):
+        assert classify_operation(HttpRequest("GET", f"{BASE}(PartitionKey='p',RowKey='r')")) == "get_entity"
+        assert classify_operation(HttpRequest("GET", f"{BASE}()?$filter=x")) == "get_entity"
+        assert classify_operation(HttpRequest("GET", f"{BASE}?$filter=x")) == "query_entities"
+        assert classify_operation(HttpRequest("POST", "https://account.table.cosmos.azure.com/$batch")) == \
+            "submit_transaction"
+        assert classify_operation(HttpRequest("DELETE", f"{BASE}(PartitionKey='p',RowKey='r')")) == "delete_entity"
+
+    def test_update_and_upsert_differ_by_if_match(self):
+        url = f"{BASE}(PartitionKey='p',RowKey='r')"
+
+        assert classify_operation(HttpRequest("PATCH", url, headers={'If-Match': '*'})) == "update_entity"
+        assert classify_operation(HttpRequest("PATCH", url)) == "upsert_entity"
+
+
+class TestRequestUnitMeter:
+    """Test cases for RU totals and RU/s"""
+
+    def test_charges_are_attributed_to_the_tracked_route(self):
+        meter = RequestUnitMeter()
+
+        @meter.track_route
+        def visitor_counter():
+            meter.response_hook(pipeline_response("GET", f"{BASE}(PartitionKey='p',RowKey='r')", "1.5"))
+
+        visitor_counter()
+        meter.response_hook(pipeline_response("POST", f"{BASE}", "6.2"))
+
+        by_route = meter.stats()['byRoute']
+        assert by_route['visitor_counter']['get_entity'] == {'calls': 1, 'requestUnits': 1.5}
+        assert by_route['background']['create_entity']['requestUnits'] == 6.2
+
+    def test_responses_without_a_charge_are_ignored(self):
+        meter = RequestUnitMeter()
+        meter.response_hook(pipeline_response("GET", BASE, None))
+
+        assert meter.stats()['totalRequestUnits'] == 0
+
+    def test_rate_uses_the_sliding_window(self, clock):
+        meter = RequestUnitMeter(window_seconds=10, clock=clock)
+        for _ in range(10):
+            meter.record("r", "get_entity", 5.0)
+            clock.now += 1
+
+        assert meter.rate() == 4.5
+        clock.now += 20
+        assert meter.rate() == 0
+
+    def test_near_ceiling(self, clock):
+        meter = RequestUnitMeter(window_seconds=1, ceiling=100, threshold=0.8, clock=clock)
+        meter.record("r", "get_entity", 70)
+        assert not meter.near_ceiling()
+
+        meter.record("r", "get_entity", 15)
+        assert meter.near_ceiling()
+
+
+class TestBudgetPaths:
+    """Test cases for the cheaper paths near the RU ceiling"""
+
+    def request(self, method):
+        return func.HttpRequest(method=method, url="/api/visitor-counter", headers={'X-Client-Id': method}, body=b"")
+
+    def test_reads_and_writes_switch_to_cheap_paths(self):
+        manager = Mock(last_count=41, approximate=None)
+        meter = RequestUnitMeter(window_seconds=1, ceiling=10)
+        meter.record("visitor_counter", "get_entity", 10)
+        queue = Mock()
+        queue.submit.return_value = True
+        queue.stats.return_value = {'pending': 1}
+
+        with patch.object(function_app, 'ru_meter', meter), \
+                patch.object(function_app, 'beacon_queue', queue), \
+                patch.object(function_app, 'table_manager', manager), \
+                patch.object(function_app, 'get_table_manager', return_value=manager), \
+                patch.object(function_app, 'is_repeat_visit', return_value=False):
+            read = json.loads(function_app.visitor_counter_response(self.request("GET")).get_body())
+            write = json.loads(function_app.visitor_counter_response(self.request("POST")).get_body())
+
+        assert read['cached'] is True and read['count'] == 41
+        assert write['deferred'] is True and write['count'] == 42
+        manager.get_visitor_count.assert_not_called()
+        manager.increment_visitor_count.assert_not_called()
+        assert meter.stats()['cachedReads'] == 1
+        assert meter.stats()['deferredWrites'] == 1
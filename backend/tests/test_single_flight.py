@@ -0,0 +1,112 @@
+"""
+Unit tests for single-flight request collapsing in the Table Storage manager
+"""
+
+import os
+import sys
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from single_flight import SingleFlight
+
+
+def run_concurrently(target, workers=8):
+    """Start workers threads on target and return their results"""
+    results = [None] * workers
+    barrier = threading.Barrier(workers)
+
+    def runner(index):
+        barrier.wait()
+        results[index] = target()
+
+    threads = [threading.Thread(target=runner, args=(i,)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestSingleFlight:
+    """Test cases for the SingleFlight primitive"""
+
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.05)
+            return 42
+
+        results = run_concurrently(lambda: flight.do("key", slow))
+
+        assert results == [42] * 8
+        assert len(calls) == 1
+        assert flight.stats()['collapsed'] == 7
+        assert flight.stats()['inFlight'] == 0
+
+    def test_errors_propagate_to_all_waiters(self):
+        flight = SingleFlight()
+
+        def failing():
+            time.sleep(0.05)
+            raise ResourceNotFoundError("missing")
+
+        def call():
+            try:
+                flight.do("key", failing)
+            except ResourceNotFoundError:
+                return "raised"
+
+        assert run_concurrently(call, workers=4) == ["raised"] * 4
+
+    def test_sequential_calls_are_not_cached(self):
+        flight = SingleFlight()
+        fn = Mock(side_effect=[1, 2])
+
+        assert flight.do("key", fn) == 1
+        assert flight.do("key", fn) == 2
+
+
+class TestTableStorageManagerCollapsing:
+    """Test cases for collapsed reads and cold-start initialization"""
+
+    @pytest.fixture
+    def manager(self, make_manager):
+        return make_manager()
+
+    def test_concurrent_gets_issue_one_get_entity(self, manager):
+        def slow_get(**kwargs):
+            time.sleep(0.05)
+            return {'Count': 7}
+
+        manager.table_client.get_entity.side_effect = slow_get
+
+        assert run_concurrently(manager.get_visitor_count) == [7] * 8
+        assert manager.table_client.get_entity.call_count == 1
+
+    def test_cold_start_initializes_once(self, manager):
+        manager.table_client.get_entity.side_effect = ResourceNotFoundError("missing")
+
+        def slow_create(**kwargs):
+            time.sleep(0.05)
+
+        manager.table_client.create_entity.side_effect = slow_create
+
+        run_concurrently(manager.initialize_counter)
+
+        assert manager.table_client.create_table.call_count == 1
+        assert manager.table_client.create_entity.call_count == 1
+
+    def test_initialize_reads_existing_counter_on_conflict(self, manager):
+        manager.table_client.create_table.side_effect = ResourceExistsError("exists")
+        manager.table_client.create_entity.side_effect = ResourceExistsError("exists")
+        manager.table_client.get_entity.return_value = {'Count': 12}
+
+        assert manager.initialize_counter() == 12
@@ -0,0 +1,84 @@
+"""
+Unit tests for the startup and memory benchmark
+"""
+
+import json
+import os
+import sys
+
+import pytest
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+from azure.data.tables import TableServiceClient, UpdateMode
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import startup_benchmark
+from startup_benchmark import LocalTableBackend, format_table, previous_results, record_history
+
+
+@pytest.fixture
+def backend():
+    with LocalTableBackend() as local:
+        yield local
+
+
+class TestLocalTableBackend:
+    """Test cases for the in-memory Table service"""
+
+    def test_sdk_round_trip_with_conditions(self, backend):
+        service = TableServiceClient.from_connection_string(backend.connection_string)
+        table = service.create_table("VisitorCounter")
+        with pytest.raises(ResourceExistsError):
+            service.create_table("VisitorCounter")
+
+        metadata = table.create_entity({'PartitionKey': "p", 'RowKey': "r", 'Count': 1})
+        with pytest.raises(ResourceExistsError):
+            table.create_entity({'PartitionKey': "p", 'RowKey': "r", 'Count': 1})
+        table.update_entity({'PartitionKey': "p", 'RowKey': "r", 'Count': 2}, mode=UpdateMode.MERGE,
+                            etag=metadata['etag'], match_condition=MatchConditions.IfNotModified)
+        with pytest.raises(ResourceModifiedError):
+            table.update_entity({'PartitionKey': "p", 'RowKey': "r", 'Count': 3}, mode=UpdateMode.MERGE,
+                                etag=metadata['etag'], match_condition=MatchConditions.IfNotModified)
+
+        assert table.get_entity("p", "r")['Count'] == 2
+        assert [e['RowKey'] for e in table.query_entities("PartitionKey eq 'p'")] == ["r"]
+        with pytest.raises(ResourceNotFoundError):
+            table.get_entity("p", "missing")
+
+
+class TestEntryPointRuns:
+    """Test cases for measuring entry points in fresh interpreters"""
+
+    def test_run_reports_startup_metrics(self, backend):
+        measured = startup_benchmark.run_entry_point('v1-simple_test', backend)
+
+        assert measured['status'] == 200
+        assert measured['importMs'] > 0
+        assert measured['firstResponseMs'] > 0
+        assert measured['processMs'] >= measured['importMs']
+        assert measured['allocatedBlocks'] > 0
+
+    def test_counter_entry_point_writes_to_the_local_backend(self, backend):
+        measured = startup_benchmark.run_entry_point('v1-visitor-counter', backend, trace=True)
+
+        assert measured['status'] == 200
+        assert measured['tracedPeakKb'] > 0
+        assert backend.server.store.tables['VisitorCounter'][("visitor", "counter")][0]['Count'] == 1
+
+
+class TestHistory:
+    """Test cases for tracking results over time"""
+
+    def test_history_is_appended_and_compared(self, tmp_path):
+        history = str(tmp_path / "startup.jsonl")
+        record_history(history, {'v1-health': {'importMs': 100.0, 'peakRssKb': 30000}}, runs=3)
+        record_history(history, {'v1-health': {'importMs': 120.0, 'peakRssKb': 30000}}, runs=3)
+
+        with open(history) as f:
+            assert [json.loads(line)['runs'] for line in f] == [3, 3]
+        previous = previous_results(history)
+        assert previous['v1-health']['importMs'] == 120.0
+
+        table = format_table({'v1-health': {'importMs': 150.0, 'peakRssKb': 30000}}, previous)
+        assert "150 (+25%)" in table
+        assert "30000 (+0%)" in table
@@ -0,0 +1,131 @@
+"""
+Unit tests for streaming table export and import
+"""
+
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from azure.data.tables import EdmType, EntityProperty
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from table_backup import (
+    MAX_BATCH_OPERATIONS, decode_entity, encode_entity, export_table, import_table, key_ranges
+)
+
+
+class Pages:
+    """Paged result set exposing by_page() like ItemPaged"""
+
+    def __init__(self, entities, page_size):
+        self.entities = entities
+        self.page_size = page_size
+
+    def by_page(self):
+        for start in range(0, len(self.entities), self.page_size):
+            yield iter(self.entities[start:start + self.page_size])
+
+
+class FakeTable:
+    """In-memory table answering range queries and batch transactions"""
+
+    def __init__(self, entities=()):
+        self.rows = {(e['PartitionKey'], e['RowKey']): e for e in entities}
+        self.transactions = []
+        self.queries = []
+
+    def _sorted(self):
+        return [self.rows[key] for key in sorted(self.rows)]
+
+    def list_entities(self, results_per_page=None):
+        self.queries.append((None, None))
+        return Pages(self._sorted(), results_per_page)
+
+    def query_entities(self, query_filter, parameters, results_per_page=None):
+        low, high = parameters.get('low'), parameters.get('high')
+        self.queries.append((low, high))
+        matches = [e for e in self._sorted()
+                   if (low is None or e['PartitionKey'] >= low) and (high is None or e['PartitionKey'] < high)]
+        return Pages(matches, results_per_page)
+
+    def submit_transaction(self, operations):
+        assert len(operations) <= MAX_BATCH_OPERATIONS
+        assert len({entity['PartitionKey'] for _, entity, *_ in operations}) == 1
+        self.transactions.append(operations)
+        for _, entity, *_ in operations:
+            self.rows[(entity['PartitionKey'], entity['RowKey'])] = entity
+
+
+def sample_entities():
+    entities = [
+        {'PartitionKey': "visitor-counter", 'RowKey': "count", 'Count': 42,
+         'CreatedAt': datetime(2025, 1, 1, tzinfo=timezone.utc)},
+        {'PartitionKey': "Visitor", 'RowKey': "upper", 'Count': 1},
+        {'PartitionKey': "0-digits", 'RowKey': "x", 'Big': EntityProperty(2 ** 40, EdmType.INT64),
+         'Id': uuid.UUID(int=7), 'Blob': b"\x00\x01"},
+    ]
+    entities += [{'PartitionKey': "events-2025010100", 'RowKey': f"{i:05d}", 'Page': "/"} for i in range(250)]
+    return entities
+
+
+class TestEncoding:
+    """Test cases for typed NDJSON lines"""
+
+    def test_round_trip_keeps_types(self):
+        entity = sample_entities()[2]
+
+        decoded = decode_entity(encode_entity(entity))
+
+        assert decoded['Big'] == EntityProperty(2 ** 40, EdmType.INT64)
+        assert decoded['Id'] == uuid.UUID(int=7)
+        assert decoded['Blob'] == b"\x00\x01"
+
+    def test_datetime_round_trip(self):
+        decoded = decode_entity(encode_entity(sample_entities()[0]))
+
+        assert decoded['CreatedAt'] == datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def test_key_ranges_are_contiguous(self):
+        ranges = key_ranges(4)
+
+        assert ranges[0][0] is None and ranges[-1][1] is None
+        assert all(high == next_low for (_, high), (next_low, _) in zip(ranges, ranges[1:]))
+
+
+class TestExportImport:
+    """Test cases for the streaming transfer"""
+
+    @pytest.mark.parametrize("parallelism", [1, 4])
+    def test_export_then_import_copies_every_entity(self, tmp_path, parallelism):
+        source = FakeTable(sample_entities())
+        path = str(tmp_path / "backup.ndjson.gz")
+
+        exported = export_table(source, path, parallelism=parallelism, page_size=20)
+        target = FakeTable()
+        imported = import_table(target, path, parallelism=parallelism)
+
+        assert exported.entities == imported.entities == len(source.rows)
+        assert set(target.rows) == set(source.rows)
+        assert len(source.queries) == parallelism
+        assert exported.to_dict()['entitiesPerSecond'] > 0
+
+    def test_import_batches_by_partition(self, tmp_path):
+        path = str(tmp_path / "backup.ndjson.gz")
+        export_table(FakeTable(sample_entities()), path)
+        target = FakeTable()
+
+        import_table(target, path)
+
+        sizes = sorted(len(t) for t in target.transactions if t[0][1]['PartitionKey'].startswith("events-"))
+        assert sizes == [50, 100, 100]
+
+    def test_import_failure_is_raised(self, tmp_path):
+        path = str(tmp_path / "backup.ndjson.gz")
+        export_table(FakeTable(sample_entities()), path)
+        target = FakeTable()
+        target.submit_transaction = lambda operations: (_ for _ in ()).throw(RuntimeError("throttled"))
+
+        with pytest.raises(RuntimeError):
+            import_table(target, path)
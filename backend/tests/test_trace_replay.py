@@ -0,0 +1,91 @@
+"""
+Unit tests for trace-driven replay
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from trace_replay import load_trace, percentiles, replay, summarize_trace
+
+
+class RecordingTarget:
+    """Target that records sends and counts two storage operations per request"""
+
+    def __init__(self, delay=0.0, probe_cost=1):
+        self.delay = delay
+        self.probe_cost = probe_cost
+        self.operations = 0
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send(self, method, path, client):
+        time.sleep(self.delay)
+        with self.lock:
+            self.sent.append((method, path, client, time.perf_counter()))
+            self.operations += 2
+        return 200 if method == "GET" else 201
+
+    def storage_operations(self):
+        with self.lock:
+            self.operations += self.probe_cost
+            return self.operations
+
+
+class TestTraceFiles:
+    """Test cases for loading and summarizing traces"""
+
+    def test_worker_traces_are_merged_by_time(self, tmp_path):
+        (tmp_path / "a.log").write_text("# epoch_ms method route client sample=1.0\n1000 POST visitor_counter aa\n"
+                                        "3000 GET visitor_counter aa\n")
+        (tmp_path / "b.log").write_text("2000 GET visitor_stats bb\n")
+
+        records = load_trace([str(tmp_path / "a.log"), str(tmp_path / "b.log")])
+
+        assert [record[0] for record in records] == [1000, 2000, 3000]
+        summary = summarize_trace(records)
+        assert summary['methods'] == {'POST': 1, 'GET': 2}
+        assert summary['clients'] == 2
+        assert summary['durationSeconds'] == 2.0
+
+    def test_percentiles_use_nearest_rank(self):
+        result = percentiles([i / 1000 for i in range(1, 101)])
+
+        assert result == {'p50': 50.0, 'p90': 90.0, 'p99': 99.0, 'max': 100.0}
+
+
+class TestReplay:
+    """Test cases for replay pacing and the report"""
+
+    def test_speedup_compresses_the_schedule(self):
+        records = [(0, "POST", "visitor_counter", "a"), (1000, "POST", "visitor_counter", "b"),
+                   (2000, "GET", "visitor_stats", "a")]
+        target = RecordingTarget()
+
+        report = replay(records, target, speedup=20, settle=0)
+
+        times = [sent[3] for sent in target.sent]
+        assert 0.08 < times[-1] - times[0] < 0.5
+        assert [sent[1] for sent in target.sent] == ["/api/visitor-counter", "/api/visitor-counter",
+                                                     "/api/visitor-stats"]
+        assert report['statuses'] == {'201': 2, '200': 1}
+        assert report['byRoute']['visitor_counter']['requests'] == 2
+
+    def test_storage_operations_exclude_the_probes(self):
+        records = [(i * 10, "POST", "visitor_counter", "a") for i in range(5)]
+
+        report = replay(records, RecordingTarget(probe_cost=3), speedup=100, settle=0)
+
+        assert report['storageOperations'] == 10
+        assert report['storageOperationsPerRequest'] == 2.0
+
+    def test_bursts_are_sent_open_loop(self):
+        records = [(0, "POST", "visitor_counter", str(i)) for i in range(8)]
+
+        report = replay(records, RecordingTarget(delay=0.05), concurrency=8, settle=0)
+
+        assert report['durationSeconds'] < 0.3
+        assert report['latencyMs']['max'] < 300
+        assert report['throughputPerSecond'] > 0
@@ -0,0 +1,91 @@
+"""
+Unit tests for recording counter traffic traces
+"""
+
+import os
+import sys
+from unittest.mock import Mock
+
+import azure.functions as func
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from traffic_trace import TraceRecorder, trace_recorder_from_environment
+
+
+def trace_lines(path):
+    with open(path) as f:
+        return f.read().splitlines()
+
+
+class TestTraceRecorder:
+    """Test cases for buffering, hashing and limits"""
+
+    def test_disabled_recorder_leaves_handler_untouched(self):
+        handler = Mock()
+
+        assert TraceRecorder(None).record_route(handler) is handler
+
+    def test_records_are_flushed_with_a_header(self, tmp_path):
+        path = str(tmp_path / "trace.log")
+        recorder = TraceRecorder(path, salt="s", clock=lambda: 1700000000.123)
+
+        recorder.record("POST", "visitor_counter", b"client-a")
+        recorder.record("GET", "visitor_stats", b"client-b")
+        assert recorder.flush() == 2
+
+        header, first, second = trace_lines(path)
+        assert header.startswith("# epoch_ms method route client")
+        assert first.split()[:3] == ["1700000000123", "POST", "visitor_counter"]
+        assert second.split()[:3] == ["1700000000123", "GET", "visitor_stats"]
+        assert recorder.stats()['recorded'] == 2
+
+    def test_clients_are_hashed_consistently_per_salt(self, tmp_path):
+        first = TraceRecorder(str(tmp_path / "a.log"), salt="s")
+        second = TraceRecorder(str(tmp_path / "b.log"), salt="s")
+        other = TraceRecorder(str(tmp_path / "c.log"), salt="t")
+
+        digest = first._client_hash(b"203.0.113.9")
+        assert digest == second._client_hash(b"203.0.113.9")
+        assert digest != other._client_hash(b"203.0.113.9")
+        assert "203" not in digest
+        assert first._client_hash(None) == "-"
+
+    def test_recording_stops_at_the_size_limit(self, tmp_path):
+        recorder = TraceRecorder(str(tmp_path / "trace.log"), max_bytes=1)
+        recorder.record("POST", "visitor_counter", b"a")
+        recorder.flush()
+
+        recorder.record("POST", "visitor_counter", b"b")
+
+        assert recorder.stats()['dropped'] == 1
+        assert recorder.flush() == 0
+
+    def test_sample_rate_skips_requests(self, tmp_path):
+        recorder = TraceRecorder(str(tmp_path / "trace.log"), sample_rate=0.5,
+                                 rng=Mock(random=Mock(side_effect=[0.1, 0.9])))
+
+        recorder.record("POST", "visitor_counter", b"a")
+        recorder.record("POST", "visitor_counter", b"b")
+
+        assert recorder.flush() == 1
+
+    def test_route_decorator_records_method_route_and_client(self, tmp_path):
+        recorder = TraceRecorder(str(tmp_path / "trace.log"))
+
+        @recorder.record_route
+        def visitor_counter(req):
+            return "ok"
+
+        request = func.HttpRequest(method="POST", url="/api/visitor-counter", headers={'X-Client-Id': "c"}, body=b"")
+        assert visitor_counter(request) == "ok"
+        recorder.close()
+
+        assert trace_lines(str(tmp_path / "trace.log"))[1].split()[1:3] == ["POST", "visitor_counter"]
+
+    def test_pid_placeholder_and_environment(self, monkeypatch, tmp_path):
+        monkeypatch.setenv('TRAFFIC_TRACE_PATH', str(tmp_path / "trace-{pid}.log"))
+
+        recorder = trace_recorder_from_environment()
+
+        assert recorder.enabled
+        assert recorder.path.endswith(f"trace-{os.getpid()}.log")
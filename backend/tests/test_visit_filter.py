@@ -0,0 +1,132 @@
+"""
+Unit tests for repeat-visit suppression with rotating Bloom filters
+"""
+
+import os
+import sys
+from unittest.mock import patch
+
+import azure.functions as func
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from visit_filter import BloomFilter, RotatingVisitFilter
+import function_app
+
+
+class TestBloomFilter:
+    """Test cases for the fixed-size Bloom filter"""
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        keys = [f"visitor-{i}".encode() for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        assert all(key in bloom for key in keys)
+
+    def test_false_positive_rate_near_target(self):
+        bloom = BloomFilter(capacity=5000, error_rate=0.01)
+        for i in range(5000):
+            bloom.add(f"in-{i}".encode())
+        false_positives = sum(f"out-{i}".encode() in bloom for i in range(20000))
+        assert false_positives / 20000 < 0.02
+
+
+class TestRotatingVisitFilter:
+    """Test cases for window rotation"""
+
+    def test_repeat_within_window_is_suppressed(self, clock):
+        visits = RotatingVisitFilter(window_seconds=60, capacity=100, clock=clock)
+
+        assert not visits.seen_recently(b"a")
+        clock.now = 59
+        assert visits.seen_recently(b"a")
+
+    def test_key_expires_after_two_windows(self, clock):
+        visits = RotatingVisitFilter(window_seconds=60, capacity=100, clock=clock)
+        visits.seen_recently(b"a")
+
+        clock.now = 61
+        assert visits.seen_recently(b"a")
+        clock.now = 125
+        assert visits.seen_recently(b"b") is False
+        clock.now = 190
+        assert not visits.seen_recently(b"a")
+
+    def test_memory_is_fixed(self, clock):
+        visits = RotatingVisitFilter(window_seconds=60, capacity=1000, clock=clock)
+        before = visits.memory_bytes
+        for i in range(10000):
+            visits.seen_recently(str(i).encode())
+        assert visits.memory_bytes == before
+
+
+class TestVisitorCounterSuppression:
+    """Test cases for suppressed POSTs in the HTTP handler"""
+
+    @pytest.fixture(autouse=True)
+    def dedupe_enabled(self):
+        with patch.dict(os.environ, {'VISIT_DEDUPE_ENABLED': 'true'}):
+            yield
+
+    @patch('function_app.get_table_manager')
+    def test_repeat_post_returns_last_count_without_write(self, mock_get_manager):
+        manager = mock_get_manager.return_value
+        manager.increment_visitor_count.return_value = 10
+        manager.last_count = 10
+        req = func.HttpRequest("POST", "/api/visitor-counter", headers={'X-Client-IP': '192.0.2.41'}, body=b"")
+
+        with patch.object(function_app, 'repeat_visit_filter', RotatingVisitFilter(window_seconds=60)):
+            first = function_app.visitor_counter(req)
+            second = function_app.visitor_counter(req)
+
+        assert first.status_code == second.status_code == 200
+        assert manager.increment_visitor_count.call_count == 1
+        assert b'"suppressed": true' in second.get_body()
+        assert b'"count": 10' in second.get_body()
+
+    @patch('function_app.get_table_manager')
+    def test_posts_without_an_identity_are_all_counted(self, mock_get_manager):
+        manager = mock_get_manager.return_value
+        manager.increment_visitor_count.side_effect = [11, 12]
+        req = func.HttpRequest("POST", "/api/visitor-counter", headers={'X-Client-Id': 'self-chosen'}, body=b"")
+
+        with patch.object(function_app, 'repeat_visit_filter', RotatingVisitFilter(window_seconds=60)):
+            function_app.visitor_counter(req)
+            second = function_app.visitor_counter(req)
+
+        assert manager.increment_visitor_count.call_count == 2
+        assert b'"suppressed"' not in second.get_body()
+
+    @patch('function_app.get_table_manager')
+    def test_spoofed_forwarded_prefix_is_still_a_repeat(self, mock_get_manager):
+        manager = mock_get_manager.return_value
+        manager.increment_visitor_count.return_value = 10
+        manager.last_count = 10
+
+        def post(forwarded):
+            return function_app.visitor_counter(func.HttpRequest(
+                "POST", "/api/visitor-counter", headers={'X-Forwarded-For': forwarded}, body=b""
+            ))
+
+        with patch.object(function_app, 'repeat_visit_filter', RotatingVisitFilter(window_seconds=60)):
+            post("192.0.2.43:5000")
+            second = post("10.9.8.7, 192.0.2.43:5001")
+
+        assert manager.increment_visitor_count.call_count == 1
+        assert b'"suppressed": true' in second.get_body()
+
+    @patch('function_app.get_table_manager')
+    def test_repeat_posts_are_counted_unless_enabled(self, mock_get_manager):
+        manager = mock_get_manager.return_value
+        manager.increment_visitor_count.side_effect = [11, 12]
+        req = func.HttpRequest("POST", "/api/visitor-counter", headers={'X-Client-IP': '192.0.2.44'}, body=b"")
+
+        with patch.dict(os.environ, {}), \
+                patch.object(function_app, 'repeat_visit_filter', RotatingVisitFilter(window_seconds=60)):
+            os.environ.pop('VISIT_DEDUPE_ENABLED', None)
+            function_app.visitor_counter(req)
+            second = function_app.visitor_counter(req)
+
+        assert manager.increment_visitor_count.call_count == 2
+        assert b'"suppressed"' not in second.get_body()
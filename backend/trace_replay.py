@@ -0,0 +1,287 @@
+"""
+Replay recorded counter traffic against a backend
+
+    python trace_replay.py trace.log --summary
+    python trace_replay.py trace.log --target http://localhost:7071 --speedup 10
+    python trace_replay.py trace-*.log --target local --speedup 60
+
+Traces come from traffic_trace.py; several files (one per worker) are merged
+by timestamp. Requests are sent open-loop: each is due at its recorded offset
+divided by the speed-up, whether or not earlier requests have finished, so
+bursts hit the backend as bursts. Latency is measured from the due time, so
+time spent waiting for a free sender counts against the backend instead of
+being hidden (service time from the actual send is reported too). The
+recorded client hash is sent as X-Client-Id, which keeps repeat-visit and
+rate limiting behaviour per client as long as the backend runs with
+TRUST_CLIENT_ID_HEADER=true (--target local sets it).
+
+--target local runs function_app in this process against the in-memory Table
+service from startup_benchmark.py and counts its storage requests exactly.
+For an HTTP target, storage operations come from the request unit counters
+in /api/visitor-stats (Cosmos DB only); the cost of that probe is measured
+and subtracted.
+"""
+import argparse
+import http.client
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from traffic_trace import UNIDENTIFIED_CLIENT
+
+ROUTE_PATHS = {
+    'visitor_counter': '/api/visitor-counter',
+    'visitor_stats': '/api/visitor-stats',
+}
+
+
+def client_headers(client):
+    """
+    Return the headers that replay a recorded client's identity
+    """
+    return {} if client == UNIDENTIFIED_CLIENT else {'X-Client-Id': client}
+
+
+def load_trace(paths):
+    """
+    Read and merge trace files; return records (epoch ms, method, route, client) sorted by time
+    """
+    records = []
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if line.startswith('#') or not line.strip():
+                    continue
+                timestamp, method, route, client = line.split()
+                records.append((int(timestamp), method, route, client))
+    records.sort(key=lambda record: record[0])
+    return records
+
+
+def summarize_trace(records):
+    """
+    Describe a trace's shape: duration, mix and burstiness
+    """
+    if not records:
+        return {'requests': 0}
+    per_second = {}
+    methods = {}
+    routes = {}
+    for timestamp, method, route, _ in records:
+        per_second[timestamp // 1000] = per_second.get(timestamp // 1000, 0) + 1
+        methods[method] = methods.get(method, 0) + 1
+        routes[route] = routes.get(route, 0) + 1
+    duration = (records[-1][0] - records[0][0]) / 1000
+    return {
+        'requests': len(records),
+        'durationSeconds': duration,
+        'clients': len({record[3] for record in records}),
+        'methods': methods,
+        'routes': routes,
+        'meanPerSecond': round(len(records) / max(duration, 1.0), 2),
+        'peakPerSecond': max(per_second.values()),
+    }
+
+
+def percentiles(values):
+    """
+    Return nearest-rank p50/p90/p99/max of latencies in seconds, in milliseconds
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def rank(q):
+        return ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))]
+    return {name: round(rank(q) * 1000, 2) for name, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))}
+
+
+class HttpTarget:
+    """
+    Sends replayed requests to a backend over HTTP, one keep-alive connection per sender thread
+    """
+
+    def __init__(self, base_url, timeout=10.0):
+        url = urlsplit(base_url)
+        self.scheme = url.scheme
+        self.netloc = url.netloc
+        self.prefix = url.path.rstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _open(self):
+        factory = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return factory(self.netloc, timeout=self.timeout)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._open()
+        return connection
+
+    def send(self, method, path, client):
+        """
+        Send one request and return its status code
+        """
+        connection = self._connection()
+        try:
+            connection.request(method, self.prefix + path, body=b'',
+                               headers={**client_headers(client), 'Content-Length': '0'})
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except Exception:
+            connection.close()
+            self._local.connection = None
+            raise
+
+    def storage_operations(self):
+        """
+        Return the backend's storage operation count so far, or None if it does not report one
+        """
+        try:
+            connection = self._open()
+            connection.request('GET', self.prefix + ROUTE_PATHS['visitor_stats'])
+            body = json.loads(connection.getresponse().read())
+            connection.close()
+            by_route = body['worker']['requestUnits']['byRoute']
+        except Exception:
+            return None
+        total = sum(entry['calls'] for operations in by_route.values() for entry in operations.values())
+        # Storage accounts do not report request units, so nothing is counted
+        return total or None
+
+    def close(self):
+        pass
+
+
+class LocalTarget:
+    """
+    Runs function_app in this process against the in-memory Table service
+    """
+
+    def __init__(self):
+        from startup_benchmark import LocalTableBackend
+        self.backend = LocalTableBackend().start()
+        state_dir = tempfile.mkdtemp(prefix="trace-replay-")
+        os.environ['COSMOS_DB_CONNECTION_STRING'] = self.backend.connection_string
+        os.environ.setdefault('TRUST_CLIENT_ID_HEADER', 'true')
+        os.environ.setdefault('COUNT_SNAPSHOT_PATH', os.path.join(state_dir, "count.snapshot"))
+        os.environ.setdefault('INCREMENT_JOURNAL_PATH', os.path.join(state_dir, "increments.journal"))
+        import function_app
+        from http_adapter import FunctionRouter
+        self.router = FunctionRouter(function_app.app)
+
+    def send(self, method, path, client):
+        """
+        Dispatch one request to the handler and return its status code
+        """
+        response = self.router.dispatch(method, f"http://localhost{path}", path, '', client_headers(client), b'')
+        return response.status_code
+
+    def storage_operations(self):
+        return self.backend.operations
+
+    def close(self):
+        self.backend.stop()
+
+
+def replay(records, target, speedup=1.0, concurrency=64, settle=1.0, clock=time.perf_counter):
+    """
+    Replay records against the target at the given speed-up and return the report
+    """
+    results = []
+    lock = threading.Lock()
+
+    def send(record, due):
+        _, method, route, client = record
+        started = clock()
+        try:
+            status = target.send(method, ROUTE_PATHS.get(route, f"/api/{route}"), client)
+        except Exception:
+            status = None
+        finished = clock()
+        with lock:
+            results.append((route, status, finished - due, finished - started, started - due))
+
+    # Two back-to-back probes give the storage cost of probing itself
+    first_probe = target.storage_operations()
+    before = target.storage_operations()
+    probe_cost = before - first_probe if before is not None and first_probe is not None else 0
+
+    origin = records[0][0] if records else 0
+    started = clock()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="trace-replay") as executor:
+        for record in records:
+            due = started + (record[0] - origin) / 1000 / speedup
+            delay = due - clock()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, record, due)
+    elapsed = clock() - started
+
+    time.sleep(settle)
+    after = target.storage_operations()
+    operations = after - before - probe_cost if after is not None and before is not None else None
+
+    statuses = {}
+    by_route = {}
+    for route, status, latency, _, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        by_route.setdefault(route, []).append(latency)
+    return {
+        'requests': len(records),
+        'errors': statuses.get('None', 0),
+        'statuses': statuses,
+        'speedup': speedup,
+        'traceSeconds': (records[-1][0] - origin) / 1000 if records else 0,
+        'durationSeconds': round(elapsed, 3),
+        'throughputPerSecond': round(len(results) / elapsed, 2) if elapsed > 0 else None,
+        'latencyMs': percentiles([result[2] for result in results]),
+        'serviceMs': percentiles([result[3] for result in results]),
+        'senderLagMs': percentiles([result[4] for result in results]),
+        'byRoute': {
+            route: {'requests': len(latencies), 'latencyMs': percentiles(latencies)}
+            for route, latencies in by_route.items()
+        },
+        'storageOperations': operations,
+        'storageOperationsPerRequest': round(operations / len(records), 3) if operations is not None and records else None,
+    }
+
+
+def main(argv=None):
+    """
+    Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="Replay recorded visitor counter traffic against a backend")
+    parser.add_argument("traces", nargs="+", help="trace files written by traffic_trace.py")
+    parser.add_argument("--target", help="backend base URL, e.g. http://localhost:7071, or 'local'")
+    parser.add_argument("--speedup", type=float, default=1.0, help="replay this many times faster than recorded")
+    parser.add_argument("--concurrency", type=int, default=64, help="maximum requests in flight")
+    parser.add_argument("--limit", type=int, help="replay only the first N requests")
+    parser.add_argument("--settle", type=float, default=1.0,
+                        help="seconds to wait for deferred writes before counting storage operations")
+    parser.add_argument("--summary", action="store_true", help="describe the trace without replaying it")
+    args = parser.parse_args(argv)
+
+    records = load_trace(args.traces)[:args.limit]
+    if args.summary:
+        report = summarize_trace(records)
+    else:
+        if not args.target:
+            parser.error("--target is required unless --summary is given")
+        target = LocalTarget() if args.target == 'local' else HttpTarget(args.target)
+        try:
+            report = replay(records, target, speedup=args.speedup, concurrency=args.concurrency, settle=args.settle)
+        finally:
+            target.close()
+    print(json.dumps(report))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Compact recording of counter traffic for trace-driven replay
+
+With TRAFFIC_TRACE_PATH set, every visitor_counter and visitor_stats request
+is recorded as one line:
+
+    <epoch ms> <method> <route> <client hash>
+
+The request path only appends a tuple to an in-memory buffer; hashing,
+formatting and the file write happen on a background thread about once a
+second, with one O_APPEND write per batch so several worker processes can
+share a file ("{pid}" in the path gives each its own). Clients are hashed
+with a keyed BLAKE2b, so traces carry no addresses ("-" when a request has
+none); set TRAFFIC_TRACE_SALT to the same value on every worker for hashes
+to match across them. Recording stops once the file reaches
+TRAFFIC_TRACE_MAX_MB. Replay traces with trace_replay.py.
+"""
+import functools
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+
+from rate_limiter import client_key
+
+logger = logging.getLogger(__name__)
+
+TRACE_FORMAT = "epoch_ms method route client"
+# Written for requests that carry no client address
+UNIDENTIFIED_CLIENT = "-"
+
+
+class TraceRecorder:
+    """
+    Buffers request records and appends them to a trace file in the background
+    """
+
+    def __init__(self, path, sample_rate=1.0, max_bytes=64 * 1024 * 1024, flush_interval=1.0,
+                 max_pending=100000, salt=None, rng=None, clock=time.time):
+        self.path = path.replace('{pid}', str(os.getpid())) if path else None
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.salt = (salt.encode('utf-8') if salt else os.urandom(16))[:64]
+        self.rng = rng or random.Random()
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._pending = []
+        self._flusher = None
+        self._stopped = threading.Event()
+        self.written_bytes = 0
+        self.recorded = 0
+        self.dropped = 0
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def record_route(self, handler):
+        """
+        Decorate a route handler so its requests are recorded under its name
+        """
+        if not self.enabled:
+            return handler
+
+        @functools.wraps(handler)
+        def recorded(req, *args, **kwargs):
+            self.record(req.method, handler.__name__, client_key(req))
+            return handler(req, *args, **kwargs)
+        return recorded
+
+    def record(self, method, route, client):
+        """
+        Buffer one request; client is the raw client key, hashed later off the request path
+        """
+        if self.sample_rate < 1.0 and self.rng.random() >= self.sample_rate:
+            return
+        with self._lock:
+            if len(self._pending) >= self.max_pending or self.written_bytes >= self.max_bytes:
+                self.dropped += 1
+                return
+            self._pending.append((int(self.clock() * 1000), method, route, client))
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name="traffic-trace", daemon=True)
+                self._flusher.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Failed to write traffic trace: {str(e)}")
+
+    def _client_hash(self, client):
+        if client is None:
+            return UNIDENTIFIED_CLIENT
+        return hashlib.blake2b(client, key=self.salt, digest_size=6).hexdigest()
+
+    def flush(self):
+        """
+        Append buffered records to the trace file and return how many were written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        lines = [f"{timestamp} {method} {route} {self._client_hash(client)}\n"
+                 for timestamp, method, route, client in pending]
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size == 0:
+                lines.insert(0, f"# {TRACE_FORMAT} sample={self.sample_rate}\n")
+            data = ''.join(lines).encode('utf-8')
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        with self._lock:
+            self.written_bytes += len(data)
+            self.recorded += len(pending)
+        return len(pending)
+
+    def close(self):
+        """
+        Stop the background writer and flush what is left
+        """
+        self._stopped.set()
+        if self.enabled:
+            self.flush()
+
+    def stats(self):
+        """
+        Return recording counters for diagnostics
+        """
+        with self._lock:
+            return {
+                'path': self.path,
+                'sampleRate': self.sample_rate,
+                'recorded': self.recorded,
+                'pending': len(self._pending),
+                'dropped': self.dropped,
+                'writtenBytes': self.written_bytes,
+            }
+
+
+def trace_recorder_from_environment():
+    """
+    Build the recorder from TRAFFIC_TRACE_* settings; disabled unless TRAFFIC_TRACE_PATH is set
+    """
+    return TraceRecorder(
+        os.environ.get('TRAFFIC_TRACE_PATH') or None,
+        sample_rate=float(os.environ.get('TRAFFIC_TRACE_SAMPLE_RATE', '1.0')),
+        max_bytes=int(float(os.environ.get('TRAFFIC_TRACE_MAX_MB', '64')) * 1024 * 1024),
+        salt=os.environ.get('TRAFFIC_TRACE_SALT')
+    )
@@ -0,0 +1,116 @@
+"""
+Repeat-visit suppression with time-rotated Bloom filters
+
+Two fixed-size Bloom filters are kept: the current generation receives new
+visitor keys and the previous one is still consulted. Generations rotate
+every window, so a visitor is remembered for at least one window and at
+most two. Memory is fixed at construction time and the false-positive rate
+follows from the configured capacity per window.
+"""
+import hashlib
+import math
+import threading
+import time
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter sized for a capacity and false-positive rate
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key):
+        # Kirsch-Mitzenmacher double hashing from one 128-bit digest
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key):
+        """
+        Add key to the filter
+        """
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def clear(self):
+        """
+        Reset every bit without reallocating
+        """
+        self.bits[:] = bytes(len(self.bits))
+
+
+class RotatingVisitFilter:
+    """
+    Remembers visitor keys for a time window using two rotating Bloom filters
+    """
+
+    def __init__(self, window_seconds, capacity=100000, error_rate=0.001, clock=time.monotonic):
+        self.window = window_seconds
+        self.clock = clock
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous = BloomFilter(capacity, error_rate)
+        self._rotated_at = clock()
+        self._lock = threading.Lock()
+        self.suppressed = 0
+        self.admitted = 0
+
+    @property
+    def false_positive_rate(self):
+        """
+        Upper bound on the chance a new visitor is wrongly suppressed at capacity
+        """
+        return 1 - (1 - self._current.error_rate) ** 2
+
+    @property
+    def memory_bytes(self):
+        """
+        Fixed memory used by the bit arrays
+        """
+        return len(self._current.bits) + len(self._previous.bits)
+
+    def _rotate(self, now):
+        elapsed = now - self._rotated_at
+        if elapsed < self.window:
+            return
+        if elapsed >= 2 * self.window:
+            # Idle for two windows: nothing is worth remembering
+            self._current.clear()
+        self._previous.clear()
+        self._current, self._previous = self._previous, self._current
+        self._rotated_at = now
+
+    def seen_recently(self, key):
+        """
+        Return True if key was seen within the window, recording it otherwise
+        """
+        with self._lock:
+            self._rotate(self.clock())
+            if key in self._current or key in self._previous:
+                self.suppressed += 1
+                return True
+            self._current.add(key)
+            self.admitted += 1
+            return False
+
+    def stats(self):
+        """
+        Return suppression counters and sizing for diagnostics
+        """
+        with self._lock:
+            return {
+                'admitted': self.admitted,
+                'suppressed': self.suppressed,
+                'windowSeconds': self.window,
+                'falsePositiveRate': self.false_positive_rate,
+                'memoryBytes': self.memory_bytes,
+            }
@@ -28,6 +28,7 @@ echo "📦 Using temporary directory: $TEMP_DIR"
 
 # Copy essential files
 cp "$BACKEND_DIR/function_app.py" "$TEMP_DIR/"
+cp "$BACKEND_DIR/count_snapshot.py" "$TEMP_DIR/"
 cp "$BACKEND_DIR/requirements.txt" "$TEMP_DIR/"
 
 # Create host.json if not exists
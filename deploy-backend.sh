@@ -45,6 +45,7 @@ echo "📦 Using temporary directory: $DEPLOY_DIR"
 
 # Copy files to deployment directory
 cp "$BACKEND_DIR/function_app.py" "$DEPLOY_DIR/"
+cp "$BACKEND_DIR/count_snapshot.py" "$DEPLOY_DIR/"
 cp "$BACKEND_DIR/requirements.txt" "$DEPLOY_DIR/"
 
 # Copy host.json if it exists